@@ -0,0 +1,27 @@
+from datetime import datetime, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+
+from analytics.rollups import DAY_FORMAT, refresh_days, refresh_incremental
+
+
+class Command(BaseCommand):
+    help = "Refresh the daily revenue and pipeline rollups behind /api/analytics/timeseries."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--full', action='store_true', help='Rebuild every day instead of only days changed since the last run')
+        parser.add_argument('--days', type=int, help='Rebuild the last N days (UTC), ignoring the watermark')
+
+    def handle(self, *args, **options):
+        start = datetime.utcnow()
+        if options['days'] is not None:
+            if options['days'] < 1:
+                raise CommandError("--days must be at least 1")
+            today = datetime.utcnow()
+            days = {(today - timedelta(days=n)).strftime(DAY_FORMAT) for n in range(options['days'])}
+            count = refresh_days(days)
+        else:
+            count = refresh_incremental(full=options['full'])
+        
+        elapsed = (datetime.utcnow() - start).total_seconds()
+        self.stdout.write(self.style.SUCCESS(f"Refreshed {count} day(s) of rollups in {elapsed:.2f}s"))
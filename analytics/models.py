@@ -0,0 +1,40 @@
+from django.db import models
+from mongoengine import Document, StringField, DateTimeField, FloatField, IntField, DictField
+from datetime import datetime
+
+class DailyRollup(Document):
+    """Totals for one salesperson, deal status and day, maintained by analytics.rollups.
+
+    Deals count on the day they were decided (verified_at) once verified,
+    rejected or completed, and on the day they were created otherwise.
+    Additional fees count on the day their project was created.
+    """
+    id = DictField(primary_key=True)  # {'day', 'salesperson', 'status'}
+    day = StringField(required=True)  # YYYY-MM-DD (UTC)
+    salesperson = StringField()
+    status = StringField()
+    deals = IntField(default=0)
+    budget = FloatField(default=0)
+    advance_payment = FloatField(default=0)
+    projects = IntField(default=0)  # Projects carrying an additional fee
+    additional_fees = FloatField(default=0)
+    refreshed_at = DateTimeField()
+    # Refresh that last wrote the deal totals and the fee totals, to find stale ones
+    deals_refreshed_at = DateTimeField()
+    fees_refreshed_at = DateTimeField()
+
+    meta = {
+        'collection': 'daily_rollups',
+        'indexes': [
+            ('day', 'salesperson', 'status'),
+            ('salesperson', 'day')
+        ]
+    }
+
+class RollupState(Document):
+    """High-water mark of the last incremental rollup refresh."""
+    id = StringField(primary_key=True)
+    watermark = DateTimeField()
+    refreshed_at = DateTimeField(default=datetime.utcnow)
+
+    meta = {'collection': 'rollup_state'}
@@ -0,0 +1,197 @@
+"""Maintain the daily_rollups collection with $merge aggregations.
+
+A refresh recomputes whole days from deals and projects, hot and archived.
+Fresh totals are merged over the existing buckets first; buckets and totals
+the rebuild did not produce (a deal moved out of the bucket) are cleared
+afterwards, so readers never see an affected day empty. Incremental
+refreshes find the affected days from documents whose updated_at moved past
+the stored watermark, and from the tombstones of ones deleted or archived since.
+"""
+from datetime import datetime, timedelta
+
+from analytics.models import DailyRollup, RollupState
+from deals.archive import ARCHIVE_COLLECTIONS
+from deals.models import Deal
+from projects.models import Project
+from sync.models import Tombstone
+
+# Statuses whose deals are bucketed on their decision day
+DECIDED_STATUSES = ['verified', 'rejected', 'completed']
+
+# Re-read this much before the watermark so writes still in flight at the
+# previous refresh are not missed
+WATERMARK_OVERLAP = timedelta(minutes=1)
+
+DAY_FORMAT = '%Y-%m-%d'
+
+
+def _day_ranges(days):
+    """Collapse YYYY-MM-DD strings into [start, end) datetime ranges of consecutive days."""
+    ranges = []
+    for day in sorted(days):
+        start = datetime.strptime(day, DAY_FORMAT)
+        if ranges and ranges[-1][1] == start:
+            ranges[-1][1] = start + timedelta(days=1)
+        else:
+            ranges.append([start, start + timedelta(days=1)])
+    return ranges
+
+
+def _in_days(field, days):
+    return [{field: {'$gte': start, '$lt': end}} for start, end in _day_ranges(days)]
+
+
+def deal_pipeline(days=None, now=None):
+    """Pipeline grouping deals, hot and archived, into (day, salesperson, status) buckets and merging them into daily_rollups."""
+    selection = []
+    if days is not None:
+        selection.append({'$match': {'$or': _in_days('created_at', days) + _in_days('verified_at', days)}})
+    # Archived deals still count towards the days they belong to
+    pipeline = selection + [{'$unionWith': {'coll': ARCHIVE_COLLECTIONS[Deal], 'pipeline': selection}}]
+    pipeline += [
+        {'$addFields': {'_day': {'$dateToString': {'format': DAY_FORMAT, 'date': {
+            '$cond': [
+                {'$in': ['$status', DECIDED_STATUSES]},
+                {'$ifNull': ['$verified_at', '$created_at']},
+                '$created_at'
+            ]
+        }}}}},
+    ]
+    if days is not None:
+        # The $or above also matched deals decided or created on other days
+        pipeline.append({'$match': {'_day': {'$in': sorted(days)}}})
+    pipeline += [
+        {'$group': {
+            '_id': {'day': '$_day', 'salesperson': '$created_by', 'status': '$status'},
+            'deals': {'$sum': 1},
+            'budget': {'$sum': '$budget'},
+            'advance_payment': {'$sum': '$advance_payment'}
+        }},
+        {'$addFields': {
+            'day': '$_id.day',
+            'salesperson': '$_id.salesperson',
+            'status': '$_id.status',
+            'refreshed_at': now or datetime.utcnow(),
+            'deals_refreshed_at': now or datetime.utcnow()
+        }},
+        {'$merge': {'into': DailyRollup._meta['collection'], 'on': '_id', 'whenMatched': 'merge', 'whenNotMatched': 'insert'}}
+    ]
+    return pipeline
+
+
+def _projects_with_deal(match, deal_collection):
+    """Stages selecting projects with additional fees and joining each to its deal in `deal_collection`.
+    
+    Projects whose deal cannot be found are dropped by the $unwind.
+    """
+    return [
+        {'$match': match},
+        # Project.deal_id is a string; convert it so the lookup hits the _id index.
+        # A malformed id must not abort the whole aggregation, so it becomes null and is dropped
+        {'$addFields': {'_deal_id': {'$convert': {'input': '$deal_id', 'to': 'objectId', 'onError': None, 'onNull': None}}}},
+        {'$match': {'_deal_id': {'$ne': None}}},
+        {'$lookup': {'from': deal_collection, 'localField': '_deal_id', 'foreignField': '_id', 'as': 'deal'}},
+        {'$unwind': '$deal'},
+    ]
+
+
+def fee_pipeline(days=None, now=None):
+    """Pipeline summing project additional fees into the bucket of the owning deal's salesperson and status.
+    
+    Archived projects are read from the archive and joined to the archived
+    deals they were moved with.
+    """
+    match = {'additional_fee': {'$gt': 0}}
+    if days is not None:
+        match['$or'] = _in_days('created_at', days)
+    return _projects_with_deal(match, Deal._meta['collection']) + [
+        {'$unionWith': {
+            'coll': ARCHIVE_COLLECTIONS[Project],
+            'pipeline': _projects_with_deal(match, ARCHIVE_COLLECTIONS[Deal])
+        }},
+        {'$group': {
+            '_id': {
+                'day': {'$dateToString': {'format': DAY_FORMAT, 'date': '$created_at'}},
+                'salesperson': '$deal.created_by',
+                'status': '$deal.status'
+            },
+            'projects': {'$sum': 1},
+            'additional_fees': {'$sum': '$additional_fee'}
+        }},
+        {'$addFields': {
+            'day': '$_id.day',
+            'salesperson': '$_id.salesperson',
+            'status': '$_id.status',
+            'refreshed_at': now or datetime.utcnow(),
+            'fees_refreshed_at': now or datetime.utcnow()
+        }},
+        {'$merge': {'into': DailyRollup._meta['collection'], 'on': '_id', 'whenMatched': 'merge', 'whenNotMatched': 'insert'}}
+    ]
+
+
+def changed_days(since):
+    """Days whose buckets may have changed because a deal or project was written, deleted or archived after `since`."""
+    days = set()
+    deal_ids = []
+    for deal in Deal.objects(updated_at__gt=since).only('id', 'created_at', 'verified_at').as_pymongo():
+        deal_ids.append(str(deal['_id']))
+        for field in ('created_at', 'verified_at'):
+            if deal.get(field):
+                days.add(deal[field].strftime(DAY_FORMAT))
+    # Fee buckets are keyed by the deal's status, so a status change moves its projects' fees too
+    projects = Project.objects(additional_fee__gt=0).filter(
+        __raw__={'$or': [{'updated_at': {'$gt': since}}, {'deal_id': {'$in': deal_ids}}]}
+    )
+    for project in projects.only('created_at').as_pymongo():
+        days.add(project['created_at'].strftime(DAY_FORMAT))
+    # Deleted and archived deals and projects leave the days they were counted in
+    for tombstone in Tombstone.objects(deleted_at__gt=since).only('created_at', 'verified_at').as_pymongo():
+        for field in ('created_at', 'verified_at'):
+            if tombstone.get(field):
+                days.add(tombstone[field].strftime(DAY_FORMAT))
+    return days
+
+
+def _clear_stale(days, now):
+    """Clear what a refresh stamped `now` did not rewrite in the given days (all days when None).
+    
+    Buckets neither pipeline produced are deleted; in buckets only one of
+    them produced, the other pipeline's totals are zeroed.
+    """
+    collection = DailyRollup._get_collection()
+    scope = {'day': {'$in': sorted(days)}} if days is not None else {}
+    collection.delete_many({**scope, 'deals_refreshed_at': {'$ne': now}, 'fees_refreshed_at': {'$ne': now}})
+    collection.update_many({**scope, 'deals_refreshed_at': {'$ne': now}},
+                           {'$set': {'deals': 0, 'budget': 0, 'advance_payment': 0}})
+    collection.update_many({**scope, 'fees_refreshed_at': {'$ne': now}},
+                           {'$set': {'projects': 0, 'additional_fees': 0}})
+
+
+def refresh_days(days=None):
+    """Rebuild the buckets of the given days, or of every day when days is None."""
+    now = datetime.utcnow()
+    # BSON dates keep milliseconds; truncate so the stamps compare equal once stored
+    now = now.replace(microsecond=now.microsecond // 1000 * 1000)
+    if days is not None:
+        days = set(days)
+        if not days:
+            return 0
+    list(Deal.objects.aggregate(deal_pipeline(days, now)))
+    list(Project.objects.aggregate(fee_pipeline(days, now)))
+    _clear_stale(days, now)
+    return len(days) if days is not None else len(DailyRollup.objects.distinct('day'))
+
+
+def refresh_incremental(full=False):
+    """Refresh the days touched since the last run and advance the watermark.
+
+    Returns the number of days rebuilt. The first run, or full=True, rebuilds everything.
+    """
+    started = datetime.utcnow()
+    state = RollupState.objects(id='daily').first()
+    if full or state is None or state.watermark is None:
+        count = refresh_days(None)
+    else:
+        count = refresh_days(changed_days(state.watermark - WATERMARK_OVERLAP))
+    RollupState.objects(id='daily').update_one(set__watermark=started, set__refreshed_at=datetime.utcnow(), upsert=True)
+    return count
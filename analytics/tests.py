@@ -0,0 +1,42 @@
+from datetime import datetime, timedelta
+from unittest import mock
+
+from analytics.models import RollupState
+from analytics.rollups import changed_days, refresh_incremental
+from deals.models import Deal
+from prs.testing import MongoTestCase, make_deal
+from projects.models import Project
+
+
+class ChangedDaysTests(MongoTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.deal = make_deal(status='rejected', created_at=datetime(2026, 1, 5, 10), verified_at=datetime(2026, 1, 7, 10))
+        Project(deal_id=str(self.deal.id), name='Fee', supervisor='super1', additional_fee=50,
+                created_at=datetime(2026, 1, 6, 10)).save()
+        # Last written well before the previous refresh
+        Deal.objects.update(updated_at=datetime(2026, 1, 7, 10))
+        Project.objects.update(updated_at=datetime(2026, 1, 7, 10))
+        self.since = datetime.utcnow() - timedelta(seconds=1)
+
+    def delete(self):
+        response = self.client.post(f'/api/deals/{self.deal.id}/delete/', {'username': 'sales1'}, content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+
+    def test_untouched_days_are_not_refreshed(self):
+        self.assertEqual(changed_days(self.since), set())
+
+    def test_deleted_deal_refreshes_its_days(self):
+        self.delete()
+        # Created and decided days of the deal, and the fee day of its project
+        self.assertEqual(changed_days(self.since), {'2026-01-05', '2026-01-06', '2026-01-07'})
+
+    def test_incremental_refresh_rebuilds_the_deleted_deals_days(self):
+        RollupState(id='daily', watermark=datetime.utcnow()).save()
+        self.delete()
+
+        # The $merge pipelines need a real mongod; check which days they would rebuild
+        with mock.patch('analytics.rollups.refresh_days', return_value=3) as refresh_days:
+            self.assertEqual(refresh_incremental(), 3)
+        self.assertEqual(refresh_days.call_args.args[0], {'2026-01-05', '2026-01-06', '2026-01-07'})
@@ -0,0 +1,78 @@
+from datetime import datetime
+
+from django.http import JsonResponse
+
+from analytics.models import DailyRollup, RollupState
+from prs.breaker import mongo_guard
+
+# Summed rollup fields, in response order
+METRICS = ['deals', 'budget', 'advance_payment', 'projects', 'additional_fees']
+
+# Longest range one request may ask for, in days
+MAX_RANGE_DAYS = 3660
+
+
+@mongo_guard
+def timeseries(request):
+    """Return daily revenue and pipeline totals from the pre-aggregated rollups.
+    
+    GET parameters:
+    - start, end: YYYY-MM-DD, both inclusive (required)
+    - salesperson: Optional username to restrict to
+    - status: Optional deal status, or a comma-separated list (e.g. verified,completed)
+    - group_by: Optional salesperson or status, to get one series per value
+    
+    Only the daily_rollups buckets are read, so the cost depends on the
+    number of days asked for rather than the number of deals.
+    """
+    if request.method != 'GET':
+        return JsonResponse({'success': False, 'error': 'Invalid request method'}, status=405)
+    
+    start = request.GET.get('start')
+    end = request.GET.get('end')
+    group_by = request.GET.get('group_by')
+    if not (start and end):
+        return JsonResponse({'success': False, 'error': 'start and end are required'}, status=400)
+    try:
+        start_date = datetime.strptime(start, '%Y-%m-%d')
+        end_date = datetime.strptime(end, '%Y-%m-%d')
+    except ValueError:
+        return JsonResponse({'success': False, 'error': 'Invalid date format. Use YYYY-MM-DD'}, status=400)
+    if not 0 <= (end_date - start_date).days <= MAX_RANGE_DAYS:
+        return JsonResponse({'success': False, 'error': f'end must be on or after start and within {MAX_RANGE_DAYS} days'}, status=400)
+    if group_by and group_by not in ('salesperson', 'status'):
+        return JsonResponse({'success': False, 'error': 'group_by must be salesperson or status'}, status=400)
+    
+    try:
+        match = {'day': {'$gte': start, '$lte': end}}
+        if request.GET.get('salesperson'):
+            match['salesperson'] = request.GET['salesperson']
+        if request.GET.get('status'):
+            match['status'] = {'$in': request.GET['status'].split(',')}
+        
+        key = {'day': '$day'}
+        if group_by:
+            key[group_by] = f'${group_by}'
+        pipeline = [
+            {'$match': match},
+            {'$group': {'_id': key, **{metric: {'$sum': f'${metric}'} for metric in METRICS}}},
+            {'$sort': {'_id.day': 1}}
+        ]
+        
+        series = []
+        for row in DailyRollup.objects.aggregate(pipeline):
+            point = dict(row['_id'])
+            point.update({metric: row[metric] for metric in METRICS})
+            series.append(point)
+        
+        state = RollupState.objects(id='daily').first()
+        return JsonResponse({
+            'success': True,
+            'start': start,
+            'end': end,
+            'group_by': group_by,
+            'series': series,
+            'refreshed_at': state.refreshed_at.isoformat() if state and state.refreshed_at else None
+        })
+    except Exception as e:
+        return JsonResponse({'success': False, 'error': str(e)}, status=500)
@@ -0,0 +1,4 @@
+"""Load-test harness and benchmark suite for the PRS API.
+
+Run with ``python -m benchmarks.run --help``.
+"""
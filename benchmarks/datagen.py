@@ -0,0 +1,121 @@
+"""Scalable data generator built on top of mock_data.seed_mock_data."""
+import random
+from datetime import datetime, timedelta
+
+from bson import ObjectId
+
+from mock_data import seed_mock_data
+from users.models import User
+from deals.models import Deal
+from projects.models import Project
+
+# Share of generated users per role
+ROLE_WEIGHTS = {
+    'salesperson': 0.5,
+    'verifier': 0.2,
+    'supervisor': 0.25,
+    'client': 0.05,
+}
+
+# Share of generated deals per status
+STATUS_WEIGHTS = {
+    'draft': 0.2,
+    'pending_verification': 0.25,
+    'verified': 0.35,
+    'rejected': 0.1,
+    'completed': 0.1,
+}
+
+PROJECT_STATUSES = ['pending', 'in_progress', 'completed']
+
+INSERT_BATCH_SIZE = 1000
+
+
+def _insert(document_class, documents):
+    """Bulk insert documents in batches without reloading them."""
+    for start in range(0, len(documents), INSERT_BATCH_SIZE):
+        document_class.objects.insert(documents[start:start + INSERT_BATCH_SIZE], load_bulk=False)
+
+
+def _generate_users(num_users):
+    """Build num_users users, with at least one per role."""
+    usernames = {role: [] for role in ROLE_WEIGHTS}
+    users = []
+    for role, weight in ROLE_WEIGHTS.items():
+        for i in range(max(1, round(num_users * weight))):
+            username = f"bench_{role}{i + 1}"
+            usernames[role].append(username)
+            users.append(User(username=username, role=role, email=f"{username}@example.com"))
+    return users, usernames
+
+
+def generate_data(num_users=20, num_deals=200, projects_per_deal=2, seed=0):
+    """Function to reset the database to the mock data set plus a generated load.
+
+    Creates num_users users, num_deals deals spread over the last year and
+    projects_per_deal projects for each deal, and returns the usernames per role
+    (mock users included) so scenarios can pick who to log in as.
+    """
+    rng = random.Random(seed)
+    seed_mock_data()
+    
+    users, usernames = _generate_users(num_users)
+    _insert(User, users)
+    for user in User.objects(username__not__startswith='bench_').only('username', 'role'):
+        usernames.setdefault(user.role, []).append(user.username)
+    
+    now = datetime.utcnow()
+    statuses = list(STATUS_WEIGHTS)
+    weights = list(STATUS_WEIGHTS.values())
+    deals = []
+    projects = []
+    for i in range(num_deals):
+        status = rng.choices(statuses, weights)[0]
+        created_at = now - timedelta(minutes=rng.randint(0, 365 * 24 * 60))
+        deal = Deal(
+            id=ObjectId(),
+            title=f"Benchmark Deal {i + 1}",
+            client_name=f"Client {rng.randint(1, max(1, num_deals // 5))}",
+            contact_info=f"client{i + 1}@example.com | (555) 000-{i % 10000:04d}",
+            budget=float(rng.randint(1000, 50000)),
+            advance_payment=float(rng.randint(0, 5000)),
+            requirements="Generated requirements " * rng.randint(5, 30),
+            description=f"Generated deal {i + 1} for load testing",
+            created_by=rng.choice(usernames['salesperson']),
+            created_at=created_at,
+            updated_at=created_at,
+            status=status,
+            is_multiproject=projects_per_deal > 1,
+        )
+        if status != 'draft':
+            deal.receipt_file = f"receipts/bench_receipt_{i + 1}.pdf"
+        if status in ('verified', 'rejected', 'completed'):
+            deal.verified_by = rng.choice(usernames['verifier'])
+            deal.verified_at = created_at + timedelta(hours=rng.randint(1, 72))
+        if status == 'rejected':
+            deal.rejection_reason = "Generated rejection"
+        
+        deal_projects = []
+        for j in range(projects_per_deal):
+            project = Project(
+                id=ObjectId(),
+                deal_id=str(deal.id),
+                name=f"Benchmark Project {i + 1}-{j + 1}",
+                description="Generated project",
+                supervisor=rng.choice(usernames['supervisor']),
+                deadline=now + timedelta(days=rng.randint(-10, 60)),
+                additional_fee=float(rng.choice([0, 0, 0, rng.randint(100, 1000)])),
+                status=rng.choice(PROJECT_STATUSES),
+                created_at=created_at,
+                updated_at=created_at,
+            )
+            deal_projects.append(project)
+        deal.projects = deal_projects
+        deal.projects_total = len(deal_projects)
+        deal.projects_completed = sum(1 for p in deal_projects if p.status == 'completed')
+        deals.append(deal)
+        projects.extend(deal_projects)
+    
+    _insert(Deal, deals)
+    _insert(Project, projects)
+    return usernames
@@ -0,0 +1,104 @@
+"""Compare sequential and concurrent persistence of a create_project upload batch.
+
+Usage:
+    python -m benchmarks.file_writes --files 20 --size-kb 256 --latency-ms 15
+    python -m benchmarks.file_writes --media-root /mnt/nfs/prs_bench --fsync file
+
+Each round writes the same batch once with FILE_WRITE_WORKERS=1 (the old
+one-after-another behaviour) and once with --workers threads. --latency-ms
+adds a fixed delay to every save to stand in for a network filesystem round
+trip; on a real NFS mount pass --media-root instead and leave it at 0.
+Everything written is removed afterwards.
+"""
+import argparse
+import json
+import os
+import shutil
+import tempfile
+import time
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'prs.settings')
+
+import django
+
+django.setup()
+
+from django.core.files.storage import FileSystemStorage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test.utils import override_settings
+
+from benchmarks.harness import percentile
+from files.writer import persist_files
+
+
+class LatencyStorage(FileSystemStorage):
+    """FileSystemStorage that sleeps before every save, like a slow network mount."""
+
+    def __init__(self, latency, **kwargs):
+        super().__init__(**kwargs)
+        self.latency = latency
+
+    def _save(self, name, content):
+        time.sleep(self.latency)
+        return super()._save(name, content)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='create_project file persistence benchmark')
+    parser.add_argument('--files', type=int, default=20, help='Attachments per request')
+    parser.add_argument('--size-kb', type=int, default=256, help='Size of each attachment')
+    parser.add_argument('--workers', type=int, default=8, help='Threads for the concurrent run')
+    parser.add_argument('--latency-ms', type=float, default=10.0, help='Simulated per-file storage latency')
+    parser.add_argument('--fsync', choices=['none', 'file', 'full'], default='none', help='FILE_FSYNC policy')
+    parser.add_argument('--media-root', help='Directory to write into (default: a temp dir)')
+    parser.add_argument('--rounds', type=int, default=5, help='Timed rounds per mode')
+    parser.add_argument('--json', action='store_true', help='Print the report as JSON')
+    return parser.parse_args(argv)
+
+
+def make_batch(count, size):
+    payload = os.urandom(size)
+    return [(f'bench/{i}/attachment_{i}.bin', SimpleUploadedFile(f'attachment_{i}.bin', payload))
+            for i in range(count)]
+
+
+def time_mode(storage, args, workers):
+    timings = []
+    with override_settings(FILE_WRITE_WORKERS=workers, FILE_FSYNC=args.fsync):
+        for _ in range(args.rounds):
+            batch = make_batch(args.files, args.size_kb * 1024)
+            start = time.perf_counter()
+            stored = persist_files(batch, storage=storage)
+            timings.append((time.perf_counter() - start) * 1000)
+            for saved in stored:
+                storage.delete(saved.name)
+    return {
+        'workers': workers,
+        'p50_ms': percentile(timings, 0.5),
+        'max_ms': max(timings)
+    }
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    root = tempfile.mkdtemp(prefix='prs_bench_', dir=args.media_root)
+    try:
+        storage = LatencyStorage(args.latency_ms / 1000, location=root)
+        sequential = time_mode(storage, args, 1)
+        concurrent = time_mode(storage, args, args.workers)
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+    speedup = sequential['p50_ms'] / concurrent['p50_ms'] if concurrent['p50_ms'] else 0
+    if args.json:
+        print(json.dumps({'sequential': sequential, 'concurrent': concurrent, 'speedup': speedup}, indent=2))
+        return
+    print(f"{args.files} files x {args.size_kb} KiB, latency {args.latency_ms} ms, fsync={args.fsync}")
+    print(f"{'mode':<12}{'workers':>8}{'p50 ms':>10}{'max ms':>10}")
+    for mode, row in (('sequential', sequential), ('concurrent', concurrent)):
+        print(f"{mode:<12}{row['workers']:>8}{row['p50_ms']:>10.1f}{row['max_ms']:>10.1f}")
+    print(f"\nspeedup {speedup:.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,166 @@
+"""Connection setup, DB-call counting and latency recording for the benchmark suite."""
+import functools
+import math
+import threading
+import time
+from collections import defaultdict
+from urllib.parse import urlsplit
+
+import mongoengine
+from mongoengine.connection import disconnect
+from pymongo import monitoring
+from django.conf import settings
+from django.test import Client
+from django.urls import Resolver404, get_resolver, resolve
+
+
+class CommandCounter(monitoring.CommandListener):
+    """Count MongoDB commands issued by the current thread."""
+
+    def __init__(self):
+        self._local = threading.local()
+
+    def reset(self):
+        self._local.count = 0
+
+    @property
+    def count(self):
+        return getattr(self._local, 'count', 0)
+
+    def started(self, event):
+        self._local.count = self.count + 1
+
+    def succeeded(self, event):
+        pass
+
+    def failed(self, event):
+        pass
+
+
+# Collection methods that cost a round trip against a real server
+MONGOMOCK_OPERATIONS = [
+    'find', 'find_one', 'find_one_and_update', 'find_one_and_replace', 'find_one_and_delete',
+    'insert_one', 'insert_many', 'update_one', 'update_many', 'replace_one',
+    'delete_one', 'delete_many', 'aggregate', 'count_documents', 'estimated_document_count',
+    'distinct', 'bulk_write', 'create_index', 'create_indexes',
+]
+
+
+def _count_mongomock_calls(counter):
+    """Count mongomock collection calls, which emit no command monitoring events.
+
+    Only the outermost call is counted, since mongomock implements some
+    operations (find_one, count_documents) on top of others.
+    """
+    from mongomock.collection import Collection
+    
+    depth = threading.local()
+    
+    def wrap(method):
+        @functools.wraps(method)
+        def counted(*args, **kwargs):
+            level = getattr(depth, 'level', 0)
+            if level == 0:
+                counter.started(None)
+            depth.level = level + 1
+            try:
+                return method(*args, **kwargs)
+            finally:
+                depth.level = level
+        return counted
+    
+    for name in MONGOMOCK_OPERATIONS:
+        if hasattr(Collection, name):
+            setattr(Collection, name, wrap(getattr(Collection, name)))
+
+
+def connect(backend, db_name, counter):
+    """Reconnect mongoengine to a local mongod or an in-memory mongomock instance."""
+    disconnect()
+    if backend == 'mongomock':
+        import mongomock
+        _count_mongomock_calls(counter)
+        mongoengine.connect(db_name, host='mongodb://localhost', mongo_client_class=mongomock.MongoClient)
+    else:
+        mongoengine.connect(
+            db=db_name,
+            host=settings.MONGODB_HOST,
+            port=settings.MONGODB_PORT,
+            username=settings.MONGODB_USERNAME,
+            password=settings.MONGODB_PASSWORD,
+            event_listeners=[counter]
+        )
+
+
+def percentile(values, fraction):
+    """Nearest-rank percentile of an already sorted list."""
+    if not values:
+        return 0.0
+    rank = max(1, math.ceil(fraction * len(values)))
+    return values[rank - 1]
+
+
+class Recorder:
+    """Collect latency and DB calls per endpoint (URL name) for every request issued."""
+
+    def __init__(self, counter):
+        self.counter = counter
+        self.samples = defaultdict(list)
+        self.errors = defaultdict(int)
+        self._lock = threading.Lock()
+
+    def client(self):
+        """Return a recording client; use one per simulated user."""
+        return RecordingClient(self)
+
+    def record(self, endpoint, elapsed, db_calls, status_code):
+        with self._lock:
+            self.samples[endpoint].append((elapsed, db_calls))
+            if status_code >= 500:
+                self.errors[endpoint] += 1
+
+    def report(self, wall_time):
+        """Return one row per URL pattern in prs/urls.py, plus any unresolved paths."""
+        endpoints = [p.name for p in get_resolver().url_patterns if getattr(p, 'name', None)]
+        endpoints += sorted(set(self.samples) - set(endpoints))
+        rows = []
+        for endpoint in endpoints:
+            samples = self.samples.get(endpoint, [])
+            latencies = sorted(elapsed for elapsed, _ in samples)
+            rows.append({
+                'endpoint': endpoint,
+                'requests': len(samples),
+                'errors': self.errors.get(endpoint, 0),
+                'p50_ms': percentile(latencies, 0.50) * 1000,
+                'p95_ms': percentile(latencies, 0.95) * 1000,
+                'p99_ms': percentile(latencies, 0.99) * 1000,
+                'throughput_rps': len(samples) / wall_time if wall_time else 0.0,
+                'db_calls': sum(calls for _, calls in samples) / len(samples) if samples else 0.0,
+            })
+        return rows
+
+
+class RecordingClient(Client):
+    """Django test client that times every request and counts its DB calls."""
+
+    def __init__(self, recorder, **defaults):
+        super().__init__(**defaults)
+        self.recorder = recorder
+
+    def request(self, **request):
+        path = request.get('PATH_INFO', '/')
+        try:
+            endpoint = resolve(urlsplit(path).path).url_name or path
+        except Resolver404:
+            endpoint = '<404>'
+        
+        self.recorder.counter.reset()
+        start = time.perf_counter()
+        response = super().request(**request)
+        if response.streaming:
+            # Drain streamed bodies so their queries are part of the measurement
+            for _ in response.streaming_content:
+                pass
+        elapsed = time.perf_counter() - start
+        self.recorder.record(endpoint, elapsed, self.recorder.counter.count, response.status_code)
+        return response
@@ -0,0 +1,109 @@
+"""Run the dashboard scenarios against generated data and report per-endpoint statistics.
+
+Usage:
+    python -m benchmarks.run --backend mongomock --users 50 --deals 2000 --projects-per-deal 3
+    python -m benchmarks.run --backend mongod --db prs_bench --iterations 50 --concurrency 8
+
+Requests go through the full Django stack in-process (middleware, URL
+resolution, views, templates); only the network hop is skipped. The mongod
+backend drops and refills the database given by --db, so never point it at a
+database holding real data.
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'prs.settings')
+
+import django
+
+django.setup()
+
+from django.test.utils import override_settings
+
+from benchmarks.datagen import generate_data
+from benchmarks.harness import CommandCounter, Recorder, connect
+from benchmarks.scenarios import SCENARIOS
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='PRS API benchmark suite')
+    parser.add_argument('--backend', choices=['mongomock', 'mongod'], default='mongomock',
+                        help='In-memory mongomock or the mongod configured in settings')
+    parser.add_argument('--db', default='prs_bench', help='Database name (dropped and refilled)')
+    parser.add_argument('--users', type=int, default=20, help='Generated users (N)')
+    parser.add_argument('--deals', type=int, default=200, help='Generated deals (M)')
+    parser.add_argument('--projects-per-deal', type=int, default=2, help='Projects per deal (K)')
+    parser.add_argument('--scenarios', default=','.join(SCENARIOS),
+                        help='Comma-separated scenarios to run')
+    parser.add_argument('--iterations', type=int, default=20, help='Runs of each scenario per worker')
+    parser.add_argument('--concurrency', type=int, default=1, help='Concurrent simulated users')
+    parser.add_argument('--seed', type=int, default=0, help='Random seed for data and scenarios')
+    parser.add_argument('--json', action='store_true', help='Print the report as JSON')
+    return parser.parse_args(argv)
+
+
+def run_worker(recorder, scenarios, usernames, iterations, seed):
+    """Run every selected scenario `iterations` times as randomly picked users."""
+    rng = random.Random(seed)
+    for _ in range(iterations):
+        for role in scenarios:
+            if usernames.get(role):
+                SCENARIOS[role](recorder.client(), rng.choice(usernames[role]), rng)
+
+
+def print_table(rows, wall_time):
+    print(f"{'endpoint':<26}{'reqs':>7}{'5xx':>6}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'req/s':>10}{'db/req':>9}")
+    for row in rows:
+        if not row['requests']:
+            print(f"{row['endpoint']:<26}{0:>7}{'-':>6}{'-':>10}{'-':>10}{'-':>10}{'-':>10}{'-':>9}")
+            continue
+        print(f"{row['endpoint']:<26}{row['requests']:>7}{row['errors']:>6}"
+              f"{row['p50_ms']:>10.2f}{row['p95_ms']:>10.2f}{row['p99_ms']:>10.2f}"
+              f"{row['throughput_rps']:>10.1f}{row['db_calls']:>9.1f}")
+    total = sum(row['requests'] for row in rows)
+    print(f"\n{total} requests in {wall_time:.2f}s ({total / wall_time:.1f} req/s overall)")
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    scenarios = [name.strip() for name in args.scenarios.split(',') if name.strip()]
+    unknown = set(scenarios) - set(SCENARIOS)
+    if unknown:
+        sys.exit(f"Unknown scenarios: {', '.join(sorted(unknown))}")
+    
+    counter = CommandCounter()
+    connect(args.backend, args.db, counter)
+    
+    start = time.perf_counter()
+    usernames = generate_data(args.users, args.deals, args.projects_per_deal, seed=args.seed)
+    print(f"Generated {args.users} users, {args.deals} deals, {args.projects_per_deal} projects/deal "
+          f"in {time.perf_counter() - start:.2f}s", file=sys.stderr)
+    
+    recorder = Recorder(counter)
+    # Cache-backed sessions keep the run independent of the SQLite database
+    with override_settings(SESSION_ENGINE='django.contrib.sessions.backends.cache',
+                           ALLOWED_HOSTS=['testserver']):
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+            futures = [
+                pool.submit(run_worker, recorder, scenarios, usernames, args.iterations, args.seed + worker)
+                for worker in range(args.concurrency)
+            ]
+            for future in futures:
+                future.result()
+        wall_time = time.perf_counter() - start
+    
+    rows = recorder.report(wall_time)
+    if args.json:
+        print(json.dumps({'wall_time_s': wall_time, 'endpoints': rows}, indent=2))
+    else:
+        print_table(rows, wall_time)
+
+
+if __name__ == '__main__':
+    main()
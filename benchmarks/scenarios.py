@@ -0,0 +1,103 @@
+"""Dashboard flows replaying the fetch sequences issued by the templates.
+
+Each scenario logs in through the login form, loads the dashboard and then
+issues the same requests, in the same order, as the JavaScript in the
+matching dashboard template.
+"""
+import json
+
+from django.conf import settings
+
+from deals.models import Deal
+from projects.models import Project
+
+
+def _login(client, username):
+    """Log in through the login form and load the dashboard it redirects to."""
+    client.post('/login/', {'username': username}, follow=True)
+
+
+def _first_page(queryset):
+    """The rows a dashboard embeds on first render, which is what users click on."""
+    return list(queryset.order_by('-created_at').limit(settings.DASHBOARD_PAGE_SIZE).as_pymongo())
+
+
+def salesperson_flow(client, username, rng):
+    """salesperson_dashboard.html: view details, manage projects, edit a draft.
+    
+    Deals come from the data embedded in the page, so viewing and editing
+    issue no requests of their own.
+    """
+    _login(client, username)
+    deals = _first_page(Deal.objects(created_by=username).only('id', 'status', 'version'))
+    if not deals:
+        return
+    
+    # manageProjects: the latest deal and its projects in one batch
+    verified = [d for d in deals if d['status'] == 'verified']
+    if verified:
+        deal_id = str(rng.choice(verified)['_id'])
+        client.post('/api/batch/', json.dumps({
+            'requests': [f'/api/deals/{deal_id}/', f'/api/projects/?deal_id={deal_id}']
+        }), content_type='application/json')
+    
+    # editDeal + updateDeal: multipart update against the version the form
+    # was filled from; the row is patched in place, without a reload
+    drafts = [d for d in deals if d['status'] == 'draft']
+    if drafts:
+        deal = rng.choice(drafts)
+        client.post(f'/api/deals/{deal["_id"]}/update/', {
+            'username': username,
+            'title': 'Edited benchmark deal',
+            'client_name': 'Edited client',
+            'contact_info': 'edited@example.com',
+            'budget': '12000',
+            'advance_payment': '1000',
+            'requirements': 'Edited requirements',
+            'description': 'Edited description',
+            'is_multiproject': 'true',
+            'status': 'draft',
+        }, HTTP_IF_MATCH=f'"{deal.get("version") or 0}"')
+
+
+def verifier_flow(client, username, rng):
+    """verifier_dashboard.html: claim the next pending deal, then approve it."""
+    _login(client, username)
+    
+    # claimNextDeal: lease the oldest deal nobody else is reviewing
+    response = client.post('/api/deals/claim/', json.dumps({'verifier': username}), content_type='application/json')
+    deal = response.json().get('deal') if response.status_code == 200 else None
+    if not deal:
+        return
+    
+    # viewDealDetails uses the claimed deal; verifyDeal + page reload
+    client.post(
+        f'/api/deals/{deal["id"]}/verify/',
+        json.dumps({'action': 'approve', 'verifier': username, 'reason': ''}),
+        content_type='application/json',
+        HTTP_IDEMPOTENCY_KEY=f'{rng.getrandbits(64):016x}'
+    )
+    client.get('/dashboard/')
+
+
+def supervisor_flow(client, username, rng):
+    """supervisor_dashboard.html: update one project's status, then reload the page of projects."""
+    _login(client, username)
+    
+    # First paint uses the embedded projects; updateProjectStatus, then loadSupervisorProjects
+    projects = _first_page(Project.objects(supervisor=username).only('id'))
+    if projects:
+        project_id = str(rng.choice(projects)['_id'])
+        client.post(
+            f'/api/projects/{project_id}/update-status/',
+            json.dumps({'status': rng.choice(['pending', 'in_progress', 'completed']), 'supervisor': username}),
+            content_type='application/json'
+        )
+        client.get(f'/api/projects/?supervisor={username}&page=1&page_size={settings.DASHBOARD_PAGE_SIZE}')
+
+
+SCENARIOS = {
+    'salesperson': salesperson_flow,
+    'verifier': verifier_flow,
+    'supervisor': supervisor_flow,
+}
@@ -6,6 +6,7 @@ from mongoengine import connect, disconnect
 from users.models import User
 from deals.models import Deal
 from projects.models import Project
+from projects.progress import refresh_deal_progress
 
 def create_test_projects():
     """Function to create test projects for development and testing"""
@@ -120,6 +121,7 @@ def create_test_projects():
                 created_projects.append(project)
                 print(f"Created project: {project.name} (ID: {project.id})")
         
+        refresh_deal_progress({project.deal_id for project in created_projects})
         print(f"\nCreated {len(created_projects)} test projects successfully!")
                 
     except Exception as e:
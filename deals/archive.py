@@ -0,0 +1,168 @@
+"""Move closed deals, with their projects and notifications, to archive collections.
+
+The hot collections keep only what dashboards work with; archived documents
+keep their _id and shape, so they load into the same Document classes
+(see find_archived).
+"""
+from datetime import datetime, timedelta
+
+from mongoengine.context_managers import switch_collection
+from pymongo import ReplaceOne
+
+from deals.models import Deal
+from notifications.models import Notification
+from prs.mongo import run_in_transaction
+from projects.models import Project
+from sync.models import Tombstone
+
+# Deals in these statuses can be archived
+CLOSED_STATUSES = ['completed', 'rejected']
+
+ARCHIVE_COLLECTIONS = {
+    Deal: 'deals_archive',
+    Project: 'projects_archive',
+    Notification: 'notifications_archive',
+}
+
+
+def archive_collection(document):
+    """The pymongo collection holding archived documents of this class."""
+    return document._get_db()[ARCHIVE_COLLECTIONS[document]]
+
+
+def find_archived(document, query, fields=None, order_by=None, limit=0):
+    """Load archived documents matching a raw filter as instances of `document`.
+    
+    Goes through pymongo rather than switch_collection, which rebinds the
+    class for every thread and so is unsafe inside request handling.
+    """
+    projection = None
+    if fields:
+        projection = {document._fields[name].db_field: 1 for name in fields}
+    cursor = archive_collection(document).find(query, projection)
+    if order_by:
+        name = order_by.lstrip('-')
+        cursor = cursor.sort(document._fields[name].db_field, -1 if order_by.startswith('-') else 1)
+    if limit:
+        cursor = cursor.limit(limit)
+    return [document._from_son(son) for son in cursor]
+
+
+def with_archived(queryset, document, query, fields, order_by, page=1, page_size=0):
+    """Combine a hot queryset with the archived documents matching `query`, as one ordered list.
+    
+    Both collections are read from the top down to the end of the requested
+    page and merged in Python, which is fine for the occasional archive
+    lookup. Archived documents are marked with `_archived = True`.
+    """
+    limit = page * page_size + 1 if page_size else 0
+    hot = list(queryset.limit(limit)) if limit else list(queryset)
+    cold = find_archived(document, query, fields, order_by, limit)
+    for doc in cold:
+        doc._archived = True
+    name = order_by.lstrip('-')
+    merged = sorted(hot + cold, key=lambda d: getattr(d, name), reverse=order_by.startswith('-'))
+    if page_size:
+        merged = merged[(page - 1) * page_size:limit]
+    return merged
+
+
+def ensure_archive_indexes():
+    """Give each archive collection the same indexes as its hot collection."""
+    for document, name in ARCHIVE_COLLECTIONS.items():
+        with switch_collection(document, name) as cls:
+            cls.ensure_indexes()
+
+
+def archive_candidates(older_than, batch_size):
+    """Ids of the next batch of closed deals untouched for `older_than`, oldest id first."""
+    cutoff = datetime.utcnow() - older_than
+    return Deal.objects(status__in=CLOSED_STATUSES, updated_at__lt=cutoff) \
+        .only('id').order_by('id').limit(batch_size).scalar('id')
+
+
+def _move(document, query, match_fields, session):
+    """Copy the documents matching `query` to the archive and delete those still as copied from the hot collection.
+    
+    A document is only deleted while its `match_fields` hold the values
+    that were copied. Returns (moved documents, ids of the documents left
+    behind because they changed in between).
+    """
+    hot = document._get_collection()
+    docs = list(hot.find(query, session=session))
+    if not docs:
+        return [], set()
+    archive_collection(document).bulk_write(
+        [ReplaceOne({'_id': d['_id']}, d, upsert=True) for d in docs], ordered=False, session=session
+    )
+    hot.delete_many({'$or': [
+        {'_id': d['_id'], **{field: d.get(field) for field in match_fields}} for d in docs
+    ]}, session=session)
+    kept = set(hot.distinct('_id', {'_id': {'$in': [d['_id'] for d in docs]}}, session=session))
+    return [d for d in docs if d['_id'] not in kept], kept
+
+
+def archive_batch(deal_ids):
+    """Copy a batch of deals and their dependants to the archive, then delete them from the hot collections.
+
+    Copies are upserts keyed on _id, so rerunning a batch that was
+    interrupted between the copy and the delete is harmless. A deal edited
+    or reopened after it was copied is not deleted; it stays hot and its
+    archive copy is dropped. Deals and projects that leave the hot
+    collections get tombstones, so /api/sync/ clients drop them too. On a
+    replica set the whole batch is one transaction.
+    """
+    deal_ids = list(deal_ids)
+
+    def move(session):
+        deals, kept = _move(Deal, {'_id': {'$in': deal_ids}, 'status': {'$in': CLOSED_STATUSES}},
+                            ('status', 'updated_at'), session)
+        if kept:
+            archive_collection(Deal).delete_many({'_id': {'$in': list(kept)}}, session=session)
+        owners = {str(d['_id']): d.get('created_by') for d in deals}
+        
+        # Projects of a moved deal all go; one edited after it was copied is copied again
+        projects = []
+        query = {'deal_id': {'$in': list(owners)}}
+        while True:
+            moved, kept = _move(Project, query, ('updated_at',), session)
+            projects += moved
+            if not kept:
+                break
+            query = {'_id': {'$in': list(kept)}}
+        notifications, _ = _move(Notification, {'deal': {'$in': [d['_id'] for d in deals]}}, (), session)
+        
+        now = datetime.utcnow()
+        tombstones = [Tombstone(kind='deal', object_id=str(d['_id']), created_by=d.get('created_by'), deleted_at=now,
+                                created_at=d.get('created_at'), verified_at=d.get('verified_at')) for d in deals]
+        tombstones += [Tombstone(kind='project', object_id=str(p['_id']), created_by=owners.get(p.get('deal_id')),
+                                 supervisor=p.get('supervisor'), deleted_at=now, created_at=p.get('created_at'))
+                       for p in projects]
+        if tombstones:
+            Tombstone._get_collection().insert_many([t.to_mongo() for t in tombstones], session=session)
+        
+        return {
+            Deal._meta['collection']: len(deals),
+            Project._meta['collection']: len(projects),
+            Notification._meta['collection']: len(notifications),
+        }
+
+    return run_in_transaction(move)
+
+
+def archive_closed_deals(older_than_days, batch_size=500, max_batches=None, progress=None):
+    """Archive closed deals in batches until none are left; returns totals per collection."""
+    older_than = timedelta(days=older_than_days)
+    totals = {}
+    batches = 0
+    while max_batches is None or batches < max_batches:
+        deal_ids = list(archive_candidates(older_than, batch_size))
+        if not deal_ids:
+            break
+        moved = archive_batch(deal_ids)
+        for name, count in moved.items():
+            totals[name] = totals.get(name, 0) + count
+        batches += 1
+        if progress:
+            progress(batches, moved)
+    return totals
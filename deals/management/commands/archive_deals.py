@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from deals.archive import CLOSED_STATUSES, archive_closed_deals, ensure_archive_indexes
+
+
+class Command(BaseCommand):
+    help = "Move closed deals, with their projects and notifications, into the archive collections."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--older-than', type=int, required=True, metavar='DAYS',
+                            help='Archive closed deals not updated for this many days')
+        parser.add_argument('--batch-size', type=int, default=500, help='Deals moved per batch (default 500)')
+        parser.add_argument('--max-batches', type=int, help='Stop after this many batches; rerun to continue')
+
+    def handle(self, *args, **options):
+        if options['older_than'] < 0 or options['batch_size'] < 1:
+            raise CommandError("--older-than must be >= 0 and --batch-size >= 1")
+        
+        ensure_archive_indexes()
+        
+        def progress(batch, moved):
+            counts = ', '.join(f"{count} {name}" for name, count in moved.items())
+            self.stdout.write(f"  batch {batch}: {counts}")
+        
+        self.stdout.write(f"Archiving {'/'.join(CLOSED_STATUSES)} deals idle for {options['older_than']} days")
+        totals = archive_closed_deals(
+            options['older_than'],
+            batch_size=options['batch_size'],
+            max_batches=options['max_batches'],
+            progress=progress
+        )
+        if not totals:
+            self.stdout.write("Nothing to archive.")
+            return
+        counts = ', '.join(f"{count} {name}" for name, count in totals.items())
+        self.stdout.write(self.style.SUCCESS(f"Archived {counts}"))
@@ -1,6 +1,35 @@
 from django.db import models
-from mongoengine import Document, StringField, ReferenceField, FloatField, ListField, DateTimeField, ValidationError, BooleanField
-from datetime import datetime
+from mongoengine import Document, StringField, ReferenceField, FloatField, ListField, DateTimeField, ValidationError, BooleanField, IntField
+from mongoengine.errors import SaveConditionError
+from datetime import datetime, timedelta
+from pymongo import ReturnDocument
+from prs.mongo import run_in_transaction
+
+class DealEvent(Document):
+    """One state transition of a deal. Events are only ever inserted, never updated."""
+    deal_id = StringField(required=True)
+    type = StringField(choices=[
+        "created",
+        "submitted",
+        "verified",
+        "rejected",
+        "reopened"
+    ], required=True)
+    from_status = StringField()
+    to_status = StringField()
+    actor = StringField()  # User who caused the transition
+    created_by = StringField()  # Deal owner, for per-salesperson reporting
+    ts = DateTimeField(default=datetime.utcnow)
+    duration_ms = IntField()  # verified/rejected: time since the deal was last submitted
+    reason = StringField()
+
+    meta = {
+        'collection': 'deal_events',
+        'indexes': [
+            ('deal_id', 'ts'),
+            ('type', 'ts')
+        ]
+    }
 
 class Deal(Document):
     title = StringField(required=True)
@@ -24,14 +53,22 @@ class Deal(Document):
     created_by = StringField(required=True)  # Salesperson
     created_at = DateTimeField(default=datetime.utcnow)
     updated_at = DateTimeField(default=datetime.utcnow)
+    version = IntField(default=0)  # Bumped by every edit and transition; exposed as the ETag
     
     # Verification details
     verified_by = StringField()
     verified_at = DateTimeField()
     rejection_reason = StringField()
     
+    # Review lease: the verifier working on a pending deal, until the lease expires
+    claimed_by = StringField()
+    lease_expires_at = DateTimeField()
+    
     # Project references
     projects = ListField(ReferenceField('Project'))
+    # Derived from the projects' statuses by projects.progress.refresh_deal_progress
+    projects_total = IntField(default=0)
+    projects_completed = IntField(default=0)
 
     meta = {
         'collection': 'deals',
@@ -39,27 +76,207 @@ class Deal(Document):
             'status',
             'created_by',
             'verified_by',
-            ('status', 'created_at')
+            ('status', 'created_at'),
+            # Incremental sync
+            'updated_at',
+            ('created_by', 'updated_at'),
+            # Daily rollups rebuild days by creation and decision date
+            'created_at',
+            'verified_at',
+            # Archival picks closed deals by last activity
+            ('status', 'updated_at'),
+            # A verifier's current claim
+            ('claimed_by', 'status')
         ]
     }
 
-    def submit_for_verification(self):
+    def save(self, *args, **kwargs):
+        # Every write bumps updated_at so /api/sync/ can find it
+        self.updated_at = datetime.utcnow()
+        expected = self.version or 0
+        if not self._created and self.pk is not None:
+            # Only update the version this instance was loaded at; a concurrent
+            # writer makes this raise SaveConditionError instead of both
+            # producing the same version
+            kwargs.setdefault('save_condition', {'version': expected} if expected else {'version__in': [0, None]})
+        self.version = expected + 1
+        try:
+            return super().save(*args, **kwargs)
+        except SaveConditionError:
+            self.version = expected
+            raise
+
+    def _get_update_doc(self):
+        # Increment the version on the server rather than setting it
+        update = super()._get_update_doc()
+        if 'version' in update.get('$set', {}):
+            del update['$set']['version']
+            update['$inc'] = {'version': 1}
+            if not update['$set']:
+                del update['$set']
+        return update
+
+    @property
+    def etag(self):
+        return f'"{self.version or 0}"'
+
+    def update_if_version(self, expected_version, **changes):
+        """Apply field changes with one update_one that only matches while the deal is at `expected_version`.
+        
+        Returns False, leaving the instance untouched, when someone else has
+        changed the deal since that version.
+        """
+        changes['updated_at'] = datetime.utcnow()
+        update = {
+            '$set': {self._fields[name].db_field: self._fields[name].to_mongo(value) for name, value in changes.items()},
+            '$inc': {'version': 1}
+        }
+        # Deals written before versioning have no version field yet
+        version_filter = {'$in': [0, None]} if not expected_version else expected_version
+        result = Deal._get_collection().update_one({'_id': self.pk, 'version': version_filter}, update)
+        if result.matched_count == 0:
+            return False
+        changes['version'] = (expected_version or 0) + 1
+        self._data.update(changes)
+        return True
+
+    def _transition(self, event_type, actor, reason=None, guard=None, **changes):
+        """Apply a status change and append its DealEvent in one transaction.
+        
+        The update only matches while the deal is still in the status it was
+        loaded with (and matches the extra `guard` filter, if any), so two
+        concurrent transitions cannot both succeed. Without a replica set the
+        two writes are applied back to back.
+        """
+        now = datetime.utcnow()
+        from_status = self.status
+        changes['updated_at'] = now
+        event = DealEvent(
+            deal_id=str(self.id),
+            type=event_type,
+            from_status=from_status,
+            to_status=changes.get('status', from_status),
+            actor=actor,
+            created_by=self.created_by,
+            ts=now,
+            reason=reason
+        )
+        if event_type in ('verified', 'rejected'):
+            submitted = DealEvent.objects(deal_id=str(self.id), type='submitted').only('ts').order_by('-ts').first()
+            if submitted:
+                event.duration_ms = int((now - submitted.ts).total_seconds() * 1000)
+        
+        update = {
+            '$set': {self._fields[name].db_field: self._fields[name].to_mongo(value) for name, value in changes.items()},
+            '$inc': {'version': 1}
+        }
+        document = event.to_mongo().to_dict()
+        
+        query = {'_id': self.pk, 'status': from_status}
+        if guard:
+            query.update(guard)
+        
+        def write(session):
+            result = Deal._get_collection().update_one(query, update, session=session)
+            if result.matched_count == 0:
+                raise ValidationError(f"Deal is no longer {from_status.replace('_', ' ')}")
+            DealEvent._get_collection().insert_one(document, session=session)
+        
+        run_in_transaction(write)
+        # Already persisted; set without marking the fields as changed
+        changes['version'] = (self.version or 0) + 1
+        self._data.update(changes)
+        return event
+
+    def submit_for_verification(self, actor=None):
         if not self.receipt_file:
             raise ValidationError("Receipt file is required for verification")
-        self.status = "pending_verification"
-        self.save()
+        self._transition('submitted', actor or self.created_by, status="pending_verification")
+
+    @staticmethod
+    def _unleased_or_held_by(verifier):
+        """Filter matching deals nobody else holds a live lease on."""
+        return {'$or': [
+            {'claimed_by': None},
+            {'claimed_by': verifier},
+            {'lease_expires_at': {'$lte': datetime.utcnow()}}
+        ]}
+
+    def leased_to_other(self, verifier):
+        """True while another verifier holds an unexpired lease on this deal."""
+        return bool(self.claimed_by and self.claimed_by != verifier
+                    and self.lease_expires_at and self.lease_expires_at > datetime.utcnow())
+
+    @classmethod
+    def claim_next(cls, verifier, lease_seconds):
+        """Lease the oldest pending deal nobody is reviewing to `verifier` and return it, or None.
+        
+        A verifier that still holds a live lease gets that deal back with the
+        lease extended, so each verifier works on one deal at a time. The
+        claim is a single find_one_and_update walking the (status, created_at)
+        index, so concurrent callers never receive the same deal, and deals
+        whose lease ran out are handed out again without any cleanup job.
+        """
+        now = datetime.utcnow()
+        # Lease changes are visible in serialize_deal, so they count as edits for sync and the ETag
+        lease = {'$set': {'lease_expires_at': now + timedelta(seconds=lease_seconds), 'updated_at': now}, '$inc': {'version': 1}}
+        collection = cls._get_collection()
+        son = collection.find_one_and_update(
+            {'status': 'pending_verification', 'claimed_by': verifier, 'lease_expires_at': {'$gt': now}},
+            lease,
+            return_document=ReturnDocument.AFTER
+        )
+        if son is None:
+            lease['$set']['claimed_by'] = verifier
+            son = collection.find_one_and_update(
+                {'status': 'pending_verification', '$or': [
+                    {'lease_expires_at': None},
+                    {'lease_expires_at': {'$lte': now}}
+                ]},
+                lease,
+                sort=[('created_at', 1)],
+                return_document=ReturnDocument.AFTER
+            )
+        return cls._from_son(son) if son else None
+
+    def renew_lease(self, verifier, lease_seconds):
+        """Extend this verifier's lease; raises ValidationError once someone else has reclaimed the deal."""
+        now = datetime.utcnow()
+        expires = now + timedelta(seconds=lease_seconds)
+        son = Deal._get_collection().find_one_and_update(
+            {'_id': self.pk, 'status': 'pending_verification', 'claimed_by': verifier},
+            {'$set': {'lease_expires_at': expires, 'updated_at': now}, '$inc': {'version': 1}},
+            projection={'version': 1},
+            return_document=ReturnDocument.AFTER
+        )
+        if son is None:
+            raise ValidationError("Lease is no longer held by this verifier")
+        self._data.update(claimed_by=verifier, lease_expires_at=expires, updated_at=now, version=son['version'])
+
+    def release_lease(self, verifier):
+        """Give the deal back to the queue; a no-op unless `verifier` holds it."""
+        now = datetime.utcnow()
+        son = Deal._get_collection().find_one_and_update(
+            {'_id': self.pk, 'claimed_by': verifier},
+            {'$set': {'claimed_by': None, 'lease_expires_at': None, 'updated_at': now}, '$inc': {'version': 1}},
+            projection={'version': 1},
+            return_document=ReturnDocument.AFTER
+        )
+        if son is not None:
+            self._data.update(claimed_by=None, lease_expires_at=None, updated_at=now, version=son['version'])
+        return son is not None
 
     def verify(self, verifier):
-        self.status = "verified"
-        self.verified_by = verifier
-        self.verified_at = datetime.utcnow()
-        self.save()
+        self._transition('verified', verifier, guard=self._unleased_or_held_by(verifier), status="verified",
+                         verified_by=verifier, verified_at=datetime.utcnow(), claimed_by=None, lease_expires_at=None)
 
     def reject(self, verifier, reason):
-        self.status = "rejected"
-        self.verified_by = verifier
-        self.verified_at = datetime.utcnow()
-        self.rejection_reason = reason
-        self.save()
+        self._transition('rejected', verifier, reason=reason, guard=self._unleased_or_held_by(verifier),
+                         status="rejected", verified_by=verifier, verified_at=datetime.utcnow(),
+                         rejection_reason=reason, claimed_by=None, lease_expires_at=None)
+
+    def reopen(self, actor):
+        """Move a deal back to draft for editing."""
+        self._transition('reopened', actor, status="draft")
 
 # Create your models here.
@@ -0,0 +1,430 @@
+import csv
+import io
+import json
+from datetime import datetime, timedelta
+from unittest import mock
+
+from django.core.management import call_command
+from django.test import SimpleTestCase
+from mongoengine.errors import SaveConditionError, ValidationError
+from mongomock.collection import Collection as MockCollection
+
+from deals.archive import archive_batch, archive_collection, find_archived, with_archived
+from deals.models import Deal, DealEvent
+from deals.views import EXPORT_COLUMNS, _percentile
+from notifications.models import Notification
+from prs.testing import MongoTestCase, make_deal
+from projects.models import Project
+from sync.models import Tombstone
+from users.models import User
+
+
+class PercentileTests(SimpleTestCase):
+
+    def test_nearest_rank(self):
+        values = list(range(1, 11))
+        self.assertEqual(_percentile(values, 50), 5)
+        self.assertEqual(_percentile(values, 90), 9)
+        # Ranks round up, so p99 of ten values is the largest
+        self.assertEqual(_percentile(values, 99), 10)
+        self.assertEqual(_percentile(values, 100), 10)
+        self.assertEqual(_percentile(values, 0), 1)
+
+    def test_single_value(self):
+        for pct in (50, 90, 99):
+            self.assertEqual(_percentile([42], pct), 42)
+
+
+class ExportDealsCsvTests(MongoTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.mine = make_deal(title='Mine', status='verified', created_at=datetime(2026, 2, 1, 9))
+        make_deal(title='Draft', created_at=datetime(2026, 2, 2, 9))
+        make_deal(title='Theirs', created_by='sales2', status='verified', created_at=datetime(2026, 2, 3, 9))
+        Project(deal_id=str(self.mine.id), name='P1', supervisor='super1', additional_fee=20).save()
+        Project(deal_id=str(self.mine.id), name='P2', supervisor='super1', additional_fee=5).save()
+
+    def export(self, **params):
+        response = self.client.get('/api/deals/export.csv', params)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        return [row['title'] for row in csv.DictReader(io.StringIO(b''.join(response.streaming_content).decode()))]
+
+    def test_login_required(self):
+        response = self.client.get('/api/deals/export.csv', {'username': 'sales1', 'role': 'verifier'})
+        self.assertEqual(response.status_code, 401)
+
+    def test_salesperson_exports_only_their_own_deals(self):
+        self.login('sales1', 'salesperson')
+        # Role and username in the query string are ignored
+        titles = self.export(username='sales2', role='verifier', status='all')
+        self.assertEqual(titles, ['Mine', 'Draft'])
+
+    def test_verifier_exports_everyones_deals(self):
+        self.login('verifier1', 'verifier')
+        titles = self.export()
+        self.assertEqual(titles, ['Mine', 'Theirs'])
+
+    def test_other_roles_are_refused(self):
+        self.login('someone', 'intern')
+        self.assertEqual(self.client.get('/api/deals/export.csv').status_code, 403)
+
+    def test_date_range_is_inclusive(self):
+        self.login('verifier1', 'verifier')
+        titles = self.export(status='all', start='2026-02-02', end='2026-02-03')
+        self.assertEqual(titles, ['Draft', 'Theirs'])
+        self.assertEqual(self.client.get('/api/deals/export.csv', {'start': '02/02/2026'}).status_code, 400)
+
+    def test_rows_carry_project_fees(self):
+        self.login('sales1', 'salesperson')
+        response = self.client.get('/api/deals/export.csv')
+        self.assertIn('attachment; filename="deals_verified_', response['Content-Disposition'])
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(lines[0], ','.join(EXPORT_COLUMNS))
+
+        row = next(csv.DictReader(lines))
+        self.assertEqual(row['id'], str(self.mine.id))
+        self.assertEqual(row['project_count'], '2')
+        self.assertEqual(float(row['project_additional_fees']), 25)
+        self.assertEqual(row['created_at'], '2026-02-01T09:00:00')
+
+
+class VerificationTurnaroundTests(MongoTestCase):
+
+    def setUp(self):
+        super().setUp()
+        for duration in range(1, 11):
+            DealEvent(deal_id=f'd{duration}', type='verified' if duration % 2 else 'rejected', actor='verifier1',
+                      duration_ms=duration * 1000, ts=datetime(2026, 2, duration, 12)).save()
+        DealEvent(deal_id='d1', type='submitted', ts=datetime(2026, 2, 1, 9)).save()
+
+    def turnaround(self, **params):
+        response = self.client.get('/api/deals/turnaround/', params)
+        self.assertEqual(response.status_code, 200)
+        return response.json()['turnaround']
+
+    def test_percentiles_of_decision_times(self):
+        [stats] = self.turnaround()
+        self.assertEqual(stats, {'count': 10, 'mean_ms': 5500, 'min_ms': 1000, 'max_ms': 10000,
+                                 'p50_ms': 5000, 'p90_ms': 9000, 'p95_ms': 10000, 'p99_ms': 10000})
+
+    def test_grouped_and_filtered_by_decision_day(self):
+        groups = self.turnaround(group_by='outcome', start='2026-02-03', end='2026-02-06')
+        self.assertEqual([(g['outcome'], g['count'], g['max_ms']) for g in groups], [('rejected', 2, 6000), ('verified', 2, 5000)])
+
+    def test_server_computes_percentiles(self):
+        row = {'_id': None, 'count': 10, 'mean_ms': 5500.0, 'min_ms': 1000, 'max_ms': 10000,
+               'percentiles': [5000.0, 9000.0, 9500.4, 10000.0]}
+        with mock.patch('deals.views.is_mongomock', return_value=False), \
+                mock.patch('mongoengine.queryset.QuerySet.aggregate', return_value=iter([row])) as aggregate:
+            [stats] = self.turnaround()
+
+        pipeline = aggregate.call_args.args[0]
+        group = pipeline[1]['$group']
+        self.assertEqual(group['percentiles']['$percentile']['p'], [0.5, 0.9, 0.95, 0.99])
+        # Nothing collects the durations themselves
+        self.assertNotIn('$push', str(pipeline))
+        self.assertTrue(aggregate.call_args.kwargs['allowDiskUse'])
+        self.assertEqual(stats['p95_ms'], 9500)
+
+
+class DealVersionTests(MongoTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.deal = make_deal(title='Original')
+
+    def stored_version(self):
+        return Deal._get_collection().find_one({'_id': self.deal.id})['version']
+
+    def update(self, version=None, **fields):
+        data = {'username': 'sales1', 'title': 'Edited', 'client_name': 'Client', 'contact_info': 'c@example.com',
+                'budget': '100', **fields}
+        headers = {'HTTP_IF_MATCH': f'"{version}"'} if version is not None else {}
+        return self.client.post(f'/api/deals/{self.deal.id}/update/', data, **headers)
+
+    def test_save_increments_the_version(self):
+        self.assertEqual(self.stored_version(), 1)
+        self.deal.title = 'Renamed'
+        self.deal.save()
+        self.assertEqual((self.deal.version, self.stored_version()), (2, 2))
+
+    def test_saving_a_stale_instance_fails(self):
+        stale = Deal.objects.get(id=self.deal.id)
+        self.deal.title = 'First'
+        self.deal.save()
+
+        stale.title = 'Second'
+        with self.assertRaises(SaveConditionError):
+            stale.save()
+        self.assertEqual(stale.version, 1)
+        self.assertEqual(Deal.objects.get(id=self.deal.id).title, 'First')
+
+    def test_documents_written_before_versioning(self):
+        Deal._get_collection().update_one({'_id': self.deal.id}, {'$unset': {'version': ''}})
+        legacy = Deal.objects.get(id=self.deal.id)
+        legacy.title = 'Saved'
+        legacy.save()
+        self.assertEqual(self.stored_version(), 1)
+
+        Deal._get_collection().update_one({'_id': self.deal.id}, {'$unset': {'version': ''}})
+        legacy = Deal.objects.get(id=self.deal.id)
+        self.assertTrue(legacy.update_if_version(legacy.version, title='Updated'))
+        self.assertEqual(self.stored_version(), 1)
+
+    def test_update_with_current_if_match(self):
+        response = self.update(version=1)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(Deal.objects.get(id=self.deal.id).title, 'Edited')
+        self.assertEqual(self.stored_version(), 2)
+
+    def test_update_with_stale_if_match_is_412(self):
+        self.deal.update_if_version(1, title='Theirs')
+
+        response = self.update(version=1)
+        self.assertEqual(response.status_code, 412)
+        self.assertEqual(response['ETag'], '"2"')
+        self.assertEqual(response.json()['deal']['title'], 'Theirs')
+        self.assertEqual(Deal.objects.get(id=self.deal.id).title, 'Theirs')
+
+    def test_concurrent_update_without_if_match_is_409(self):
+        update_if_version = Deal.update_if_version
+
+        def race(deal, expected_version, **changes):
+            # Another request saves between this one's read and its write
+            Deal._get_collection().update_one({'_id': deal.pk}, {'$set': {'title': 'Theirs'}, '$inc': {'version': 1}})
+            return update_if_version(deal, expected_version, **changes)
+
+        with mock.patch.object(Deal, 'update_if_version', race):
+            response = self.update()
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.json()['deal']['title'], 'Theirs')
+        self.assertEqual(self.stored_version(), 2)
+
+    def test_detail_is_304_for_a_matching_if_none_match(self):
+        response = self.client.get(f'/api/deals/{self.deal.id}/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['ETag'], '"1"')
+
+        response = self.client.get(f'/api/deals/{self.deal.id}/', HTTP_IF_NONE_MATCH='W/"1"')
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], '"1"')
+
+        self.deal.update_if_version(1, title='Changed')
+        self.assertEqual(self.client.get(f'/api/deals/{self.deal.id}/', HTTP_IF_NONE_MATCH='"1"').status_code, 200)
+
+
+class DealLeaseTests(MongoTestCase):
+
+    def setUp(self):
+        super().setUp()
+        for username in ('verifier1', 'verifier2', 'verifier3'):
+            User(username=username, role='verifier', email=f'{username}@example.com').save()
+        self.older = make_deal(title='Older', status='pending_verification', receipt_file='receipts/a.pdf',
+                               created_at=datetime(2026, 2, 1))
+        self.newer = make_deal(title='Newer', status='pending_verification', receipt_file='receipts/b.pdf',
+                               created_at=datetime(2026, 2, 2))
+
+    def claim(self, verifier):
+        response = self.client.post('/api/deals/claim/', {'verifier': verifier}, content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        return response.json()['deal']
+
+    def test_verifiers_never_get_the_same_deal(self):
+        first, second = self.claim('verifier1'), self.claim('verifier2')
+        self.assertEqual([first['title'], second['title']], ['Older', 'Newer'])
+        self.assertIsNone(self.claim('verifier3'))
+
+    def test_live_lease_is_returned_to_its_holder(self):
+        first = Deal.claim_next('verifier1', 60)
+        again = Deal.claim_next('verifier1', 60)
+        self.assertEqual(again.id, first.id)
+        self.assertGreaterEqual(again.lease_expires_at, first.lease_expires_at)
+        # Extending the lease is an edit, so the ETag moves
+        self.assertEqual(again.version, first.version + 1)
+        self.assertEqual(Deal.claim_next('verifier2', 60).id, self.newer.id)
+
+    def test_expired_lease_is_reissued(self):
+        Deal.claim_next('verifier1', 60)
+        Deal.objects(id=self.older.id).update(set__lease_expires_at=datetime.utcnow() - timedelta(seconds=1))
+
+        deal = Deal.claim_next('verifier2', 60)
+        self.assertEqual((deal.id, deal.claimed_by), (self.older.id, 'verifier2'))
+        # The previous holder can no longer renew it
+        with self.assertRaises(ValidationError):
+            Deal.objects.get(id=self.older.id).renew_lease('verifier1', 60)
+
+    def test_release_hands_the_deal_back(self):
+        deal = Deal.claim_next('verifier1', 60)
+        self.assertFalse(deal.release_lease('verifier2'))
+        self.assertTrue(deal.release_lease('verifier1'))
+        self.assertEqual(Deal.claim_next('verifier2', 60).id, self.older.id)
+
+    def test_only_the_lease_holder_can_decide(self):
+        self.claim('verifier1')
+
+        response = self.client.post(f'/api/deals/{self.older.id}/verify/', json.dumps(
+            {'action': 'approve', 'verifier': 'verifier2'}), content_type='application/json')
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(Deal.objects.get(id=self.older.id).status, 'pending_verification')
+
+        response = self.client.post(f'/api/deals/{self.older.id}/verify/', json.dumps(
+            {'action': 'approve', 'verifier': 'verifier1'}), content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        deal = Deal.objects.get(id=self.older.id)
+        self.assertEqual((deal.status, deal.claimed_by), ('verified', None))
+
+    def test_lease_guard_holds_against_a_stale_read(self):
+        stale = Deal.objects.get(id=self.older.id)
+        Deal.claim_next('verifier1', 60)
+        # Loaded before the claim, so only the guarded update notices it
+        self.assertFalse(stale.leased_to_other('verifier2'))
+        with self.assertRaises(ValidationError):
+            stale.verify('verifier2')
+
+
+class VerifyDealTests(MongoTestCase):
+
+    def setUp(self):
+        super().setUp()
+        User(username='verifier1', role='verifier', email='verifier1@example.com').save()
+        self.deal = make_deal(status='pending_verification', receipt_file='receipts/a.pdf')
+
+    def decide(self, deal_id=None, **data):
+        data = {'action': 'approve', 'verifier': 'verifier1', **data}
+        return self.client.post(f'/api/deals/{deal_id or self.deal.id}/verify/', json.dumps(data),
+                                content_type='application/json')
+
+    def test_invalid_input_is_400(self):
+        for deal_id, data in [
+            ('not-an-id', {}),
+            (None, {'action': 'reject'}),
+            (None, {'action': 'reject', 'reason': '  '}),
+            (None, {'action': 'reject', 'reason': ['late']}),
+            (None, {'action': 'archive'}),
+        ]:
+            with self.subTest(deal_id=deal_id, data=data):
+                self.assertEqual(self.decide(deal_id, **data).status_code, 400)
+        self.assertEqual(Deal.objects.get(id=self.deal.id).status, 'pending_verification')
+
+    def test_reject_with_a_reason(self):
+        response = self.decide(action='reject', reason='Receipt is unreadable')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['rejection_reason'], 'Receipt is unreadable')
+
+    def test_losing_the_race_is_409(self):
+        verify = Deal.verify
+
+        def decided_meanwhile(deal, verifier):
+            Deal.objects(id=deal.id).update(set__status='rejected')
+            return verify(deal, verifier)
+
+        with mock.patch.object(Deal, 'verify', autospec=True, side_effect=decided_meanwhile):
+            response = self.decide()
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.json()['error'], 'Deal is no longer pending verification')
+
+
+def replace_each(collection, requests, ordered=True, session=None):
+    """bulk_write of ReplaceOne requests, one replace_one at a time.
+
+    mongomock's bulk builder does not accept the `sort` argument that
+    pymongo 4.x passes along with ReplaceOne.
+    """
+    for request in requests:
+        collection.replace_one(request._filter, request._doc, upsert=request._upsert, session=session)
+
+
+class ArchiveTests(MongoTestCase):
+
+    def setUp(self):
+        super().setUp()
+        patcher = mock.patch.object(MockCollection, 'bulk_write', replace_each)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        old = datetime.utcnow().replace(microsecond=0) - timedelta(days=120)
+        self.closed = make_deal(title='Closed', status='completed', created_at=old)
+        self.rejected = make_deal(title='Rejected', status='rejected', created_at=old + timedelta(days=1))
+        self.fresh = make_deal(title='Fresh', status='completed')
+        self.open = make_deal(title='Open', status='verified', created_at=old)
+        for deal in (self.closed, self.fresh, self.open):
+            Project(deal_id=str(deal.id), name=f'{deal.title} project', supervisor='super1', created_at=old).save()
+        Notification(recipient='sales1', message='Verified', deal=self.closed).save()
+        # Closed and open deals last touched long ago; the fresh one just now
+        Deal.objects(id__in=[self.closed.id, self.rejected.id, self.open.id]).update(updated_at=old)
+
+    def test_batch_moves_deals_with_their_projects_and_notifications(self):
+        moved = archive_batch([self.closed.id, self.rejected.id])
+
+        self.assertEqual(moved, {'deals': 2, 'projects': 1, 'notifications': 1})
+        self.assertEqual(set(Deal.objects.scalar('title')), {'Fresh', 'Open'})
+        self.assertEqual(set(Project.objects.scalar('name')), {'Fresh project', 'Open project'})
+        self.assertEqual(Notification.objects.count(), 0)
+        self.assertEqual({d['title'] for d in archive_collection(Deal).find()}, {'Closed', 'Rejected'})
+        self.assertEqual([p['name'] for p in archive_collection(Project).find()], ['Closed project'])
+
+    def test_batch_writes_tombstones(self):
+        archive_batch([self.closed.id])
+
+        tombstones = {(t.kind, t.created_by) for t in Tombstone.objects}
+        self.assertEqual(tombstones, {('deal', 'sales1'), ('project', 'sales1')})
+        deal_tombstone = Tombstone.objects.get(kind='deal')
+        self.assertEqual(deal_tombstone.object_id, str(self.closed.id))
+        self.assertEqual(deal_tombstone.created_at, self.closed.created_at)
+
+    def test_deals_that_are_not_closed_stay_hot(self):
+        moved = archive_batch([self.open.id])
+
+        self.assertEqual(moved['deals'], 0)
+        self.assertEqual(Deal.objects(id=self.open.id).count(), 1)
+        self.assertEqual(archive_collection(Deal).count_documents({}), 0)
+        self.assertEqual(Tombstone.objects.count(), 0)
+
+    def test_rerunning_a_batch_is_harmless(self):
+        archive_batch([self.closed.id])
+        self.assertEqual(archive_batch([self.closed.id]), {'deals': 0, 'projects': 0, 'notifications': 0})
+        self.assertEqual(archive_collection(Deal).count_documents({}), 1)
+
+    def test_archived_deals_are_still_found(self):
+        archive_batch([self.closed.id, self.rejected.id])
+
+        [deal] = find_archived(Deal, {'_id': self.closed.id})
+        self.assertEqual((deal.title, deal.status), ('Closed', 'completed'))
+
+        query = {'created_by': 'sales1'}
+        merged = with_archived(Deal.objects(**query).order_by('-created_at'), Deal, query, None, '-created_at')
+        self.assertEqual([d.title for d in merged], ['Fresh', 'Rejected', 'Open', 'Closed'])
+        self.assertEqual([getattr(d, '_archived', False) for d in merged], [False, True, False, True])
+
+        page = with_archived(Deal.objects(**query).order_by('-created_at'), Deal, query, None, '-created_at', 2, 2)
+        self.assertEqual([d.title for d in page], ['Open', 'Closed'])
+
+    def test_archived_deals_through_the_api(self):
+        archive_batch([self.closed.id])
+
+        response = self.client.get('/api/deals/', {'username': 'sales1', 'role': 'salesperson'})
+        self.assertNotIn('Closed', [d['title'] for d in response.json()['deals']])
+        response = self.client.get('/api/deals/', {'username': 'sales1', 'role': 'salesperson', 'include_archived': '1'})
+        deals = {d['title']: d['archived'] for d in response.json()['deals']}
+        self.assertEqual(deals['Closed'], True)
+        self.assertEqual(deals['Open'], False)
+
+        response = self.client.get(f'/api/deals/{self.closed.id}/')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.json()['deal']['archived'])
+
+    def test_archive_deals_command(self):
+        out = io.StringIO()
+        call_command('archive_deals', '--older-than', '90', '--batch-size', '1', stdout=out, no_color=True)
+
+        output = out.getvalue()
+        self.assertIn('batch 1: 1 deals, 1 projects, 1 notifications', output)
+        self.assertIn('batch 2: 1 deals, 0 projects, 0 notifications', output)
+        self.assertIn('Archived 2 deals, 1 projects, 1 notifications', output)
+        self.assertEqual(set(Deal.objects.scalar('title')), {'Fresh', 'Open'})
+
+        out = io.StringIO()
+        call_command('archive_deals', '--older-than', '90', stdout=out)
+        self.assertIn('Nothing to archive.', out.getvalue())
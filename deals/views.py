@@ -1,21 +1,39 @@
 from django.shortcuts import render
-from deals.models import Deal
+from deals.models import Deal, DealEvent
 from projects.models import Project
+from projects.progress import refresh_deal_progress
 from users.models import User
 from notifications.models import Notification
+from sync.models import Tombstone
+from deals.archive import find_archived, with_archived
 from mongoengine.errors import ValidationError, DoesNotExist
-from django.http import JsonResponse
+from bson import ObjectId
+from bson.errors import InvalidId
+from django.http import HttpResponse, HttpResponseNotModified, JsonResponse, StreamingHttpResponse
+import csv
 import json
 from django.views.decorators.csrf import csrf_exempt
 import os
 from django.conf import settings
 from django.core.files.storage import default_storage
 from django.core.files.base import ContentFile
-from datetime import datetime
+from datetime import datetime, timedelta
+from itertools import islice
+from monitoring.middleware import span
+from prs.breaker import mongo_guard
+from prs.idempotency import idempotent
+from prs.mongo import is_mongomock
+from prs.singleflight import SingleFlight, flight_key
 
 @csrf_exempt
+@mongo_guard(timeout=settings.MONGODB_UPLOAD_TIMEOUT_SECONDS)
+@idempotent
 def create_deal(request):
-    """Create a new deal with receipt upload and handle project creation."""
+    """Create a new deal with receipt upload and handle project creation.
+    
+    Retries carrying the same Idempotency-Key header get the first response
+    back without creating the deal or saving the receipt again.
+    """
     if request.method != 'POST':
         return JsonResponse({'success': False, 'error': 'Invalid request method'}, status=405)
     
@@ -57,6 +75,14 @@ def create_deal(request):
             description=data.get('description', ''),
             is_multiproject=is_multiproject
         ).save()
+        DealEvent(
+            deal_id=str(deal.id),
+            type='created',
+            to_status=deal.status,
+            actor=salesperson.username,
+            created_by=salesperson.username,
+            ts=deal.created_at
+        ).save()
         
         # Process projects if it's a multi-project deal
         projects_created = []
@@ -95,6 +121,9 @@ def create_deal(request):
                 # Log the error but don't fail the deal creation
                 print("Error decoding projects data")
         
+        if projects_created:
+            refresh_deal_progress([deal.id])
+        
         return JsonResponse({
             'success': True,
             'deal_id': str(deal.id),
@@ -106,8 +135,15 @@ def create_deal(request):
         return JsonResponse({'success': False, 'error': str(e)}, status=500)
 
 @csrf_exempt
+@mongo_guard
+@idempotent
 def verify_deal(request, deal_id):
-    """Verify or reject a deal with proper validation."""
+    """Verify or reject a deal with proper validation.
+    
+    Invalid input is answered with 400; 409 means the deal is leased to
+    another verifier or was decided while this request ran.
+    Accepts an Idempotency-Key header, like create_deal.
+    """
     if request.method != 'POST':
         return JsonResponse({'success': False, 'error': 'Invalid request method'}, status=405)
     
@@ -115,10 +151,16 @@ def verify_deal(request, deal_id):
         data = json.loads(request.body)
         action = data.get('action')
         verifier = data.get('verifier')
-        reason = data.get('reason', '')
+        reason = data.get('reason') or ''
         
         if not (action and verifier):
             return JsonResponse({'success': False, 'error': 'Missing required fields: action, verifier'}, status=400)
+        if action not in ('approve', 'reject'):
+            return JsonResponse({'success': False, 'error': 'Invalid action'}, status=400)
+        if not isinstance(reason, str) or (action == 'reject' and not reason.strip()):
+            return JsonResponse({'success': False, 'error': 'Rejection reason is required'}, status=400)
+        if not ObjectId.is_valid(deal_id):
+            return JsonResponse({'success': False, 'error': 'Invalid deal ID'}, status=400)
         
         # Validate verifier
         try:
@@ -135,18 +177,20 @@ def verify_deal(request, deal_id):
                 return JsonResponse({'success': False, 'error': 'Deal has no receipt attached'}, status=400)
         except Deal.DoesNotExist:
             return JsonResponse({'success': False, 'error': 'Deal not found'}, status=404)
+        if deal.leased_to_other(verifier_user.username):
+            return JsonResponse({'success': False, 'error': f'Deal is being reviewed by {deal.claimed_by}'}, status=409)
         
         # Process verification
-        if action == 'approve':
-            deal.verify(verifier_user.username)
-            message = 'Deal verified successfully'
-        elif action == 'reject':
-            if not reason:
-                return JsonResponse({'success': False, 'error': 'Rejection reason is required'}, status=400)
-            deal.reject(verifier_user.username, reason)
-            message = 'Deal rejected with reason'
-        else:
-            return JsonResponse({'success': False, 'error': 'Invalid action'}, status=400)
+        try:
+            if action == 'approve':
+                deal.verify(verifier_user.username)
+                message = 'Deal verified successfully'
+            else:
+                deal.reject(verifier_user.username, reason)
+                message = 'Deal rejected with reason'
+        except ValidationError as e:
+            # Another verifier got there first
+            return JsonResponse({'success': False, 'error': str(e)}, status=409)
         
         # Notify relevant parties
         Notification(
@@ -164,10 +208,15 @@ def verify_deal(request, deal_id):
             'rejection_reason': deal.rejection_reason
         })
         
+    except json.JSONDecodeError:
+        return JsonResponse({'success': False, 'error': 'Invalid JSON'}, status=400)
+    except ValidationError as e:
+        return JsonResponse({'success': False, 'error': str(e)}, status=400)
     except Exception as e:
         return JsonResponse({'success': False, 'error': str(e)}, status=500)
 
 @csrf_exempt
+@mongo_guard
 def submit_for_verification(request, deal_id):
     """Submit a deal for verification."""
     if request.method != 'POST':
@@ -192,8 +241,158 @@ def submit_for_verification(request, deal_id):
     except Exception as e:
         return JsonResponse({'success': False, 'error': str(e)}, status=500)
 
+def _lease_response(deal):
+    return {
+        'success': True,
+        'deal': serialize_deal(deal),
+        'claimed_by': deal.claimed_by,
+        'lease_expires_at': deal.lease_expires_at.isoformat() if deal.lease_expires_at else None,
+        'lease_seconds': settings.VERIFICATION_LEASE_SECONDS
+    }
+
+
+def _lease_verifier(request):
+    """Return (verifier username, error response) from a lease request body."""
+    try:
+        verifier = json.loads(request.body or b'{}').get('verifier')
+    except ValueError:
+        return None, JsonResponse({'success': False, 'error': 'Invalid JSON'}, status=400)
+    if not verifier:
+        return None, JsonResponse({'success': False, 'error': 'Missing required field: verifier'}, status=400)
+    if not User.objects(username=verifier, role='verifier').count():
+        return None, JsonResponse({'success': False, 'error': 'Invalid verifier'}, status=400)
+    return verifier, None
+
+@csrf_exempt
+@mongo_guard
+def claim_deal(request):
+    """Lease the next deal to review to a verifier.
+    
+    POST JSON: verifier. Returns the oldest pending deal nobody else is
+    reviewing (or the one this verifier already holds) with its lease
+    expiry, or deal=null when the queue is empty. Keep the lease with
+    /api/deals/<id>/lease/heartbeat/ while reviewing; an expired lease puts
+    the deal back in the queue.
+    """
+    if request.method != 'POST':
+        return JsonResponse({'success': False, 'error': 'Invalid request method'}, status=405)
+    
+    try:
+        verifier, error = _lease_verifier(request)
+        if error:
+            return error
+        
+        deal = Deal.claim_next(verifier, settings.VERIFICATION_LEASE_SECONDS)
+        if deal is None:
+            return JsonResponse({'success': True, 'deal': None, 'message': 'No deals waiting for verification'})
+        return JsonResponse(_lease_response(deal))
+        
+    except Exception as e:
+        return JsonResponse({'success': False, 'error': str(e)}, status=500)
+
+@csrf_exempt
+@mongo_guard
+def deal_lease_heartbeat(request, deal_id):
+    """Extend a verifier's lease on a deal. POST JSON: verifier. 409 once the lease was lost."""
+    if request.method != 'POST':
+        return JsonResponse({'success': False, 'error': 'Invalid request method'}, status=405)
+    
+    try:
+        verifier, error = _lease_verifier(request)
+        if error:
+            return error
+        
+        deal = Deal.objects.only(*DEAL_LIST_FIELDS).get(id=deal_id)
+        deal.renew_lease(verifier, settings.VERIFICATION_LEASE_SECONDS)
+        return JsonResponse(_lease_response(deal))
+        
+    except Deal.DoesNotExist:
+        return JsonResponse({'success': False, 'error': 'Deal not found'}, status=404)
+    except ValidationError as e:
+        return JsonResponse({'success': False, 'error': str(e)}, status=409)
+    except Exception as e:
+        return JsonResponse({'success': False, 'error': str(e)}, status=500)
+
+@csrf_exempt
+@mongo_guard
+def release_deal_lease(request, deal_id):
+    """Give a claimed deal back to the queue without deciding it. POST JSON: verifier."""
+    if request.method != 'POST':
+        return JsonResponse({'success': False, 'error': 'Invalid request method'}, status=405)
+    
+    try:
+        verifier, error = _lease_verifier(request)
+        if error:
+            return error
+        
+        deal = Deal.objects.only('id', 'claimed_by').get(id=deal_id)
+        released = deal.release_lease(verifier)
+        return JsonResponse({'success': True, 'released': released})
+        
+    except Deal.DoesNotExist:
+        return JsonResponse({'success': False, 'error': 'Deal not found'}, status=404)
+    except Exception as e:
+        return JsonResponse({'success': False, 'error': str(e)}, status=500)
+
+# Fields returned by list views; leaves out the project reference list
+DEAL_LIST_FIELDS = [
+    'id', 'title', 'client_name', 'contact_info', 'requirements', 'description', 'status',
+    'budget', 'advance_payment', 'created_by', 'created_at', 'receipt_file',
+    'is_multiproject', 'verified_by', 'verified_at', 'rejection_reason', 'updated_at',
+    'claimed_by', 'lease_expires_at', 'projects_total', 'projects_completed', 'version'
+]
+
+
+def serialize_deal(d):
+    """Convert a deal to the JSON shape used by list_deals and the dashboards."""
+    return {
+        'id': str(d.id),
+        'title': d.title,
+        'client_name': d.client_name,
+        'contact_info': d.contact_info,
+        'requirements': d.requirements,
+        'description': d.description,
+        'status': d.status,
+        'budget': d.budget,
+        'advance_payment': d.advance_payment,
+        'created_by': d.created_by,
+        'created_at': d.created_at.isoformat(),
+        'receipt_file': d.receipt_file,
+        'is_multiproject': d.is_multiproject,
+        'verified_by': d.verified_by,
+        'verified_at': d.verified_at.isoformat() if d.verified_at else None,
+        'rejection_reason': d.rejection_reason,
+        'updated_at': d.updated_at.isoformat() if d.updated_at else None,
+        'version': d.version or 0,
+        # Only live leases; an expired one is free to be claimed again
+        'claimed_by': d.claimed_by if d.lease_expires_at and d.lease_expires_at > datetime.utcnow() else None,
+        'projects_total': d.projects_total,
+        'projects_completed': d.projects_completed,
+        'archived': getattr(d, '_archived', False)
+    }
+
+
+def parse_page(params):
+    """Return (page, page_size) from GET parameters; page_size is 0 when not paginating."""
+    try:
+        page = max(int(params.get('page', 1)), 1)
+        page_size = min(max(int(params.get('page_size', 0)), 0), settings.MAX_PAGE_SIZE)
+    except ValueError:
+        return 1, 0
+    return page, page_size
+
+# Coalesces concurrent list_deals calls with the same normalized query
+deal_list_flight = SingleFlight('list_deals')
+
+@mongo_guard
 def list_deals(request):
-    """List deals based on user role and status."""
+    """List deals based on user role and status.
+    
+    Pass page and page_size to fetch one page at a time; the response then
+    says whether more pages follow. Archived deals are left out unless
+    include_archived=1 is passed. Concurrent requests for the same list run
+    the query once (see prs.singleflight).
+    """
     if request.method != 'GET':
         return JsonResponse({'success': False, 'error': 'Invalid request method'}, status=405)
     
@@ -217,35 +416,42 @@ def list_deals(request):
         if status and status != 'all':
             query['status'] = status
         
-        deals = Deal.objects(**query).order_by('-created_at')
-        deal_list = [{
-            'id': str(d.id),
-            'title': d.title,
-            'client_name': d.client_name,
-            'contact_info': d.contact_info,
-            'requirements': d.requirements,
-            'description': d.description,
-            'status': d.status,
-            'budget': d.budget,
-            'advance_payment': d.advance_payment,
-            'created_by': d.created_by,
-            'created_at': d.created_at.isoformat(),
-            'receipt_file': d.receipt_file,
-            'is_multiproject': d.is_multiproject,
-            'verified_by': d.verified_by,
-            'verified_at': d.verified_at.isoformat() if d.verified_at else None,
-            'rejection_reason': d.rejection_reason
-        } for d in deals]
+        # Optional pagination: page (1-based) and page_size
+        page, page_size = parse_page(request.GET)
+        include_archived = request.GET.get('include_archived') == '1'
         
-        return JsonResponse({
-            'success': True,
-            'deals': deal_list
-        })
+        def execute():
+            deals = Deal.objects(**query).only(*DEAL_LIST_FIELDS).order_by('-created_at')
+            if include_archived:
+                deals = with_archived(deals, Deal, query, DEAL_LIST_FIELDS, '-created_at', page, page_size)
+            elif page_size:
+                deals = deals.skip((page - 1) * page_size).limit(page_size + 1)
+            
+            with span('hydrate'):
+                deal_list = [serialize_deal(d) for d in deals]
+            
+            has_more = bool(page_size) and len(deal_list) > page_size
+            if has_more:
+                deal_list = deal_list[:page_size]
+            
+            with span('encode'):
+                return JsonResponse({
+                    'success': True,
+                    'deals': deal_list,
+                    'page': page,
+                    'has_more': has_more
+                }).content
+        
+        # Identical lists requested at the same time (e.g. every verifier's
+        # pending queue) share one query and one encoded body
+        key = flight_key(query=query, page=page, page_size=page_size, include_archived=include_archived)
+        return HttpResponse(deal_list_flight.do(key, execute), content_type='application/json')
         
     except Exception as e:
         return JsonResponse({'success': False, 'error': str(e)}, status=500)
 
 @csrf_exempt
+@mongo_guard
 def delete_deal(request, deal_id):
     """Delete a deal if it's in draft or rejected status."""
     if request.method != 'POST':
@@ -284,9 +490,10 @@ def delete_deal(request, deal_id):
                 # Log error but continue with deletion
                 print(f"Error deleting receipt file: {e}")
         
-        # Delete any associated projects
-        for project in Project.objects(deal=deal):
-            project.delete()
+        # Delete any associated projects, leaving tombstones for incremental sync
+        projects = list(Project.objects(deal_id=str(deal.id)).only('id', 'supervisor', 'created_at'))
+        Tombstone.record_deal(deal, projects)
+        Project.objects(id__in=[p.id for p in projects]).delete()
         
         # Delete the deal
         deal.delete()
@@ -299,9 +506,66 @@ def delete_deal(request, deal_id):
     except Exception as e:
         return JsonResponse({'success': False, 'error': str(e)}, status=500)
 
+def _etag_matches(header, deal):
+    """True when an If-Match / If-None-Match header lists the deal's current ETag (weak or strong) or is '*'."""
+    tags = [tag.strip() for tag in header.split(',')]
+    return '*' in tags or deal.etag in [tag[2:] if tag.startswith('W/') else tag for tag in tags]
+
+
+def _precondition_failed(deal, status=412):
+    """Reject a stale edit, sending the current deal so the client can refresh without reloading."""
+    response = JsonResponse({
+        'success': False,
+        'error': 'This deal was changed since you loaded it. Review the latest version and try again.',
+        'deal': serialize_deal(deal)
+    }, status=status)
+    response['ETag'] = deal.etag
+    return response
+
+
+@mongo_guard
+def deal_detail(request, deal_id):
+    """Return one deal, with its version as the ETag.
+    
+    Answers 304 when If-None-Match names the current ETag. Archived deals
+    are returned too, marked archived.
+    """
+    if request.method != 'GET':
+        return JsonResponse({'success': False, 'error': 'Invalid request method'}, status=405)
+    
+    try:
+        deal = Deal.objects(id=deal_id).only(*DEAL_LIST_FIELDS).first()
+        if deal is None:
+            archived = find_archived(Deal, {'_id': ObjectId(deal_id)}, DEAL_LIST_FIELDS)
+            if not archived:
+                return JsonResponse({'success': False, 'error': 'Deal not found'}, status=404)
+            deal = archived[0]
+            deal._archived = True
+        
+        if_none_match = request.headers.get('If-None-Match')
+        if if_none_match and _etag_matches(if_none_match, deal):
+            response = HttpResponseNotModified()
+        else:
+            response = JsonResponse({'success': True, 'deal': serialize_deal(deal)})
+        response['ETag'] = deal.etag
+        return response
+        
+    except (ValidationError, InvalidId):
+        return JsonResponse({'success': False, 'error': 'Deal not found'}, status=404)
+    except Exception as e:
+        return JsonResponse({'success': False, 'error': str(e)}, status=500)
+
 @csrf_exempt
+@mongo_guard(timeout=settings.MONGODB_UPLOAD_TIMEOUT_SECONDS)
 def update_deal(request, deal_id):
-    """Update a deal with new information."""
+    """Update a deal with new information.
+    
+    Send the deal's ETag (from the list, detail or a previous update) as
+    If-Match; if the deal has changed since, nothing is written and the
+    response is 412 with the current deal. The edit is applied with one
+    update_one conditional on the version, so concurrent saves cannot
+    silently overwrite each other.
+    """
     if request.method != 'POST':
         return JsonResponse({'success': False, 'error': 'Invalid request method'}, status=405)
     
@@ -324,52 +588,338 @@ def update_deal(request, deal_id):
                 'error': f'Cannot update a deal with status: {deal.status}. Only draft or rejected deals can be updated.'
             }, status=403)
         
-        # Update deal fields from form data
-        deal.title = request.POST.get('title', deal.title)
-        deal.client_name = request.POST.get('client_name', deal.client_name)
-        deal.contact_info = request.POST.get('contact_info', deal.contact_info)
-        deal.budget = float(request.POST.get('budget', deal.budget))
-        deal.requirements = request.POST.get('requirements', deal.requirements)
-        deal.advance_payment = float(request.POST.get('advance_payment', deal.advance_payment or 0))
-        deal.description = request.POST.get('description', deal.description or '')
-        deal.is_multiproject = request.POST.get('is_multiproject', '').lower() == 'true'
-        
-        # Handle status setting (usually back to draft after edits)
-        if 'status' in request.POST:
-            requested_status = request.POST.get('status')
-            # Only allow setting back to draft status
-            if requested_status == 'draft':
-                deal.status = 'draft'
-        
-        # Handle receipt file update
+        # Refuse before saving any file if the client edited an older version
+        if_match = request.headers.get('If-Match')
+        if if_match and not _etag_matches(if_match, deal):
+            return _precondition_failed(deal)
+        
+        # Collect the changed fields from form data
+        changes = {}
+        for field in ('title', 'client_name', 'contact_info', 'requirements', 'description'):
+            if field in request.POST:
+                changes[field] = request.POST[field]
+        if 'budget' in request.POST:
+            changes['budget'] = float(request.POST['budget'])
+        if 'advance_payment' in request.POST:
+            changes['advance_payment'] = float(request.POST['advance_payment'] or 0)
+        changes['is_multiproject'] = request.POST.get('is_multiproject', '').lower() == 'true'
+        
+        # Save the new receipt file; the previous one is removed once the update has won
         receipt_file = request.FILES.get('receipt')
+        previous_receipt = deal.receipt_file
         if receipt_file:
-            # Delete previous receipt if it exists
-            if deal.receipt_file:
-                try:
-                    file_path = os.path.join(settings.MEDIA_ROOT, deal.receipt_file)
-                    if os.path.exists(file_path):
-                        os.remove(file_path)
-                except Exception as e:
-                    print(f"Error deleting previous receipt file: {e}")
-            
-            # Save new receipt file
             file_name = f"receipts/{datetime.now().strftime('%Y%m%d_%H%M%S')}_{receipt_file.name}"
-            receipt_path = default_storage.save(file_name, ContentFile(receipt_file.read()))
-            deal.receipt_file = receipt_path
+            changes['receipt_file'] = default_storage.save(file_name, ContentFile(receipt_file.read()))
         
-        # Update timestamp
-        deal.updated_at = datetime.utcnow()
+        if not deal.update_if_version(deal.version, **changes):
+            if receipt_file:
+                default_storage.delete(changes['receipt_file'])
+            current = Deal.objects.get(id=deal_id)
+            return _precondition_failed(current, status=412 if if_match else 409)
+        
+        if receipt_file and previous_receipt:
+            try:
+                file_path = os.path.join(settings.MEDIA_ROOT, previous_receipt)
+                if os.path.exists(file_path):
+                    os.remove(file_path)
+            except Exception as e:
+                print(f"Error deleting previous receipt file: {e}")
         
-        # Save the deal
-        deal.save()
+        # Handle status setting (usually back to draft after edits)
+        if request.POST.get('status') == 'draft' and deal.status != 'draft':
+            deal.reopen(username)
         
-        return JsonResponse({
+        response = JsonResponse({
             'success': True, 
             'message': 'Deal updated successfully',
-            'deal_id': str(deal.id)
+            'deal_id': str(deal.id),
+            'deal': serialize_deal(deal)
         })
+        response['ETag'] = deal.etag
+        return response
         
     except Exception as e:
         print(f"Error updating deal: {e}")
         return JsonResponse({'success': False, 'error': str(e)}, status=500)
+
+
+# Columns of the finance export, in output order
+EXPORT_COLUMNS = [
+    'id', 'title', 'client_name', 'created_by', 'status', 'budget',
+    'advance_payment', 'project_count', 'project_additional_fees',
+    'created_at', 'verified_by', 'verified_at'
+]
+
+# Deals fetched from the cursor per project-fee lookup
+EXPORT_BATCH_SIZE = 500
+
+# Server time allowed to the export cursor and to each fee lookup. The body
+# is streamed after the view returns, outside mongo_guard's deadline
+EXPORT_MAX_TIME_MS = 60 * 1000
+
+# Roles that may export every salesperson's deals; salespeople get their own
+EXPORT_ALL_ROLES = ('verifier', 'supervisor')
+
+
+class Echo:
+    """File-like object that hands back each written line instead of buffering it."""
+
+    def write(self, value):
+        return value
+
+
+def _parse_export_date(value):
+    """Parse a YYYY-MM-DD query parameter, returning None when absent."""
+    if not value:
+        return None
+    return datetime.strptime(value, '%Y-%m-%d')
+
+
+def _export_rows(deals):
+    """Yield CSV rows for deals, looking up project fees one batch at a time."""
+    while True:
+        batch = list(islice(deals, EXPORT_BATCH_SIZE))
+        if not batch:
+            return
+        
+        # One aggregation per batch instead of one query per deal
+        deal_ids = [str(d['_id']) for d in batch]
+        fees = {
+            row['_id']: row for row in Project.objects(deal_id__in=deal_ids).aggregate([
+                {'$group': {
+                    '_id': '$deal_id',
+                    'count': {'$sum': 1},
+                    'additional_fees': {'$sum': '$additional_fee'}
+                }}
+            ], maxTimeMS=EXPORT_MAX_TIME_MS)
+        }
+        
+        for d in batch:
+            project_fees = fees.get(str(d['_id']), {})
+            verified_at = d.get('verified_at')
+            yield [
+                str(d['_id']),
+                d.get('title', ''),
+                d.get('client_name', ''),
+                d.get('created_by', ''),
+                d.get('status', ''),
+                d.get('budget', 0),
+                d.get('advance_payment', 0),
+                project_fees.get('count', 0),
+                project_fees.get('additional_fees', 0),
+                d['created_at'].isoformat() if d.get('created_at') else '',
+                d.get('verified_by') or '',
+                verified_at.isoformat() if verified_at else ''
+            ]
+
+
+@mongo_guard
+def export_deals_csv(request):
+    """Stream deals as CSV for finance.
+    
+    The user and role come from the session: salespeople only export their
+    own deals, verifiers and supervisors export everyone's.
+    
+    GET parameters:
+    - status: Deal status to export (default verified, or "all")
+    - start, end: Inclusive YYYY-MM-DD range on the deal creation date
+    
+    Only deals in the hot collection are exported; deals moved to
+    deals_archive by archive_deals are left out.
+    """
+    if request.method != 'GET':
+        return JsonResponse({'success': False, 'error': 'Invalid request method'}, status=405)
+    
+    username = request.session.get('username')
+    role = request.session.get('role')
+    status = request.GET.get('status', 'verified')
+    
+    if not username:
+        return JsonResponse({'success': False, 'error': 'Login required'}, status=401)
+    
+    if role != 'salesperson' and role not in EXPORT_ALL_ROLES:
+        return JsonResponse({'success': False, 'error': 'This role cannot export deals'}, status=403)
+    
+    if status != 'all' and status not in Deal.status.choices:
+        return JsonResponse({'success': False, 'error': f'Invalid status: {status}'}, status=400)
+    
+    try:
+        start = _parse_export_date(request.GET.get('start'))
+        end = _parse_export_date(request.GET.get('end'))
+    except ValueError:
+        return JsonResponse({'success': False, 'error': 'Invalid date format. Use YYYY-MM-DD'}, status=400)
+    
+    query = {}
+    if role == 'salesperson':
+        query['created_by'] = username
+    if status != 'all':
+        query['status'] = status
+    if start:
+        query['created_at__gte'] = start
+    if end:
+        query['created_at__lt'] = end + timedelta(days=1)
+    
+    # Raw documents straight off an uncached cursor keep memory flat for any row
+    # count. Wrapped in a generator because iterating a no_cache queryset
+    # again rewinds it, and _export_rows iterates once per batch
+    queryset = (
+        Deal.objects(**query)
+        .no_cache()
+        .max_time_ms(EXPORT_MAX_TIME_MS)
+        .only('title', 'client_name', 'created_by', 'status', 'budget', 'advance_payment',
+              'created_at', 'verified_by', 'verified_at')
+        .order_by('created_at')
+        .as_pymongo()
+        .batch_size(EXPORT_BATCH_SIZE)
+    )
+    deals = (deal for deal in queryset)
+    
+    def stream():
+        writer = csv.writer(Echo())
+        # Header goes out before the query is sent so the client sees bytes immediately
+        yield writer.writerow(EXPORT_COLUMNS)
+        for row in _export_rows(deals):
+            yield writer.writerow(row)
+    
+    filename = f"deals_{status}_{datetime.utcnow().strftime('%Y%m%d')}.csv"
+    response = StreamingHttpResponse(stream(), content_type='text/csv')
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
+
+@mongo_guard
+def deal_history(request, deal_id):
+    """Return a deal's state transitions, oldest first."""
+    if request.method != 'GET':
+        return JsonResponse({'success': False, 'error': 'Invalid request method'}, status=405)
+    
+    try:
+        events = DealEvent.objects(deal_id=deal_id).order_by('ts')
+        return JsonResponse({
+            'success': True,
+            'deal_id': deal_id,
+            'events': [
+                {
+                    'type': e.type,
+                    'from_status': e.from_status,
+                    'to_status': e.to_status,
+                    'actor': e.actor,
+                    'ts': e.ts.isoformat(),
+                    'duration_ms': e.duration_ms,
+                    'reason': e.reason
+                } for e in events
+            ]
+        })
+    except Exception as e:
+        return JsonResponse({'success': False, 'error': str(e)}, status=500)
+
+
+# Percentiles reported by verification_turnaround
+TURNAROUND_PERCENTILES = [50, 90, 95, 99]
+
+TURNAROUND_GROUPS = {
+    'verifier': '$actor',
+    'salesperson': '$created_by',
+    'outcome': '$type'
+}
+
+
+def _percentile(values, pct):
+    """Nearest-rank percentile of an already sorted list."""
+    rank = max(1, -(-pct * len(values) // 100))
+    return values[rank - 1]
+
+
+def _turnaround_stats(match, group_key):
+    """Yield (group id, stats) for the decision events matching `match`.
+    
+    The percentiles are computed by the server with $percentile (MongoDB
+    7.0+), so no group ever holds its durations in one document or sends
+    them over the wire, and $group may spill to disk. mongomock has no
+    $percentile; under it, and only there, the sorted durations are pushed
+    and ranked in Python.
+    """
+    if not is_mongomock(DealEvent._get_collection().database.client):
+        pipeline = [
+            {'$match': match},
+            {'$group': {
+                '_id': group_key,
+                'count': {'$sum': 1},
+                'mean_ms': {'$avg': '$duration_ms'},
+                'min_ms': {'$min': '$duration_ms'},
+                'max_ms': {'$max': '$duration_ms'},
+                'percentiles': {'$percentile': {
+                    'input': '$duration_ms',
+                    'p': [pct / 100 for pct in TURNAROUND_PERCENTILES],
+                    'method': 'approximate'
+                }}
+            }},
+            {'$sort': {'_id': 1}}
+        ]
+        for row in DealEvent.objects.aggregate(pipeline, allowDiskUse=True):
+            stats = {'count': row['count'], 'mean_ms': round(row['mean_ms']), 'min_ms': row['min_ms'], 'max_ms': row['max_ms']}
+            stats.update({f'p{pct}_ms': round(value) for pct, value in zip(TURNAROUND_PERCENTILES, row['percentiles'])})
+            yield row['_id'], stats
+        return
+    
+    # Sorting before $group keeps each pushed list in ascending order
+    pipeline = [
+        {'$match': match},
+        {'$sort': {'duration_ms': 1}},
+        {'$group': {
+            '_id': group_key,
+            'count': {'$sum': 1},
+            'mean_ms': {'$avg': '$duration_ms'},
+            'durations': {'$push': '$duration_ms'}
+        }},
+        {'$sort': {'_id': 1}}
+    ]
+    for row in DealEvent.objects.aggregate(pipeline):
+        durations = row['durations']
+        stats = {'count': row['count'], 'mean_ms': round(row['mean_ms']), 'min_ms': durations[0], 'max_ms': durations[-1]}
+        stats.update({f'p{pct}_ms': _percentile(durations, pct) for pct in TURNAROUND_PERCENTILES})
+        yield row['_id'], stats
+
+
+@mongo_guard
+def verification_turnaround(request):
+    """Report how long deals wait in pending_verification before a decision.
+    
+    GET parameters:
+    - start, end: Optional YYYY-MM-DD bounds on the decision date (end inclusive)
+    - group_by: Optional verifier, salesperson or outcome
+    
+    Computed from the verified/rejected events in deal_events, which carry
+    the time since submission; the (type, ts) index serves the match.
+    Percentiles come from MongoDB's approximate $percentile.
+    """
+    if request.method != 'GET':
+        return JsonResponse({'success': False, 'error': 'Invalid request method'}, status=405)
+    
+    group_by = request.GET.get('group_by')
+    if group_by and group_by not in TURNAROUND_GROUPS:
+        return JsonResponse({'success': False, 'error': f'group_by must be one of {sorted(TURNAROUND_GROUPS)}'}, status=400)
+    try:
+        start = _parse_export_date(request.GET.get('start'))
+        end = _parse_export_date(request.GET.get('end'))
+    except ValueError:
+        return JsonResponse({'success': False, 'error': 'Invalid date format. Use YYYY-MM-DD'}, status=400)
+    
+    try:
+        match = {'type': {'$in': ['verified', 'rejected']}, 'duration_ms': {'$ne': None}}
+        if start or end:
+            match['ts'] = {}
+            if start:
+                match['ts']['$gte'] = start
+            if end:
+                match['ts']['$lt'] = end + timedelta(days=1)
+        
+        groups = []
+        for group, stats in _turnaround_stats(match, TURNAROUND_GROUPS[group_by] if group_by else None):
+            if group_by:
+                stats[group_by] = group
+            groups.append(stats)
+        
+        return JsonResponse({'success': True, 'group_by': group_by, 'turnaround': groups})
+    except Exception as e:
+        return JsonResponse({'success': False, 'error': str(e)}, status=500)
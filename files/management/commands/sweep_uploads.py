@@ -0,0 +1,44 @@
+import os
+
+from bson import ObjectId
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from files.models import UploadSession
+
+
+class Command(BaseCommand):
+    help = "Delete resumable-upload temp files whose upload session has expired or finished."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='List the files without deleting them')
+
+    def handle(self, *args, **options):
+        # Parts are named <upload id>.part; the TTL index drops sessions, not their files
+        parts = {}
+        with os.scandir(settings.UPLOAD_TEMP_DIR) as entries:
+            for entry in entries:
+                upload_id = entry.name[:-len('.part')]
+                if entry.is_file() and entry.name.endswith('.part') and ObjectId.is_valid(upload_id):
+                    parts[upload_id] = entry
+        
+        live = {str(i) for i in UploadSession.objects(id__in=list(parts), status='open').scalar('id')}
+        orphaned = [entry for upload_id, entry in parts.items() if upload_id not in live]
+        
+        freed = 0
+        for entry in orphaned:
+            size = entry.stat().st_size
+            if options['dry_run']:
+                self.stdout.write(f"  would delete {entry.name} ({size} bytes)")
+                continue
+            try:
+                os.remove(entry.path)
+                freed += size
+            except FileNotFoundError:
+                # Finalized, and so moved away, since the scan
+                pass
+        
+        if options['dry_run']:
+            self.stdout.write(f"{len(orphaned)} orphaned part(s) of {len(parts)}")
+            return
+        self.stdout.write(self.style.SUCCESS(f"Deleted {len(orphaned)} orphaned part(s), {freed} bytes"))
@@ -0,0 +1,28 @@
+from django.db import models
+from mongoengine import Document, StringField, DateTimeField, IntField
+from datetime import datetime
+
+class UploadSession(Document):
+    """A resumable upload in progress; bytes live in UPLOAD_TEMP_DIR/<id>.part until finalized."""
+    username = StringField(required=True)
+    filename = StringField(required=True)
+    size = IntField(required=True, min_value=0)
+    received = IntField(default=0)  # Length of the contiguous prefix written so far
+    
+    # What the finished file is attached to
+    target = StringField(choices=["deal", "project"], required=True)
+    target_id = StringField(required=True)
+    purpose = StringField(choices=["receipt", "file"], default="receipt")
+    
+    status = StringField(choices=["open", "complete"], default="open")
+    path = StringField()  # MEDIA_ROOT-relative path once finalized
+    created_at = DateTimeField(default=datetime.utcnow)
+    updated_at = DateTimeField(default=datetime.utcnow)
+
+    meta = {
+        'collection': 'upload_sessions',
+        'indexes': [
+            # Abandoned sessions expire a day after their last chunk
+            {'fields': ['updated_at'], 'expireAfterSeconds': 24 * 60 * 60}
+        ]
+    }
@@ -0,0 +1,218 @@
+import hashlib
+import io
+import os
+import tempfile
+import threading
+import zipfile
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import FileSystemStorage
+from django.test import Client, SimpleTestCase, override_settings
+
+from deals.models import Deal
+from files.models import UploadSession
+from files.views import _parse_range, _upload_temp_path
+from files.writer import persist_files
+from files.zipstream import ZIP_CHUNK_SIZE, iter_directory, stream_zip
+from prs.testing import MongoTestCase, make_deal
+
+
+class ParseRangeTests(SimpleTestCase):
+
+    def test_whole_file_without_a_supported_range(self):
+        self.assertIsNone(_parse_range(None, 1000))
+        self.assertIsNone(_parse_range('', 1000))
+        self.assertIsNone(_parse_range('bytes=-', 1000))
+        # Multiple ranges and other units are answered with the whole file
+        self.assertIsNone(_parse_range('bytes=0-1,5-6', 1000))
+        self.assertIsNone(_parse_range('items=0-5', 1000))
+
+    def test_explicit_and_open_ended_ranges(self):
+        self.assertEqual(_parse_range('bytes=0-99', 1000), (0, 99))
+        self.assertEqual(_parse_range('bytes=900-', 1000), (900, 999))
+        self.assertEqual(_parse_range(' bytes=10-10 ', 1000), (10, 10))
+        # The end is clamped to the last byte
+        self.assertEqual(_parse_range('bytes=500-5000', 1000), (500, 999))
+
+    def test_suffix_ranges(self):
+        self.assertEqual(_parse_range('bytes=-100', 1000), (900, 999))
+        self.assertEqual(_parse_range('bytes=-5000', 1000), (0, 999))
+
+    def test_unsatisfiable_ranges(self):
+        for header in ('bytes=1000-', 'bytes=2000-3000', 'bytes=5-2', 'bytes=-0'):
+            with self.subTest(header=header):
+                with self.assertRaises(ValueError):
+                    _parse_range(header, 1000)
+        with self.assertRaises(ValueError):
+            _parse_range('bytes=0-', 0)
+
+
+class RecordingStorage(FileSystemStorage):
+    """Storage that notes which threads wrote and can fail one name."""
+
+    def __init__(self, *args, fail=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.fail = fail
+        self.threads = set()
+        self.barrier = None
+
+    def _save(self, name, content):
+        self.threads.add(threading.current_thread().name)
+        if self.barrier:
+            # Every write must be in flight at once to get past this
+            self.barrier.wait(5)
+        if name == self.fail:
+            raise OSError('disk full')
+        return super()._save(name, content)
+
+
+class PersistFilesTests(SimpleTestCase):
+
+    def setUp(self):
+        root = tempfile.TemporaryDirectory()
+        self.addCleanup(root.cleanup)
+        self.root = root.name
+
+    def jobs(self, count, size):
+        return [(f'project/file{i}.bin', ContentFile(os.urandom(size), name=f'file{i}.bin')) for i in range(count)]
+
+    @override_settings(FILE_WRITE_WORKERS=3, FILE_FSYNC='full')
+    def test_files_are_written_in_parallel_chunk_by_chunk(self):
+        storage = RecordingStorage(location=self.root)
+        storage.barrier = threading.Barrier(3)
+        # Several chunks per file
+        jobs = self.jobs(3, ContentFile.DEFAULT_CHUNK_SIZE * 2 + 100)
+
+        stored = persist_files(jobs, storage)
+
+        self.assertEqual(len(storage.threads), 3)
+        self.assertEqual([s.name for s in stored], [name for name, _ in jobs])
+        for saved, (_, file) in zip(stored, jobs):
+            file.seek(0)
+            content = file.read()
+            self.assertEqual((saved.size, saved.sha256), (len(content), hashlib.sha256(content).hexdigest()))
+            with open(os.path.join(self.root, saved.name), 'rb') as f:
+                self.assertEqual(f.read(), content)
+
+    @override_settings(FILE_WRITE_WORKERS=1)
+    def test_failed_write_removes_the_files_already_written(self):
+        storage = RecordingStorage(location=self.root, fail='project/file1.bin')
+        with self.assertRaisesMessage(OSError, 'disk full'):
+            persist_files(self.jobs(3, 10), storage)
+        self.assertEqual(os.listdir(os.path.join(self.root, 'project')), [])
+
+    def test_no_jobs(self):
+        self.assertEqual(persist_files([], FileSystemStorage(location=self.root)), [])
+
+
+class StreamZipTests(SimpleTestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+
+    def write(self, name, data):
+        path = os.path.join(self.directory.name, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as f:
+            f.write(data)
+        return path
+
+    def test_archive_round_trips(self):
+        text = b'receipt line\n' * 20000
+        image = os.urandom(ZIP_CHUNK_SIZE * 2 + 17)
+        self.write('notes.txt', text)
+        self.write('scans/photo.jpg', image)
+        self.write('empty.csv', b'')
+
+        chunks = list(stream_zip(iter_directory(self.directory.name)))
+        # Yielded as it goes rather than as one buffer
+        self.assertGreater(len(chunks), 2)
+
+        with zipfile.ZipFile(io.BytesIO(b''.join(chunks))) as archive:
+            self.assertIsNone(archive.testzip())
+            self.assertEqual(archive.namelist(), ['empty.csv', 'notes.txt', 'scans/photo.jpg'])
+            self.assertEqual(archive.read('notes.txt'), text)
+            self.assertEqual(archive.read('scans/photo.jpg'), image)
+            self.assertEqual(archive.read('empty.csv'), b'')
+            # Already-compressed formats are stored, the rest deflated
+            self.assertEqual(archive.getinfo('scans/photo.jpg').compress_type, zipfile.ZIP_STORED)
+            self.assertEqual(archive.getinfo('notes.txt').compress_type, zipfile.ZIP_DEFLATED)
+
+    def test_files_older_than_1980_are_dated_1980(self):
+        path = self.write('old.txt', b'x')
+        os.utime(path, (0, 0))
+
+        with zipfile.ZipFile(io.BytesIO(b''.join(stream_zip([('old.txt', path)])))) as archive:
+            self.assertEqual(archive.getinfo('old.txt').date_time, (1980, 1, 1, 0, 0, 0))
+
+
+class ResumableUploadTests(MongoTestCase):
+
+    def setUp(self):
+        super().setUp()
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        os.makedirs(os.path.join(media.name, 'uploads_tmp'))
+        overrides = override_settings(MEDIA_ROOT=media.name, UPLOAD_TEMP_DIR=os.path.join(media.name, 'uploads_tmp'))
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+
+        self.client = Client(enforce_csrf_checks=True)
+        self.client.cookies[settings.CSRF_COOKIE_NAME] = 'a' * 32
+        self.csrf = {'HTTP_X_CSRFTOKEN': 'a' * 32}
+        self.login('sales1', 'salesperson')
+        self.deal = make_deal()
+
+    def init(self, **fields):
+        data = {'filename': 'r.pdf', 'size': 3, 'target': 'deal', 'target_id': str(self.deal.id), **fields}
+        return self.client.post('/api/uploads/', data, content_type='application/json', **self.csrf)
+
+    def upload(self, body=b'pdf'):
+        upload_id = self.init(size=len(body)).json()['upload_id']
+        response = self.client.put(f'/api/uploads/{upload_id}/chunk/?offset=0', body,
+                                   content_type='application/octet-stream', **self.csrf)
+        self.assertEqual(response.status_code, 200)
+        return upload_id
+
+    def test_upload_endpoints_require_the_csrf_token(self):
+        self.csrf = {}
+        self.assertEqual(self.init().status_code, 403)
+        self.assertEqual(UploadSession.objects.count(), 0)
+
+    def test_finalize_attaches_the_receipt(self):
+        upload_id = self.upload()
+        response = self.client.post(f'/api/uploads/{upload_id}/finalize/', **self.csrf)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['status'], 'complete')
+        self.deal.reload()
+        self.assertEqual(self.deal.receipt_file, response.json()['path'])
+        with open(os.path.join(settings.MEDIA_ROOT, self.deal.receipt_file), 'rb') as f:
+            self.assertEqual(f.read(), b'pdf')
+
+    def test_unknown_target_is_404(self):
+        self.assertEqual(self.init(target_id='not-an-id').status_code, 404)
+        self.assertEqual(self.init(target_id='0' * 24).status_code, 404)
+
+        upload_id = self.upload()
+        Deal.objects(id=self.deal.id).delete()
+        self.assertEqual(self.client.post(f'/api/uploads/{upload_id}/finalize/', **self.csrf).status_code, 404)
+
+    def test_finalize_that_loses_the_race_is_409(self):
+        upload_id = self.upload()
+        # Another finalize has already moved the temp file and not yet marked the upload complete
+        os.remove(_upload_temp_path(UploadSession.objects.get(id=upload_id)))
+
+        response = self.client.post(f'/api/uploads/{upload_id}/finalize/', **self.csrf)
+        self.assertEqual(response.status_code, 409)
+        self.deal.reload()
+        self.assertIsNone(self.deal.receipt_file)
+
+    def test_repeated_finalize_returns_the_finished_upload(self):
+        upload_id = self.upload()
+        first = self.client.post(f'/api/uploads/{upload_id}/finalize/', **self.csrf)
+        second = self.client.post(f'/api/uploads/{upload_id}/finalize/', **self.csrf)
+        self.assertEqual(second.status_code, 200)
+        self.assertEqual(second.json()['path'], first.json()['path'])
@@ -0,0 +1,605 @@
+import hashlib
+import json
+import mimetypes
+import os
+import re
+from datetime import datetime
+from urllib.parse import quote
+
+from bson import ObjectId
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.utils.text import get_valid_filename
+from django.http import FileResponse, HttpResponse, JsonResponse, StreamingHttpResponse
+from django.utils.http import http_date
+
+from deals.archive import find_archived
+from deals.models import Deal
+from files.models import UploadSession
+from files.zipstream import iter_directory, stream_zip
+from projects.models import Project, ProjectFile
+
+# Chunk size for ranged reads that cannot use sendfile
+RANGE_CHUNK_SIZE = 64 * 1024
+
+SINGLE_RANGE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+# Deal statuses whose receipt may be replaced, as in update_deal
+RECEIPT_EDITABLE_STATUSES = ['draft', 'rejected']
+
+
+def resolve_media_path(name):
+    """Return the absolute path for a MEDIA_ROOT-relative name, or None if it escapes MEDIA_ROOT."""
+    root = os.path.realpath(settings.MEDIA_ROOT)
+    path = os.path.realpath(os.path.join(root, name))
+    if not path.startswith(root + os.sep):
+        return None
+    return path
+
+
+def find_project(query, fields=None):
+    """First project matching a raw filter, looking in the archive when it is not in the hot collection."""
+    projects = Project.objects(__raw__=query)
+    project = (projects.only(*fields) if fields else projects).first()
+    if project is None:
+        archived = find_archived(Project, query, fields, limit=1)
+        project = archived[0] if archived else None
+    return project
+
+
+def project_deal(project):
+    """The deal a project belongs to, hot or archived (archived projects move with their deal)."""
+    deal = Deal.objects(id=project.deal_id).only('id', 'created_by').first()
+    if deal is None and ObjectId.is_valid(project.deal_id):
+        archived = find_archived(Deal, {'_id': ObjectId(project.deal_id)}, ['id', 'created_by'], limit=1)
+        deal = archived[0] if archived else None
+    return deal
+
+
+def find_owner(name):
+    """Find the (deal, project) a stored file belongs to; either may be None.
+    
+    Receipts are referenced by path from a Deal or Project; project uploads
+    live in the directory recorded in Project.files. Archived deals and
+    projects still own their files.
+    """
+    if name.startswith('receipts/'):
+        deal = Deal.objects(receipt_file=name).only('id', 'created_by').first()
+        if deal:
+            return deal, None
+        archived = find_archived(Deal, {'receipt_file': name}, ['id', 'created_by'], limit=1)
+        if archived:
+            return archived[0], None
+        project = find_project({'receipt_file': name})
+        if project:
+            return project_deal(project), project
+    elif name.startswith('project_files/'):
+        project = find_project({'files': os.path.dirname(name)})
+        if project:
+            return project_deal(project), project
+    return None, None
+
+
+def can_access(username, role, deal, project):
+    """Check whether a user may download a file owned by deal and/or project.
+    
+    Salespeople see files of their own deals, verifiers see every deal's
+    files, and supervisors see the files of projects assigned to them.
+    """
+    if role == 'salesperson':
+        return deal is not None and deal.created_by == username
+    if role == 'verifier':
+        return deal is not None
+    if role == 'supervisor':
+        return project is not None and project.supervisor == username
+    return False
+
+
+def _parse_range(header, size):
+    """Parse a single-range Range header into (start, end) inclusive.
+    
+    Returns None to serve the whole file (no header, or a form we do not
+    support such as multiple ranges) and raises ValueError when the range
+    cannot be satisfied.
+    """
+    match = SINGLE_RANGE.match(header.strip()) if header else None
+    if not match or match.groups() == ('', ''):
+        return None
+    first, last = match.groups()
+    if first:
+        start = int(first)
+        end = min(int(last), size - 1) if last else size - 1
+    else:
+        # Suffix range: the final N bytes
+        start = max(size - int(last), 0)
+        end = size - 1
+    if start > end or start >= size:
+        raise ValueError(header)
+    return start, end
+
+
+def _read_range(path, start, length):
+    with open(path, 'rb') as f:
+        f.seek(start)
+        while length > 0:
+            chunk = f.read(min(RANGE_CHUNK_SIZE, length))
+            if not chunk:
+                break
+            length -= len(chunk)
+            yield chunk
+
+
+def serve_media(request, name, path, as_attachment=False):
+    """Send a media file, handing the transfer to the front proxy when one is configured.
+    
+    With MEDIA_ACCEL_REDIRECT set to 'x-accel-redirect' (nginx) or 'x-sendfile'
+    (Apache, lighttpd) the response carries only headers and the proxy sends
+    the bytes. Otherwise whole files go out through FileResponse, which lets
+    the WSGI server use sendfile, and single byte ranges are answered with 206.
+    """
+    filename = os.path.basename(path)
+    content_type = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+    disposition = 'attachment' if as_attachment else 'inline'
+    disposition = f"{disposition}; filename*=UTF-8''{quote(filename)}"
+    
+    if settings.MEDIA_ACCEL_REDIRECT == 'x-accel-redirect':
+        response = HttpResponse(content_type=content_type)
+        response['X-Accel-Redirect'] = quote(settings.MEDIA_ACCEL_PREFIX + name)
+        response['Content-Disposition'] = disposition
+        return response
+    if settings.MEDIA_ACCEL_REDIRECT == 'x-sendfile':
+        response = HttpResponse(content_type=content_type)
+        response['X-Sendfile'] = path
+        response['Content-Disposition'] = disposition
+        return response
+    
+    stat = os.stat(path)
+    size = stat.st_size
+    etag = f'"{stat.st_mtime_ns:x}-{size:x}"'
+    
+    byte_range = None
+    if_range = request.headers.get('If-Range')
+    if not if_range or if_range in (etag, http_date(stat.st_mtime)):
+        try:
+            byte_range = _parse_range(request.headers.get('Range'), size)
+        except ValueError:
+            response = HttpResponse(status=416)
+            response['Content-Range'] = f'bytes */{size}'
+            return response
+    
+    if byte_range:
+        start, end = byte_range
+        response = StreamingHttpResponse(_read_range(path, start, end - start + 1), status=206, content_type=content_type)
+        response['Content-Range'] = f'bytes {start}-{end}/{size}'
+        response['Content-Length'] = str(end - start + 1)
+    else:
+        response = FileResponse(open(path, 'rb'), content_type=content_type)
+    
+    response['Content-Disposition'] = disposition
+    response['Accept-Ranges'] = 'bytes'
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(stat.st_mtime)
+    response['Cache-Control'] = 'private, max-age=3600'
+    return response
+
+
+def download_file(request, name):
+    """Download a receipt or project upload after checking the requester may see it.
+    
+    The requester is the user logged in to the session. Pass ?download=1 to
+    force a save dialog instead of showing the file inline.
+    """
+    if request.method not in ('GET', 'HEAD'):
+        return JsonResponse({'success': False, 'error': 'Invalid request method'}, status=405)
+    
+    username = request.session.get('username')
+    role = request.session.get('role')
+    if not username:
+        return JsonResponse({'success': False, 'error': 'Login required'}, status=401)
+    
+    path = resolve_media_path(name)
+    if path is None:
+        return JsonResponse({'success': False, 'error': 'File not found'}, status=404)
+    
+    try:
+        deal, project = find_owner(name)
+        if deal is None and project is None:
+            return JsonResponse({'success': False, 'error': 'File not found'}, status=404)
+        if not can_access(username, role, deal, project):
+            return JsonResponse({'success': False, 'error': 'You do not have access to this file'}, status=403)
+        if not os.path.isfile(path):
+            return JsonResponse({'success': False, 'error': 'File not found'}, status=404)
+        
+        return serve_media(request, name, path, as_attachment=request.GET.get('download') == '1')
+    except Exception as e:
+        return JsonResponse({'success': False, 'error': str(e)}, status=500)
+
+
+def download_project_zip(request, project_id):
+    """Stream every uploaded file of a project as one zip archive.
+    
+    The archive is built while it is sent, so the first bytes go out
+    immediately and memory use does not grow with the size of the folder.
+    """
+    if request.method not in ('GET', 'HEAD'):
+        return JsonResponse({'success': False, 'error': 'Invalid request method'}, status=405)
+    
+    username = request.session.get('username')
+    role = request.session.get('role')
+    if not username:
+        return JsonResponse({'success': False, 'error': 'Login required'}, status=401)
+    
+    try:
+        project = find_project({'_id': ObjectId(project_id)}) if ObjectId.is_valid(project_id) else None
+        if project is None:
+            return JsonResponse({'success': False, 'error': 'Project not found'}, status=404)
+        deal = project_deal(project)
+        if not can_access(username, role, deal, project):
+            return JsonResponse({'success': False, 'error': 'You do not have access to this project'}, status=403)
+        
+        directory = resolve_media_path(project.files) if project.files else None
+        if directory is None or not os.path.isdir(directory):
+            return JsonResponse({'success': False, 'error': 'Project has no files'}, status=404)
+        
+        # Projects created before the manifest existed fall back to walking the directory
+        if project.manifest:
+            entries = [(f.name, os.path.join(directory, f.name)) for f in project.manifest]
+        else:
+            entries = iter_directory(directory)
+        
+        filename = f"{project.name or 'project'}-files.zip"
+        response = StreamingHttpResponse(stream_zip(entries), content_type='application/zip')
+        response['Content-Disposition'] = f"attachment; filename*=UTF-8''{quote(filename)}"
+        response['Cache-Control'] = 'private, no-store'
+        return response
+    except Exception as e:
+        return JsonResponse({'success': False, 'error': str(e)}, status=500)
+
+
+def list_project_files(request, project_id):
+    """List a project's uploaded files from its manifest.
+    
+    Answers from the database alone; the media volume is not touched.
+    """
+    if request.method != 'GET':
+        return JsonResponse({'success': False, 'error': 'Invalid request method'}, status=405)
+    
+    username = request.session.get('username')
+    role = request.session.get('role')
+    if not username:
+        return JsonResponse({'success': False, 'error': 'Login required'}, status=401)
+    
+    try:
+        project = None
+        if ObjectId.is_valid(project_id):
+            project = find_project({'_id': ObjectId(project_id)}, ['id', 'deal_id', 'supervisor', 'files', 'manifest'])
+        if project is None:
+            return JsonResponse({'success': False, 'error': 'Project not found'}, status=404)
+        deal = project_deal(project)
+        if not can_access(username, role, deal, project):
+            return JsonResponse({'success': False, 'error': 'You do not have access to this project'}, status=403)
+        
+        files = [
+            {**f.to_dict(), 'url': f'/api/files/{project.files}/{quote(f.name)}'}
+            for f in project.manifest
+        ]
+        return JsonResponse({
+            'success': True,
+            'project_id': str(project.id),
+            'files': files,
+            'count': len(files),
+            'total_size': sum(f.size for f in project.manifest)
+        })
+    except Exception as e:
+        return JsonResponse({'success': False, 'error': str(e)}, status=500)
+
+
+def _upload_temp_path(upload):
+    return os.path.join(settings.UPLOAD_TEMP_DIR, f'{upload.id}.part')
+
+
+def _upload_state(upload):
+    return {
+        'upload_id': str(upload.id),
+        'filename': upload.filename,
+        'size': upload.size,
+        'offset': upload.received,
+        'status': upload.status,
+        'path': upload.path
+    }
+
+
+def _load_upload(request, upload_id):
+    """Return (upload, error response) for an upload owned by the session user."""
+    username = request.session.get('username')
+    if not username:
+        return None, JsonResponse({'success': False, 'error': 'Login required'}, status=401)
+    upload = UploadSession.objects(id=upload_id, username=username).first()
+    if upload is None:
+        return None, JsonResponse({'success': False, 'error': 'Upload not found'}, status=404)
+    return upload, None
+
+
+def can_upload(username, role, deal, project):
+    """Salespeople attach files to their own deals and projects; supervisors to projects assigned to them."""
+    if role == 'salesperson':
+        return deal is not None and deal.created_by == username
+    if role == 'supervisor':
+        return project is not None and project.supervisor == username
+    return False
+
+
+# Function: Start a resumable upload
+# POST: {"filename": str, "size": int, "target": "deal"|"project", "target_id": str, "purpose": "receipt"|"file"}
+def init_upload(request):
+    """Start a resumable upload and reserve its temp file.
+    
+    The client then sends the bytes with upload_chunk, in as many requests as
+    it likes, and calls finalize_upload once offset reaches size. After a
+    dropped connection, GET upload_status tells it where to resume.
+    """
+    if request.method != 'POST':
+        return JsonResponse({'success': False, 'error': 'Invalid request method'}, status=405)
+    
+    username = request.session.get('username')
+    role = request.session.get('role')
+    if not username:
+        return JsonResponse({'success': False, 'error': 'Login required'}, status=401)
+    
+    try:
+        data = json.loads(request.body)
+        filename = get_valid_filename(os.path.basename(data.get('filename') or ''))
+        target = data.get('target')
+        target_id = data.get('target_id')
+        purpose = data.get('purpose', 'receipt')
+        try:
+            size = int(data.get('size'))
+        except (TypeError, ValueError):
+            return JsonResponse({'success': False, 'error': 'size must be an integer'}, status=400)
+        
+        if not (filename and target in ('deal', 'project') and target_id):
+            return JsonResponse({'success': False, 'error': 'Missing required fields: filename, size, target, target_id'}, status=400)
+        if purpose not in ('receipt', 'file') or (target == 'deal' and purpose != 'receipt'):
+            return JsonResponse({'success': False, 'error': 'Invalid purpose for target'}, status=400)
+        if size < 0 or size > settings.UPLOAD_MAX_FILE_SIZE:
+            return JsonResponse({'success': False, 'error': f'size must be between 0 and {settings.UPLOAD_MAX_FILE_SIZE}'}, status=400)
+        if not ObjectId.is_valid(target_id):
+            return JsonResponse({'success': False, 'error': f'{target.capitalize()} not found'}, status=404)
+        
+        if target == 'deal':
+            deal, project = Deal.objects(id=target_id).only('id', 'created_by', 'status').first(), None
+        else:
+            project = Project.objects(id=target_id).first()
+            deal = Deal.objects(id=project.deal_id).only('id', 'created_by').first() if project else None
+        if deal is None and project is None:
+            return JsonResponse({'success': False, 'error': f'{target.capitalize()} not found'}, status=404)
+        if not can_upload(username, role, deal, project):
+            return JsonResponse({'success': False, 'error': 'You cannot upload files here'}, status=403)
+        if target == 'deal' and deal.status not in RECEIPT_EDITABLE_STATUSES:
+            return JsonResponse({'success': False, 'error': f'Cannot replace the receipt of a deal with status: {deal.status}'}, status=403)
+        
+        upload = UploadSession(
+            username=username,
+            filename=filename,
+            size=size,
+            target=target,
+            target_id=target_id,
+            purpose=purpose
+        )
+        upload.save()
+        
+        # Allocate the whole file up front so chunks can land at any offset
+        fd = os.open(_upload_temp_path(upload), os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        try:
+            os.ftruncate(fd, size)
+        finally:
+            os.close(fd)
+        
+        return JsonResponse({
+            'success': True,
+            'max_chunk_size': settings.UPLOAD_MAX_CHUNK_SIZE,
+            **_upload_state(upload)
+        }, status=201)
+    except json.JSONDecodeError:
+        return JsonResponse({'success': False, 'error': 'Invalid JSON'}, status=400)
+    except Exception as e:
+        return JsonResponse({'success': False, 'error': str(e)}, status=500)
+
+
+def upload_status(request, upload_id):
+    """Report how many bytes of an upload have been received, so the client knows where to resume."""
+    if request.method != 'GET':
+        return JsonResponse({'success': False, 'error': 'Invalid request method'}, status=405)
+    
+    try:
+        upload, error = _load_upload(request, upload_id)
+        if error:
+            return error
+        return JsonResponse({'success': True, **_upload_state(upload)})
+    except Exception as e:
+        return JsonResponse({'success': False, 'error': str(e)}, status=500)
+
+
+# Function: Write one chunk of a resumable upload
+# PUT/POST: raw bytes, ?offset=<int> (or an Upload-Offset header)
+def upload_chunk(request, upload_id):
+    """Write the request body into the upload's temp file at the given offset.
+    
+    The body is copied to disk with pwrite as it is read, so a chunk never
+    sits in memory whole. Offsets may repeat (a retried chunk just rewrites
+    the same bytes) but may not skip past what has been received.
+    """
+    if request.method not in ('PUT', 'POST'):
+        return JsonResponse({'success': False, 'error': 'Invalid request method'}, status=405)
+    
+    try:
+        upload, error = _load_upload(request, upload_id)
+        if error:
+            return error
+        if upload.status != 'open':
+            return JsonResponse({'success': False, 'error': 'Upload is already finalized'}, status=409)
+        
+        # Without a length (chunked transfer encoding) the body cannot be read to its end
+        if not request.headers.get('Content-Length'):
+            return JsonResponse({'success': False, 'error': 'Content-Length is required'}, status=411)
+        try:
+            offset = int(request.GET.get('offset', request.headers.get('Upload-Offset', '')))
+            length = int(request.headers['Content-Length'])
+        except ValueError:
+            return JsonResponse({'success': False, 'error': 'offset and Content-Length must be integers'}, status=400)
+        if offset < 0 or offset > upload.received:
+            return JsonResponse({'success': False, 'error': 'Offset does not match received bytes', 'offset': upload.received}, status=409)
+        if length > settings.UPLOAD_MAX_CHUNK_SIZE:
+            return JsonResponse({'success': False, 'error': f'Chunk larger than {settings.UPLOAD_MAX_CHUNK_SIZE} bytes'}, status=413)
+        if offset + length > upload.size:
+            return JsonResponse({'success': False, 'error': 'Chunk extends past the declared size'}, status=400)
+        
+        written = 0
+        fd = os.open(_upload_temp_path(upload), os.O_WRONLY)
+        try:
+            while written < length:
+                data = request.read(min(RANGE_CHUNK_SIZE, length - written))
+                if not data:
+                    break
+                view = memoryview(data)
+                while view:
+                    n = os.pwrite(fd, view, offset + written)
+                    view = view[n:]
+                    written += n
+        finally:
+            os.close(fd)
+        
+        # Only advance the contiguous prefix; concurrent retries cannot move it backwards
+        UploadSession.objects(id=upload.id).update_one(
+            __raw__={'$max': {'received': offset + written}, '$set': {'updated_at': datetime.utcnow()}}
+        )
+        upload.reload()
+        
+        if written < length:
+            return JsonResponse({'success': False, 'error': 'Connection closed mid-chunk', **_upload_state(upload)}, status=400)
+        return JsonResponse({'success': True, **_upload_state(upload)})
+    except Exception as e:
+        return JsonResponse({'success': False, 'error': str(e)}, status=500)
+
+
+# Function: Finish a resumable upload and attach the file
+# POST: {"sha256": str} (optional)
+def finalize_upload(request, upload_id):
+    """Move a fully received upload into MEDIA_ROOT and attach it to its deal or project.
+    
+    The temp file is fsynced and renamed into place, so readers never see a
+    partial file. Receipts replace the deal's or project's receipt_file
+    (a deal's only while it is a draft or rejected, like update_deal);
+    project files are added to the project's upload directory. Of two
+    concurrent finalizes only one moves the file; the other gets 409, or
+    the finished state once the first has completed.
+    """
+    if request.method != 'POST':
+        return JsonResponse({'success': False, 'error': 'Invalid request method'}, status=405)
+    
+    try:
+        upload, error = _load_upload(request, upload_id)
+        if error:
+            return error
+        if upload.status == 'complete':
+            return JsonResponse({'success': True, **_upload_state(upload)})
+        if upload.received < upload.size:
+            return JsonResponse({'success': False, 'error': 'Upload is incomplete', **_upload_state(upload)}, status=409)
+        if not ObjectId.is_valid(upload.target_id):
+            return JsonResponse({'success': False, 'error': f'{upload.target.capitalize()} not found'}, status=404)
+        
+        data = json.loads(request.body) if request.content_type == 'application/json' and request.body else request.POST
+        temp_path = _upload_temp_path(upload)
+        
+        # Project files need the digest for the manifest anyway
+        digest = None
+        if data.get('sha256') or upload.purpose == 'file':
+            digest = hashlib.sha256()
+            with open(temp_path, 'rb') as f:
+                for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                    digest.update(chunk)
+            digest = digest.hexdigest()
+            if data.get('sha256') and digest != data['sha256'].lower():
+                return JsonResponse({'success': False, 'error': 'Checksum mismatch'}, status=422)
+        
+        # Work out where the file goes and what it replaces
+        stamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+        if upload.target == 'deal':
+            owner = Deal.objects.get(id=upload.target_id)
+            if owner.created_by != upload.username:
+                return JsonResponse({'success': False, 'error': 'Unauthorized: You can only update your own deals'}, status=403)
+            if owner.status not in RECEIPT_EDITABLE_STATUSES:
+                return JsonResponse({'success': False, 'error': f'Cannot replace the receipt of a deal with status: {owner.status}'}, status=403)
+            name = f"receipts/{stamp}_{upload.filename}"
+        else:
+            owner = Project.objects.get(id=upload.target_id)
+            if upload.purpose == 'receipt':
+                name = f"receipts/project_{stamp}_{upload.filename}"
+            else:
+                project_dir = owner.files or f"project_files/{owner.deal_id}/{stamp}"
+                name = f"{project_dir}/{upload.filename}"
+        name = default_storage.get_available_name(name)
+        final_path = resolve_media_path(name)
+        
+        fd = os.open(temp_path, os.O_RDONLY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+        os.makedirs(os.path.dirname(final_path), exist_ok=True)
+        os.replace(temp_path, final_path)
+        
+        if upload.purpose == 'receipt':
+            previous_receipt = owner.receipt_file
+            if upload.target == 'deal':
+                # Only lands if the deal is still at the version checked above,
+                # so it cannot have been submitted or verified in between
+                if not owner.update_if_version(owner.version, receipt_file=name):
+                    os.replace(final_path, temp_path)
+                    return JsonResponse({'success': False, 'error': 'Deal changed while the upload was finalized; try again', **_upload_state(upload)}, status=409)
+            else:
+                owner.receipt_file = name
+                owner.updated_at = datetime.utcnow()
+                owner.save()
+            
+            # Delete previous receipt if it exists
+            if previous_receipt:
+                try:
+                    previous = resolve_media_path(previous_receipt)
+                    if previous and os.path.exists(previous):
+                        os.remove(previous)
+                except Exception as e:
+                    print(f"Error deleting previous receipt file: {e}")
+        else:
+            # Push rather than save so concurrent finalizes do not drop each other's entries
+            project_dir = os.path.dirname(name)
+            Project.objects(id=owner.id).update_one(
+                set__files=project_dir,
+                push__manifest=ProjectFile(
+                    name=os.path.relpath(name, project_dir),
+                    size=upload.size,
+                    sha256=digest,
+                    content_type=mimetypes.guess_type(upload.filename)[0],
+                    mtime=datetime.utcnow()
+                ),
+                set__updated_at=datetime.utcnow()
+            )
+        
+        upload.status = 'complete'
+        upload.path = name
+        upload.updated_at = datetime.utcnow()
+        upload.save()
+        
+        return JsonResponse({'success': True, **_upload_state(upload)})
+    except (Deal.DoesNotExist, Project.DoesNotExist):
+        return JsonResponse({'success': False, 'error': f'{upload.target.capitalize()} not found'}, status=404)
+    except FileNotFoundError:
+        # A concurrent finalize moved the temp file away first
+        upload.reload()
+        if upload.status == 'complete':
+            return JsonResponse({'success': True, **_upload_state(upload)})
+        return JsonResponse({'success': False, 'error': 'Upload is already being finalized', **_upload_state(upload)}, status=409)
+    except json.JSONDecodeError:
+        return JsonResponse({'success': False, 'error': 'Invalid JSON'}, status=400)
+    except Exception as e:
+        return JsonResponse({'success': False, 'error': str(e)}, status=500)
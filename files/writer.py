@@ -0,0 +1,72 @@
+import hashlib
+import os
+from collections import namedtuple
+from concurrent.futures import FIRST_EXCEPTION, ThreadPoolExecutor, wait
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+
+# Result of persisting one upload
+StoredFile = namedtuple('StoredFile', ['name', 'size', 'sha256'])
+
+
+def _fsync_path(path, directory=False):
+    fd = os.open(path, os.O_RDONLY | (getattr(os, 'O_DIRECTORY', 0) if directory else 0))
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def _persist_one(storage, name, file, fsync):
+    """Hash and save one uploaded file; returns its StoredFile."""
+    digest = hashlib.sha256()
+    size = 0
+    for chunk in file.chunks():
+        digest.update(chunk)
+        size += len(chunk)
+    file.seek(0)
+    saved = storage.save(name, file)
+    if fsync != 'none':
+        _fsync_path(storage.path(saved))
+    return StoredFile(saved, size, digest.hexdigest())
+
+
+def persist_files(jobs, storage=None):
+    """Save (name, uploaded file) pairs concurrently and return their StoredFiles in order.
+
+    Writes run on at most FILE_WRITE_WORKERS threads, so per-file latency on
+    network storage overlaps instead of adding up. FILE_FSYNC controls
+    durability: 'none' leaves flushing to the OS, 'file' fsyncs each file
+    and 'full' also fsyncs the directories that received files. If any
+    write fails, pending writes are cancelled, every file already written is
+    deleted and the first error is raised.
+    """
+    storage = storage or default_storage
+    jobs = list(jobs)
+    if not jobs:
+        return []
+    fsync = settings.FILE_FSYNC
+
+    workers = max(1, min(settings.FILE_WRITE_WORKERS, len(jobs)))
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='file-writer') as pool:
+        futures = [pool.submit(_persist_one, storage, name, file, fsync) for name, file in jobs]
+        done, pending = wait(futures, return_when=FIRST_EXCEPTION)
+        for future in pending:
+            future.cancel()
+
+    failed = [f for f in futures if not f.cancelled() and f.exception() is not None]
+    if failed:
+        for future in futures:
+            if not future.cancelled() and future.exception() is None:
+                try:
+                    storage.delete(future.result().name)
+                except Exception as e:
+                    print(f"Error removing partially saved file {future.result().name}: {e}")
+        raise failed[0].exception()
+
+    stored = [future.result() for future in futures]
+    if fsync == 'full':
+        for directory in {os.path.dirname(storage.path(s.name)) for s in stored}:
+            _fsync_path(directory, directory=True)
+    return stored
@@ -0,0 +1,91 @@
+import os
+import zipfile
+from datetime import datetime
+
+# Read size when copying a file into the archive
+ZIP_CHUNK_SIZE = 64 * 1024
+
+# Formats that are already compressed; deflating them again only costs CPU
+STORED_EXTENSIONS = {
+    '.zip', '.gz', '.tgz', '.bz2', '.xz', '.7z', '.rar', '.zst', '.br',
+    '.jpg', '.jpeg', '.png', '.gif', '.webp', '.heic', '.avif',
+    '.mp3', '.mp4', '.m4a', '.m4v', '.mov', '.avi', '.mkv', '.webm', '.ogg',
+    '.pdf', '.docx', '.xlsx', '.pptx', '.odt', '.ods', '.odp', '.jar', '.apk',
+}
+
+
+class _ChunkWriter:
+    """Unseekable file object that collects what zipfile writes until it is drained."""
+
+    def __init__(self):
+        self._chunks = []
+        self._offset = 0
+
+    def write(self, data):
+        if data:
+            self._chunks.append(bytes(data))
+            self._offset += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._offset
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b''.join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def compress_type_for(name):
+    """Pick ZIP_STORED for already-compressed formats and ZIP_DEFLATED otherwise."""
+    if os.path.splitext(name)[1].lower() in STORED_EXTENSIONS:
+        return zipfile.ZIP_STORED
+    return zipfile.ZIP_DEFLATED
+
+
+def iter_directory(directory):
+    """Yield (archive name, path) for every regular file below directory, in sorted order."""
+    for root, dirs, files in os.walk(directory):
+        dirs.sort()
+        for filename in sorted(files):
+            path = os.path.join(root, filename)
+            if os.path.isfile(path):
+                yield os.path.relpath(path, directory).replace(os.sep, '/'), path
+
+
+def stream_zip(entries):
+    """Generate a zip archive of (archive name, path) entries chunk by chunk.
+
+    Nothing is buffered beyond one read chunk (plus whatever deflate holds
+    back), so memory stays flat however large the files are. zipfile writes
+    sizes and CRCs in data descriptors because the output is not seekable,
+    and every entry is written as ZIP64 so files over 4 GiB are safe.
+    """
+    writer = _ChunkWriter()
+    with zipfile.ZipFile(writer, mode='w', allowZip64=True) as archive:
+        for arcname, path in entries:
+            stat = os.stat(path)
+            # The zip format cannot represent dates before 1980
+            date_time = max(datetime.fromtimestamp(stat.st_mtime).timetuple()[:6], (1980, 1, 1, 0, 0, 0))
+            info = zipfile.ZipInfo(arcname, date_time=date_time)
+            info.compress_type = compress_type_for(arcname)
+            info.external_attr = (stat.st_mode & 0xFFFF) << 16
+            with open(path, 'rb') as source, archive.open(info, mode='w', force_zip64=True) as target:
+                while True:
+                    chunk = source.read(ZIP_CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    target.write(chunk)
+                    data = writer.drain()
+                    if data:
+                        yield data
+            data = writer.drain()
+            if data:
+                yield data
+    # Central directory
+    data = writer.drain()
+    if data:
+        yield data
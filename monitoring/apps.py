@@ -0,0 +1,12 @@
+from django.apps import AppConfig
+
+
+class MonitoringConfig(AppConfig):
+    default_auto_field = "django.db.models.BigAutoField"
+    name = "monitoring"
+
+    def ready(self):
+        # prs.breaker is imported by the settings, before the registry can exist
+        from monitoring.metrics import registry
+        from prs.breaker import render_metrics
+        registry.register_collector(render_metrics)
@@ -0,0 +1,199 @@
+"""pymongo command monitoring used to attribute MongoDB time to requests.
+
+Listeners must be passed to the client when it is created, so they are
+wired into mongoengine.connect in prs/settings.py.
+"""
+import logging
+import queue
+import threading
+from datetime import datetime
+
+from bson import json_util
+from pymongo import monitoring
+
+logger = logging.getLogger(__name__)
+
+# View currently being served on this thread, set by ProfilingMiddleware
+request_context = threading.local()
+
+
+class RequestCommandListener(monitoring.CommandListener):
+    """Count and time MongoDB commands issued by the current thread while a request is being profiled."""
+
+    def __init__(self):
+        self._local = threading.local()
+
+    def begin(self):
+        """Start collecting for the current thread."""
+        self._local.active = True
+        self._local.count = 0
+        self._local.duration = 0.0
+
+    def end(self):
+        """Stop collecting and return (command count, total duration in seconds)."""
+        self._local.active = False
+        return getattr(self._local, 'count', 0), getattr(self._local, 'duration', 0.0)
+
+    def started(self, event):
+        if getattr(self._local, 'active', False):
+            self._local.count += 1
+
+    def succeeded(self, event):
+        if getattr(self._local, 'active', False):
+            self._local.duration += event.duration_micros / 1e6
+
+    def failed(self, event):
+        if getattr(self._local, 'active', False):
+            self._local.duration += event.duration_micros / 1e6
+
+
+def _shape(value):
+    """Replace literal values in a filter with 1 so similar queries group together."""
+    if isinstance(value, dict):
+        return {key: _shape(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_shape(item) for item in value]
+    return 1
+
+
+def _filter_and_sort(command_name, command):
+    """Pull the filter and sort out of a command document."""
+    if command_name == 'find':
+        return command.get('filter', {}), command.get('sort')
+    if command_name in ('count', 'distinct', 'findAndModify'):
+        return command.get('query', {}), command.get('sort')
+    if command_name == 'aggregate':
+        stages = command.get('pipeline', [])
+        match = next((stage['$match'] for stage in stages if '$match' in stage), {})
+        sort = next((stage['$sort'] for stage in stages if '$sort' in stage), None)
+        return match, sort
+    if command_name == 'update':
+        return (command.get('updates') or [{}])[0].get('q', {}), None
+    if command_name == 'delete':
+        return (command.get('deletes') or [{}])[0].get('q', {}), None
+    return {}, None
+
+
+def _plan_summary(explain):
+    """Summarise an executionStats explain: winning plan stages, index used and work done."""
+    planner = explain.get('queryPlanner') or explain.get('stages', [{}])[0].get('$cursor', {}).get('queryPlanner', {})
+    stats = explain.get('executionStats') or explain.get('stages', [{}])[0].get('$cursor', {}).get('executionStats', {})
+    stages = []
+    index_name = None
+    node = planner.get('winningPlan', {})
+    node = node.get('queryPlan', node)
+    while node:
+        stages.append(node.get('stage', '?'))
+        index_name = index_name or node.get('indexName')
+        node = node.get('inputStage') or (node.get('inputStages') or [None])[0]
+    return {
+        'plan': ' <- '.join(stages),
+        'collscan': 'COLLSCAN' in stages,
+        'index_name': index_name,
+        'docs_examined': stats.get('totalDocsExamined'),
+        'keys_examined': stats.get('totalKeysExamined'),
+        'n_returned': stats.get('nReturned'),
+    }
+
+
+class SlowQueryListener(monitoring.CommandListener):
+    """Capture commands slower than a threshold into the slow_queries capped collection.
+
+    Explaining and writing happen on a background thread so the request that
+    ran the slow query does not pay for either.
+    """
+
+    # Commands worth capturing; all but insert can be explained
+    COMMANDS = ('find', 'aggregate', 'count', 'distinct', 'findAndModify', 'update', 'delete', 'insert')
+    # Command fields explain rejects
+    SESSION_FIELDS = ('lsid', 'txnNumber', 'autocommit', 'startTransaction', 'readConcern', 'writeConcern')
+
+    def __init__(self, threshold_ms=100, explain=True, queue_size=1000):
+        self.threshold_ms = threshold_ms
+        self.explain = explain
+        self._pending = {}
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._worker = None
+        self._lock = threading.Lock()
+
+    def _key(self, event):
+        return event.connection_id, event.request_id
+
+    def started(self, event):
+        if self.threshold_ms is None or event.command_name not in self.COMMANDS:
+            return
+        collection = event.command.get(event.command_name)
+        if collection == 'slow_queries':
+            return
+        self._pending[self._key(event)] = (
+            event.command, collection, getattr(request_context, 'view', None)
+        )
+
+    def succeeded(self, event):
+        pending = self._pending.pop(self._key(event), None)
+        if pending is None or event.duration_micros < self.threshold_ms * 1000:
+            return
+        command, collection, view = pending
+        try:
+            self._queue.put_nowait({
+                'ts': datetime.utcnow(),
+                'database': event.database_name,
+                'collection': collection,
+                'command_name': event.command_name,
+                'command': command,
+                'view': view,
+                'duration_ms': event.duration_micros / 1000,
+            })
+        except queue.Full:
+            return
+        self._ensure_worker()
+
+    def failed(self, event):
+        self._pending.pop(self._key(event), None)
+
+    def _ensure_worker(self):
+        with self._lock:
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(target=self._drain, name='slow-query-log', daemon=True)
+                self._worker.start()
+
+    def _drain(self):
+        while True:
+            entry = self._queue.get()
+            try:
+                self._record(entry)
+            except Exception as e:
+                logger.warning("Failed to record slow query: %s", e)
+
+    def _record(self, entry):
+        from mongoengine.connection import get_connection
+        from monitoring.models import SlowQuery
+        
+        command = entry.pop('command')
+        command_name = entry['command_name']
+        query_filter, sort = _filter_and_sort(command_name, command)
+        summary = {}
+        if self.explain and command_name != 'insert':
+            explainable = {
+                key: value for key, value in command.items()
+                if not key.startswith('$') and key not in self.SESSION_FIELDS
+            }
+            # explain accepts a single write statement
+            for field in ('updates', 'deletes'):
+                if field in explainable:
+                    explainable[field] = explainable[field][:1]
+            explain = get_connection()[entry['database']].command(
+                'explain', explainable, verbosity='executionStats'
+            )
+            summary = _plan_summary(explain)
+        
+        SlowQuery(
+            filter=json_util.dumps(query_filter),
+            shape=json_util.dumps(_shape(query_filter), sort_keys=True),
+            sort=json_util.dumps(sort) if sort else None,
+            **entry,
+            **summary
+        ).save()
+
+
+command_listener = RequestCommandListener()
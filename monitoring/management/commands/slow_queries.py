@@ -0,0 +1,54 @@
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+from django.core.management.base import BaseCommand
+
+from monitoring.models import SlowQuery
+
+
+class Command(BaseCommand):
+    help = "Report slow MongoDB queries captured by the slow-query listener, grouped by query shape."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--hours', type=float, default=24, help='Look back this many hours (default 24)')
+        parser.add_argument('--view', help='Only queries issued by this view')
+        parser.add_argument('--collection', help='Only queries against this collection')
+        parser.add_argument('--collscan', action='store_true', help='Only queries whose plan used a COLLSCAN')
+        parser.add_argument('--limit', type=int, default=20, help='Number of query shapes to show (default 20)')
+
+    def handle(self, *args, **options):
+        query = {'ts__gte': datetime.utcnow() - timedelta(hours=options['hours'])}
+        if options['view']:
+            query['view'] = options['view']
+        if options['collection']:
+            query['collection'] = options['collection']
+        if options['collscan']:
+            query['collscan'] = True
+        
+        groups = defaultdict(list)
+        for entry in SlowQuery.objects(**query):
+            groups[(entry.collection, entry.command_name, entry.view, entry.shape, entry.sort)].append(entry)
+        
+        if not groups:
+            self.stdout.write("No slow queries recorded.")
+            return
+        
+        # Worst offenders first: total time spent in each query shape
+        ranked = sorted(groups.items(), key=lambda item: -sum(e.duration_ms for e in item[1]))
+        for (collection, command_name, view, shape, sort), entries in ranked[:options['limit']]:
+            latest = entries[0]
+            durations = sorted(e.duration_ms for e in entries)
+            plan = latest.plan or 'not explained'
+            style = self.style.ERROR if latest.collscan else self.style.SUCCESS
+            self.stdout.write(self.style.MIGRATE_HEADING(f"{collection}.{command_name} from {view or '-'}"))
+            self.stdout.write(f"  filter: {shape}" + (f"  sort: {sort}" if sort else ''))
+            self.stdout.write(
+                f"  {len(entries)}x  max {durations[-1]:.1f} ms  avg {sum(durations) / len(durations):.1f} ms"
+            )
+            self.stdout.write("  plan:   " + style(plan) + (f" ({latest.index_name})" if latest.index_name else ''))
+            if latest.docs_examined is not None:
+                self.stdout.write(
+                    f"  examined {latest.docs_examined} docs / {latest.keys_examined} keys "
+                    f"for {latest.n_returned} returned"
+                )
+            self.stdout.write(f"  example: {latest.filter}")
@@ -0,0 +1,109 @@
+"""In-process rolling histograms rendered in the Prometheus text format."""
+import bisect
+import threading
+import time
+from collections import defaultdict
+
+from django.conf import settings
+
+# Upper bounds for the latency histograms, in seconds
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# Upper bounds for the MongoDB commands per request histogram
+COMMAND_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+# Upper bounds for the request/response size histograms, in bytes
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+
+class RollingHistogram:
+    """Histogram over a sliding time window, kept as a ring of fixed-width slices.
+
+    Observations older than `window` seconds drop out, so the exposed counts
+    describe recent traffic rather than everything since the process started.
+    """
+
+    def __init__(self, buckets, window=300, slices=10):
+        self.buckets = buckets
+        self.slice_width = window / slices
+        self._slices = [self._empty(-1) for _ in range(slices)]
+
+    def _empty(self, epoch):
+        return {'epoch': epoch, 'counts': [0] * (len(self.buckets) + 1), 'sum': 0.0}
+
+    def observe(self, value, now=None):
+        epoch = int((now or time.time()) // self.slice_width)
+        index = epoch % len(self._slices)
+        current = self._slices[index]
+        if current['epoch'] != epoch:
+            current = self._slices[index] = self._empty(epoch)
+        current['counts'][bisect.bisect_left(self.buckets, value)] += 1
+        current['sum'] += value
+
+    def snapshot(self, now=None):
+        """Return (cumulative bucket counts, sum, count) over the live window."""
+        oldest = int((now or time.time()) // self.slice_width) - len(self._slices) + 1
+        counts = [0] * (len(self.buckets) + 1)
+        total = 0.0
+        for current in self._slices:
+            if current['epoch'] >= oldest:
+                counts = [a + b for a, b in zip(counts, current['counts'])]
+                total += current['sum']
+        cumulative = []
+        running = 0
+        for count in counts:
+            running += count
+            cumulative.append(running)
+        return cumulative, total, running
+
+
+class MetricsRegistry:
+    """Per-view request histograms plus pluggable collectors for other subsystems."""
+
+    # name: (help text, bucket bounds)
+    HISTOGRAMS = {
+        'prs_request_duration_seconds': ('Wall time per request', DURATION_BUCKETS),
+        'prs_request_db_duration_seconds': ('Time spent in MongoDB commands per request', DURATION_BUCKETS),
+        'prs_request_db_commands': ('MongoDB commands issued per request', COMMAND_BUCKETS),
+        'prs_request_bytes_in': ('Request body size', SIZE_BUCKETS),
+        'prs_request_bytes_out': ('Response body size', SIZE_BUCKETS),
+    }
+
+    def __init__(self, window=300):
+        self.window = window
+        self._lock = threading.Lock()
+        self._histograms = defaultdict(dict)
+        self._collectors = []
+
+    def observe(self, view, **values):
+        """Record one request; keyword names match HISTOGRAMS without the prs_request_ prefix."""
+        with self._lock:
+            for key, value in values.items():
+                name = f'prs_request_{key}'
+                per_view = self._histograms[name]
+                if view not in per_view:
+                    per_view[view] = RollingHistogram(self.HISTOGRAMS[name][1], window=self.window)
+                per_view[view].observe(value)
+
+    def register_collector(self, collector):
+        """Add a callable returning extra exposition lines for /api/_metrics."""
+        self._collectors.append(collector)
+
+    def render(self):
+        """Render every metric in the Prometheus text exposition format."""
+        lines = []
+        with self._lock:
+            for name, (help_text, buckets) in self.HISTOGRAMS.items():
+                lines.append(f'# HELP {name} {help_text} (last {self.window}s)')
+                lines.append(f'# TYPE {name} histogram')
+                for view, histogram in sorted(self._histograms[name].items()):
+                    cumulative, total, count = histogram.snapshot()
+                    for bound, value in zip(buckets, cumulative):
+                        lines.append(f'{name}_bucket{{view="{view}",le="{bound}"}} {value}')
+                    lines.append(f'{name}_bucket{{view="{view}",le="+Inf"}} {count}')
+                    lines.append(f'{name}_sum{{view="{view}"}} {total}')
+                    lines.append(f'{name}_count{{view="{view}"}} {count}')
+        for collector in self._collectors:
+            lines.extend(collector())
+        return '\n'.join(lines) + '\n'
+
+
+registry = MetricsRegistry(window=settings.PROFILING_WINDOW_SECONDS)
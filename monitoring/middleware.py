@@ -0,0 +1,110 @@
+"""Per-request profiling: wall time, MongoDB commands, payload sizes and named spans."""
+import random
+import threading
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+
+from monitoring.listeners import command_listener, request_context
+from monitoring.metrics import registry
+
+_local = threading.local()
+
+
+@contextmanager
+def span(name):
+    """Time a block of view code and report it as its own Server-Timing entry.
+
+    Does nothing when the current request is not being profiled.
+    """
+    spans = getattr(_local, 'spans', None)
+    if spans is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        spans[name] = spans.get(name, 0.0) + time.perf_counter() - start
+
+
+def _server_timing(total, db_count, db_time, spans):
+    """Format timings (seconds) as a Server-Timing header value in milliseconds."""
+    entries = [f'db;desc="MongoDB x{db_count}";dur={db_time * 1000:.2f}']
+    entries += [f'{name};dur={elapsed * 1000:.2f}' for name, elapsed in spans.items()]
+    entries.append(f'app;dur={max(total - db_time, 0) * 1000:.2f}')
+    entries.append(f'total;dur={total * 1000:.2f}')
+    return ', '.join(entries)
+
+
+class ProfilingMiddleware:
+    """Profile a sample of requests and feed the /api/_metrics histograms.
+
+    Sampled responses carry a Server-Timing header splitting the time between
+    MongoDB, named spans inside the view and the remaining application time.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.sample_rate = settings.PROFILING_SAMPLE_RATE
+
+    def __call__(self, request):
+        try:
+            return self._profile(request)
+        finally:
+            request_context.view = None
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        # Lets the slow-query log attribute commands to views on every request, sampled or not
+        request_context.view = request.resolver_match.view_name
+
+    def _profile(self, request):
+        if self.sample_rate <= 0 or random.random() >= self.sample_rate:
+            return self.get_response(request)
+        
+        _local.spans = {}
+        command_listener.begin()
+        start = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            elapsed = time.perf_counter() - start
+            db_count, db_time = command_listener.end()
+            spans = _local.spans
+            _local.spans = None
+        
+        match = request.resolver_match
+        view = match.view_name if match else 'unresolved'
+        if view == 'metrics':
+            return response
+        
+        response['Server-Timing'] = _server_timing(elapsed, db_count, db_time, spans)
+        bytes_in = int(request.META.get('CONTENT_LENGTH') or 0)
+        
+        def observe(bytes_out, total):
+            registry.observe(
+                view,
+                duration_seconds=total,
+                db_duration_seconds=db_time,
+                db_commands=db_count,
+                bytes_in=bytes_in,
+                bytes_out=bytes_out
+            )
+        
+        if response.streaming:
+            # Sizes and wall time are only known once the body has been sent
+            response.streaming_content = self._count_stream(response.streaming_content, start, observe)
+        else:
+            observe(len(response.content), elapsed)
+        return response
+
+    @staticmethod
+    def _count_stream(content, start, observe):
+        sent = 0
+        try:
+            for chunk in content:
+                sent += len(chunk)
+                yield chunk
+        finally:
+            observe(sent, time.perf_counter() - start)
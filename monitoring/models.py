@@ -0,0 +1,29 @@
+from django.db import models
+from mongoengine import Document, StringField, DateTimeField, FloatField, IntField, BooleanField
+from datetime import datetime
+
+class SlowQuery(Document):
+    """A MongoDB command that ran longer than SLOW_QUERY_THRESHOLD_MS, with its explain summary."""
+    ts = DateTimeField(default=datetime.utcnow)
+    view = StringField()  # Django view that issued the command, if any
+    database = StringField()
+    collection = StringField()
+    command_name = StringField()
+    filter = StringField()  # Extended JSON
+    shape = StringField()  # Filter with literals replaced, for grouping
+    sort = StringField()
+    duration_ms = FloatField()
+    
+    # explain('executionStats') summary
+    plan = StringField()  # Winning plan stages, outermost first
+    collscan = BooleanField()
+    index_name = StringField()
+    docs_examined = IntField()
+    keys_examined = IntField()
+    n_returned = IntField()
+
+    meta = {
+        'collection': 'slow_queries',
+        'max_size': 16 * 1024 * 1024,
+        'ordering': ['-ts']
+    }
@@ -0,0 +1,263 @@
+import io
+import json
+from datetime import datetime, timedelta
+from unittest import mock
+
+from django.core.management import call_command
+from django.test import SimpleTestCase, override_settings
+from mongoengine.connection import get_db
+from pymongo import monitoring
+
+from monitoring.listeners import SlowQueryListener, _filter_and_sort, _plan_summary, _shape, request_context
+from monitoring.metrics import MetricsRegistry, RollingHistogram
+from monitoring.models import SlowQuery
+from prs.testing import MongoTestCase
+
+
+class RollingHistogramTests(SimpleTestCase):
+
+    def test_snapshot_is_cumulative_with_an_overflow_bucket(self):
+        histogram = RollingHistogram((1, 5, 10), window=60, slices=6)
+        for value in (0.5, 1, 3, 10, 50):
+            histogram.observe(value, now=1000)
+
+        cumulative, total, count = histogram.snapshot(now=1000)
+        # Bounds are inclusive upper limits; the last slot is +Inf
+        self.assertEqual(cumulative, [2, 3, 4, 5])
+        self.assertEqual(total, 64.5)
+        self.assertEqual(count, 5)
+
+    def test_observations_leave_the_window(self):
+        histogram = RollingHistogram((1,), window=60, slices=6)
+        histogram.observe(0.5, now=1000)
+        histogram.observe(2, now=1030)
+
+        self.assertEqual(histogram.snapshot(now=1055)[2], 2)
+        # The first slice has dropped out, the second is still live
+        self.assertEqual(histogram.snapshot(now=1065), ([0, 1], 2, 1))
+        self.assertEqual(histogram.snapshot(now=1100), ([0, 0], 0.0, 0))
+
+    def test_reused_slice_is_cleared_first(self):
+        histogram = RollingHistogram((1,), window=60, slices=6)
+        histogram.observe(0.5, now=1000)
+        # Same ring index one full window later
+        histogram.observe(2, now=1060)
+        self.assertEqual(histogram.snapshot(now=1060), ([0, 1], 2, 1))
+
+
+class MetricsRegistryTests(SimpleTestCase):
+
+    def test_render_exposes_buckets_per_view_and_collectors(self):
+        registry = MetricsRegistry(window=60)
+        registry.observe('deals.list', duration_seconds=0.02, db_commands=3)
+        registry.register_collector(lambda: ['prs_extra 1'])
+
+        lines = registry.render().splitlines()
+        self.assertIn('# TYPE prs_request_duration_seconds histogram', lines)
+        self.assertIn('prs_request_duration_seconds_bucket{view="deals.list",le="0.01"} 0', lines)
+        self.assertIn('prs_request_duration_seconds_bucket{view="deals.list",le="0.025"} 1', lines)
+        self.assertIn('prs_request_duration_seconds_bucket{view="deals.list",le="+Inf"} 1', lines)
+        self.assertIn('prs_request_db_commands_bucket{view="deals.list",le="2"} 0', lines)
+        self.assertIn('prs_request_db_commands_bucket{view="deals.list",le="5"} 1', lines)
+        self.assertIn('prs_request_db_commands_count{view="deals.list"} 1', lines)
+        # Histograms with no observations have no series
+        self.assertFalse(any(line.startswith('prs_request_bytes_in_bucket') for line in lines))
+        self.assertEqual(lines[-1], 'prs_extra 1')
+
+
+@override_settings(METRICS_TOKEN='s3cret', METRICS_ALLOWED_IPS=['10.0.0.5'])
+class MetricsAccessTests(SimpleTestCase):
+
+    def test_allowed_address_can_scrape(self):
+        response = self.client.get('/api/_metrics', REMOTE_ADDR='10.0.0.5')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(b'# TYPE prs_request_duration_seconds histogram', response.content)
+
+    def test_token_can_scrape_from_anywhere(self):
+        response = self.client.get('/api/_metrics', REMOTE_ADDR='203.0.113.9', HTTP_AUTHORIZATION='Bearer s3cret')
+        self.assertEqual(response.status_code, 200)
+
+    def test_others_are_refused(self):
+        self.assertEqual(self.client.get('/api/_metrics', REMOTE_ADDR='203.0.113.9').status_code, 403)
+        response = self.client.get('/api/_metrics', REMOTE_ADDR='203.0.113.9', HTTP_AUTHORIZATION='Bearer wrong')
+        self.assertEqual(response.status_code, 403)
+
+    @override_settings(METRICS_TOKEN='')
+    def test_empty_token_never_matches(self):
+        response = self.client.get('/api/_metrics', REMOTE_ADDR='203.0.113.9', HTTP_AUTHORIZATION='Bearer ')
+        self.assertEqual(response.status_code, 403)
+
+
+FIND_EXPLAIN = {
+    'queryPlanner': {'winningPlan': {
+        'stage': 'FETCH',
+        'inputStage': {'stage': 'IXSCAN', 'indexName': 'status_1_created_at_1'}
+    }},
+    'executionStats': {'totalDocsExamined': 12, 'totalKeysExamined': 12, 'nReturned': 10},
+}
+
+
+class SlowQueryListenerTests(SimpleTestCase):
+
+    def setUp(self):
+        self.listener = SlowQueryListener(threshold_ms=100)
+        patcher = mock.patch.object(self.listener, '_ensure_worker')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.request_id = 0
+
+    def run_command(self, command, duration_ms):
+        self.request_id += 1
+        name = next(iter(command))
+        self.listener.started(monitoring.CommandStartedEvent(command, 'prs', self.request_id, ('localhost', 27017), 1))
+        self.listener.succeeded(monitoring.CommandSucceededEvent(
+            timedelta(milliseconds=duration_ms), {'ok': 1}, name, self.request_id, ('localhost', 27017), 1, database_name='prs'
+        ))
+
+    def captured(self):
+        entries = []
+        while not self.listener._queue.empty():
+            entries.append(self.listener._queue.get_nowait())
+        return entries
+
+    def test_only_commands_over_the_threshold_are_captured(self):
+        request_context.view = 'deals.views.list_deals'
+        self.addCleanup(delattr, request_context, 'view')
+        self.run_command({'find': 'deals', 'filter': {'status': 'draft'}}, 99)
+        self.run_command({'find': 'deals', 'filter': {'status': 'verified'}}, 250)
+
+        [entry] = self.captured()
+        self.assertEqual((entry['collection'], entry['command_name'], entry['view']), ('deals', 'find', 'deals.views.list_deals'))
+        self.assertEqual(entry['duration_ms'], 250)
+        self.assertEqual(self.listener._pending, {})
+
+    def test_other_commands_and_its_own_writes_are_ignored(self):
+        self.run_command({'hello': 1}, 500)
+        self.run_command({'insert': 'slow_queries', 'documents': [{}]}, 500)
+        self.assertEqual(self.captured(), [])
+
+    def test_disabled_without_a_threshold(self):
+        self.listener.threshold_ms = None
+        self.run_command({'find': 'deals', 'filter': {}}, 500)
+        self.assertEqual(self.captured(), [])
+
+    def test_filters_are_reduced_to_their_shape(self):
+        query = {'created_by': 'sales1', 'status': {'$in': ['draft', 'rejected']}, 'budget': {'$gt': 5000}}
+        self.assertEqual(_shape(query), {'created_by': 1, 'status': {'$in': [1, 1]}, 'budget': {'$gt': 1}})
+
+    def test_filter_and_sort_per_command(self):
+        self.assertEqual(_filter_and_sort('find', {'filter': {'a': 1}, 'sort': {'b': -1}}), ({'a': 1}, {'b': -1}))
+        self.assertEqual(_filter_and_sort('aggregate', {'pipeline': [{'$match': {'a': 1}}, {'$sort': {'b': 1}}]}),
+                         ({'a': 1}, {'b': 1}))
+        self.assertEqual(_filter_and_sort('update', {'updates': [{'q': {'_id': 1}, 'u': {}}]}), ({'_id': 1}, None))
+        self.assertEqual(_filter_and_sort('insert', {'documents': []}), ({}, None))
+
+
+class PlanSummaryTests(SimpleTestCase):
+
+    def test_index_scan(self):
+        self.assertEqual(_plan_summary(FIND_EXPLAIN), {
+            'plan': 'FETCH <- IXSCAN', 'collscan': False, 'index_name': 'status_1_created_at_1',
+            'docs_examined': 12, 'keys_examined': 12, 'n_returned': 10,
+        })
+
+    def test_collection_scan_in_an_aggregate_cursor_stage(self):
+        explain = {'stages': [{'$cursor': {
+            'queryPlanner': {'winningPlan': {'stage': 'SORT', 'inputStage': {'stage': 'COLLSCAN'}}},
+            'executionStats': {'totalDocsExamined': 5000, 'totalKeysExamined': 0, 'nReturned': 3},
+        }}, {'$group': {}}]}
+        summary = _plan_summary(explain)
+        self.assertEqual(summary['plan'], 'SORT <- COLLSCAN')
+        self.assertTrue(summary['collscan'])
+        self.assertIsNone(summary['index_name'])
+        self.assertEqual(summary['docs_examined'], 5000)
+
+    def test_slot_based_plans_nest_the_query_plan(self):
+        explain = {'queryPlanner': {'winningPlan': {'queryPlan': {
+            'stage': 'OR', 'inputStages': [{'stage': 'IXSCAN', 'indexName': 'a_1'}, {'stage': 'IXSCAN', 'indexName': 'b_1'}]
+        }}}}
+        summary = _plan_summary(explain)
+        self.assertEqual((summary['plan'], summary['index_name']), ('OR <- IXSCAN', 'a_1'))
+        self.assertIsNone(summary['n_returned'])
+
+
+class SlowQueryTestCase(MongoTestCase):
+
+    def setUp(self):
+        super().setUp()
+        # mongomock cannot create capped collections; use a plain one
+        patcher = mock.patch.object(SlowQuery, '_collection', get_db()['slow_queries'])
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+
+class SlowQueryRecordTests(SlowQueryTestCase):
+
+    def record(self, command, explain=FIND_EXPLAIN):
+        listener = SlowQueryListener(threshold_ms=100)
+        connection = mock.MagicMock()
+        connection.__getitem__.return_value.command.return_value = explain
+        entry = {'ts': datetime.utcnow(), 'database': 'prs', 'collection': next(iter(command.values())),
+                 'command_name': next(iter(command)), 'command': command, 'view': 'v', 'duration_ms': 150.0}
+        with mock.patch('mongoengine.connection.get_connection', return_value=connection):
+            listener._record(entry)
+        return connection.__getitem__.return_value.command
+
+    def test_records_the_redacted_shape_and_the_plan(self):
+        command = {'find': 'deals', 'filter': {'created_by': 'sales1'}, 'sort': {'created_at': -1},
+                   'lsid': {'id': 1}, '$db': 'prs'}
+        explain = self.record(command)
+
+        # Session fields and $-prefixed fields are stripped before explaining
+        self.assertEqual(explain.call_args.args, ('explain', {'find': 'deals', 'filter': {'created_by': 'sales1'},
+                                                              'sort': {'created_at': -1}}))
+        query = SlowQuery.objects.get()
+        self.assertEqual(json.loads(query.shape), {'created_by': 1})
+        self.assertEqual(json.loads(query.filter), {'created_by': 'sales1'})
+        self.assertEqual(json.loads(query.sort), {'created_at': -1})
+        self.assertEqual((query.plan, query.index_name, query.docs_examined), ('FETCH <- IXSCAN', 'status_1_created_at_1', 12))
+
+    def test_writes_explain_only_their_first_statement(self):
+        explain = self.record({'update': 'deals', 'updates': [{'q': {'_id': 1}, 'u': {}}, {'q': {'_id': 2}, 'u': {}}]})
+        self.assertEqual(explain.call_args.args[1]['updates'], [{'q': {'_id': 1}, 'u': {}}])
+
+    def test_inserts_are_not_explained(self):
+        explain = self.record({'insert': 'deals', 'documents': [{}]})
+        explain.assert_not_called()
+        self.assertIsNone(SlowQuery.objects.get().plan)
+
+
+class SlowQueriesCommandTests(SlowQueryTestCase):
+
+    def add(self, duration_ms, collscan=False, shape='{"status": 1}', hours_ago=1):
+        SlowQuery(ts=datetime.utcnow() - timedelta(hours=hours_ago), view='deals.views.list_deals', collection='deals',
+                  command_name='find', filter='{"status": "draft"}', shape=shape, duration_ms=duration_ms,
+                  plan='COLLSCAN' if collscan else 'FETCH <- IXSCAN', collscan=collscan,
+                  docs_examined=10, keys_examined=10, n_returned=5).save()
+
+    def report(self, *args):
+        out = io.StringIO()
+        call_command('slow_queries', *args, stdout=out, no_color=True)
+        return out.getvalue()
+
+    def test_groups_by_shape_worst_total_first(self):
+        self.add(150)
+        self.add(250)
+        self.add(900, collscan=True, shape='{"created_by": 1}')
+        self.add(5000, hours_ago=48)
+
+        output = self.report()
+        self.assertLess(output.index('filter: {"created_by": 1}'), output.index('filter: {"status": 1}'))
+        self.assertIn('2x  max 250.0 ms  avg 200.0 ms', output)
+        # Older than the default 24 hours
+        self.assertNotIn('5000.0', output)
+
+    def test_collscan_filter(self):
+        self.add(150)
+        self.add(900, collscan=True, shape='{"created_by": 1}')
+        output = self.report('--collscan')
+        self.assertIn('plan:   COLLSCAN', output)
+        self.assertNotIn('{"status": 1}', output)
+
+    def test_nothing_recorded(self):
+        self.assertIn('No slow queries recorded.', self.report())
@@ -0,0 +1,30 @@
+import hmac
+
+from django.conf import settings
+from django.http import HttpResponse
+
+from monitoring.metrics import registry
+
+
+def can_scrape(request):
+    """Whether the request carries METRICS_TOKEN or comes from one of METRICS_ALLOWED_IPS.
+    
+    REMOTE_ADDR is the peer address; behind a proxy, list the proxy's address
+    only if the proxy itself restricts who reaches this path.
+    """
+    token = settings.METRICS_TOKEN
+    scheme, _, credentials = request.headers.get('Authorization', '').partition(' ')
+    if token and scheme.lower() == 'bearer' and hmac.compare_digest(credentials.strip().encode(), token.encode()):
+        return True
+    return request.META.get('REMOTE_ADDR') in settings.METRICS_ALLOWED_IPS
+
+
+def metrics(request):
+    """Expose request profiling histograms in the Prometheus text format.
+    
+    Only for scrapers allowed by METRICS_TOKEN or METRICS_ALLOWED_IPS; the
+    per-view timings and breaker state are not for the public.
+    """
+    if not can_scrape(request):
+        return HttpResponse('Forbidden', status=403, content_type='text/plain')
+    return HttpResponse(registry.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -0,0 +1,45 @@
+import signal
+import time
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+
+from notifications.models import Notification
+from notifications.reminders import send_reminders
+
+
+class Command(BaseCommand):
+    help = "Remind supervisors of open projects whose deadline falls within the next N hours."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--hours', type=float, default=24, help='Remind this many hours ahead (default 24)')
+        parser.add_argument('--interval', type=float, default=300, help='Seconds between ticks (default 300)')
+        parser.add_argument('--once', action='store_true', help='Run a single tick and exit (for cron)')
+
+    def handle(self, *args, **options):
+        if options['hours'] <= 0 or options['interval'] <= 0:
+            raise CommandError("--hours and --interval must be positive")
+        
+        # Creates the unique dedupe_key index before the first insert relies on it
+        Notification.ensure_indexes()
+        
+        stopping = []
+        def stop(signum, frame):
+            stopping.append(signum)
+        signal.signal(signal.SIGTERM, stop)
+        signal.signal(signal.SIGINT, stop)
+        
+        while not stopping:
+            started = time.monotonic()
+            try:
+                due, sent = send_reminders(options['hours'])
+                self.stdout.write(f"{datetime.utcnow():%Y-%m-%d %H:%M:%S} {due} due, {sent} reminder(s) sent")
+            except Exception as e:
+                # Keep ticking through transient database errors
+                self.stderr.write(f"Reminder tick failed: {e}")
+            if options['once']:
+                break
+            # Sleep in short steps so a stop signal is handled promptly
+            while not stopping and time.monotonic() - started < options['interval']:
+                time.sleep(min(1, options['interval']))
+        self.stdout.write("Stopped.")
@@ -7,4 +7,10 @@ class Notification(Document):
     message = StringField(required=True)
     deal = ReferenceField('Deal', required=False)
     created_at = DateTimeField(default=datetime.utcnow)
+    
+    # Set on generated notifications such as deadline reminders
+    kind = StringField()
+    project_id = StringField()
+    dedupe_key = StringField(unique=True, sparse=True)  # A second insert with the same key is rejected
+    
     meta = {'collection': 'notifications'}
@@ -0,0 +1,59 @@
+"""Deadline reminders for supervisors, sent by the deadline_reminders command."""
+from datetime import datetime, timedelta
+
+from pymongo.errors import BulkWriteError
+
+from notifications.models import Notification
+from projects.models import Project
+
+# Statuses that still need work; the (status, deadline) index is scanned once per status
+OPEN_STATUSES = ['pending', 'in_progress']
+
+DUPLICATE_KEY = 11000
+
+
+def reminder_key(project_id, deadline):
+    """One reminder per project and deadline; moving the deadline allows a new one."""
+    return f"deadline:{project_id}:{deadline.isoformat()}"
+
+
+def due_projects(hours, now=None):
+    """Open projects with a deadline in the next `hours`, from one indexed range query."""
+    now = now or datetime.utcnow()
+    return Project.objects(
+        status__in=OPEN_STATUSES,
+        deadline__gte=now,
+        deadline__lt=now + timedelta(hours=hours)
+    ).only('id', 'name', 'supervisor', 'deal_id', 'deadline').as_pymongo()
+
+
+def send_reminders(hours, now=None):
+    """Insert a reminder for every due project that has not had one; returns (due, sent).
+    
+    All reminders go in one unordered insert_many. The unique dedupe_key
+    index rejects the ones already sent on earlier ticks, so no lookup of
+    past notifications is needed.
+    """
+    now = now or datetime.utcnow()
+    reminders = []
+    for project in due_projects(hours, now):
+        hours_left = (project['deadline'] - now).total_seconds() / 3600
+        reminders.append(Notification(
+            recipient=project['supervisor'],
+            message=f"Project '{project['name']}' is due in {hours_left:.0f}h ({project['deadline']:%Y-%m-%d %H:%M} UTC).",
+            kind='deadline_reminder',
+            project_id=str(project['_id']),
+            dedupe_key=reminder_key(project['_id'], project['deadline']),
+            created_at=now
+        ).to_mongo().to_dict())
+    if not reminders:
+        return 0, 0
+    
+    try:
+        result = Notification._get_collection().insert_many(reminders, ordered=False)
+        return len(reminders), len(result.inserted_ids)
+    except BulkWriteError as e:
+        errors = e.details.get('writeErrors', [])
+        if any(error.get('code') != DUPLICATE_KEY for error in errors):
+            raise
+        return len(reminders), e.details.get('nInserted', 0)
@@ -0,0 +1,47 @@
+from datetime import datetime, timedelta
+
+from notifications.models import Notification
+from notifications.reminders import reminder_key, send_reminders
+from prs.testing import MongoTestCase
+from projects.models import Project
+
+
+class DeadlineReminderTests(MongoTestCase):
+
+    def setUp(self):
+        super().setUp()
+        # setUp dropped the collection along with its unique dedupe_key index
+        Notification.ensure_indexes()
+        self.now = datetime(2026, 3, 2, 9, 0)
+
+    def make_project(self, name, hours, status='pending'):
+        return Project(deal_id='deal1', name=name, supervisor='super1', status=status,
+                       deadline=self.now + timedelta(hours=hours)).save()
+
+    def test_reminder_key_changes_with_the_deadline(self):
+        deadline = datetime(2026, 3, 3, 12, 0)
+        self.assertEqual(reminder_key('p1', deadline), reminder_key('p1', datetime(2026, 3, 3, 12, 0)))
+        self.assertNotEqual(reminder_key('p1', deadline), reminder_key('p1', deadline + timedelta(hours=1)))
+        self.assertNotEqual(reminder_key('p1', deadline), reminder_key('p2', deadline))
+
+    def test_each_due_project_is_reminded_once(self):
+        self.make_project('Due', 5)
+        self.make_project('Later', 48)
+        self.make_project('Overdue', -1)
+        self.make_project('Done', 5, status='completed')
+
+        self.assertEqual(send_reminders(24, now=self.now), (1, 1))
+        # The next tick finds the same project but the dedupe key rejects it
+        self.assertEqual(send_reminders(24, now=self.now + timedelta(minutes=15)), (1, 0))
+        reminders = Notification.objects(kind='deadline_reminder')
+        self.assertEqual([n.recipient for n in reminders], ['super1'])
+        self.assertIn("'Due'", reminders[0].message)
+
+    def test_moved_deadline_gets_a_new_reminder(self):
+        project = self.make_project('Due', 5)
+        send_reminders(24, now=self.now)
+
+        project.deadline = self.now + timedelta(hours=10)
+        project.save()
+        self.assertEqual(send_reminders(24, now=self.now), (1, 1))
+        self.assertEqual(Notification.objects(kind='deadline_reminder').count(), 2)
@@ -1,7 +1,24 @@
 from django.db import models
-from mongoengine import Document, StringField, ReferenceField, DateTimeField, FloatField
+from mongoengine import Document, EmbeddedDocument, StringField, ReferenceField, DateTimeField, FloatField, IntField, ListField, EmbeddedDocumentField
 from datetime import datetime
 
+class ProjectFile(EmbeddedDocument):
+    """Manifest entry for one uploaded file, recorded when it is written."""
+    name = StringField(required=True)  # Path relative to Project.files
+    size = IntField(required=True)
+    sha256 = StringField(required=True)
+    content_type = StringField()
+    mtime = DateTimeField(default=datetime.utcnow)
+
+    def to_dict(self):
+        return {
+            'name': self.name,
+            'size': self.size,
+            'sha256': self.sha256,
+            'content_type': self.content_type,
+            'mtime': self.mtime.isoformat() if self.mtime else None
+        }
+
 class Project(Document):
     deal_id = StringField(required=True)  # ID of the associated deal
     name = StringField(required=True)
@@ -9,6 +26,7 @@ class Project(Document):
     supervisor = StringField(required=True)
     deadline = DateTimeField()
     files = StringField()  # Path to uploaded files/zip
+    manifest = ListField(EmbeddedDocumentField(ProjectFile))  # One entry per file in `files`
     additional_fee = FloatField(default=0)  # For projects added to verified deals
     receipt_file = StringField()  # For projects added to verified deals
     created_at = DateTimeField(default=datetime.utcnow)
@@ -19,6 +37,21 @@ class Project(Document):
         "completed"
     ], default="pending")
 
-    meta = {'collection': 'projects'}
+    meta = {
+        'collection': 'projects',
+        'indexes': [
+            'deal_id',
+            # Incremental sync
+            'updated_at',
+            ('supervisor', 'updated_at'),
+            # Deadline reminders scan open projects by deadline
+            ('status', 'deadline')
+        ]
+    }
+
+    def save(self, *args, **kwargs):
+        # Every write bumps updated_at so /api/sync/ can find it
+        self.updated_at = datetime.utcnow()
+        return super().save(*args, **kwargs)
 
 # Create your models here.
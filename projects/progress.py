@@ -0,0 +1,39 @@
+"""Keep the project counters stored on deals in step with their projects."""
+from datetime import datetime
+
+from bson import ObjectId
+
+from deals.models import Deal
+from projects.models import Project
+
+
+def refresh_deal_progress(deal_ids):
+    """Recount projects_total and projects_completed for the given deals.
+
+    The counts come from one $group over the projects of all the deals.
+    Counters are recomputed rather than incremented, so concurrent status
+    changes cannot drift them. A deal whose counters change gets a new
+    version, since they are part of what its ETag covers.
+    Returns {deal_id: (completed, total)}.
+    """
+    deal_ids = sorted({str(i) for i in deal_ids if i and ObjectId.is_valid(str(i))})
+    if not deal_ids:
+        return {}
+    counts = {deal_id: (0, 0) for deal_id in deal_ids}
+    for row in Project.objects(deal_id__in=deal_ids).aggregate([
+        {'$group': {
+            '_id': '$deal_id',
+            'total': {'$sum': 1},
+            'completed': {'$sum': {'$cond': [{'$eq': ['$status', 'completed']}, 1, 0]}}
+        }}
+    ]):
+        counts[row['_id']] = (row['completed'], row['total'])
+
+    now = datetime.utcnow()
+    collection = Deal._get_collection()
+    for deal_id, (completed, total) in counts.items():
+        collection.update_one(
+            {'_id': ObjectId(deal_id), '$or': [{'projects_completed': {'$ne': completed}}, {'projects_total': {'$ne': total}}]},
+            {'$set': {'projects_completed': completed, 'projects_total': total, 'updated_at': now}, '$inc': {'version': 1}}
+        )
+    return counts
@@ -0,0 +1,114 @@
+import hashlib
+import json
+import os
+import tempfile
+
+from bson import ObjectId
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import override_settings
+
+from deals.models import Deal
+from prs.testing import MongoTestCase, make_deal
+from projects.models import Project
+from projects.progress import refresh_deal_progress
+
+
+class BulkUpdateProjectStatusTests(MongoTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.first = make_deal(status='verified')
+        self.second = make_deal(status='verified')
+        self.mine = [self.make_project(self.first, 'A'), self.make_project(self.first, 'B'),
+                     self.make_project(self.second, 'C')]
+        self.other = self.make_project(self.second, 'D', supervisor='super2')
+        refresh_deal_progress([self.first.id, self.second.id])
+
+    def make_project(self, deal, name, supervisor='super1', status='pending'):
+        return Project(deal_id=str(deal.id), name=name, supervisor=supervisor, status=status).save()
+
+    def bulk_update(self, project_ids, status='completed', supervisor='super1'):
+        return self.client.post('/api/projects/update-status/bulk/',
+                                json.dumps({'project_ids': project_ids, 'status': status, 'supervisor': supervisor}),
+                                content_type='application/json')
+
+    def test_partial_failure_reports_each_project(self):
+        missing = str(ObjectId())
+        ids = [str(self.mine[0].id), missing, str(self.other.id), 'not-an-id', str(self.mine[2].id)]
+        response = self.bulk_update(ids)
+
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(data['updated'], 2)
+        self.assertEqual([(r['project_id'], r['success']) for r in data['results']],
+                         [(ids[0], True), (missing, False), (ids[2], False), ('not-an-id', False), (ids[4], True)])
+        self.assertEqual(data['results'][1]['error'], 'Project not found')
+        self.assertEqual(data['results'][2]['error'], 'Only the assigned supervisor can update this project')
+
+        statuses = {p.name: p.status for p in Project.objects}
+        self.assertEqual(statuses, {'A': 'completed', 'B': 'pending', 'C': 'completed', 'D': 'pending'})
+
+    def test_progress_is_recounted_per_deal(self):
+        data = self.bulk_update([str(self.mine[0].id), str(self.mine[2].id)]).json()
+
+        progress = {d['deal_id']: (d['projects_completed'], d['projects_total']) for d in data['deals']}
+        self.assertEqual(progress, {str(self.first.id): (1, 2), str(self.second.id): (1, 2)})
+        first, second = Deal.objects.get(id=self.first.id), Deal.objects.get(id=self.second.id)
+        self.assertEqual((first.projects_completed, first.projects_total), (1, 2))
+        self.assertEqual((second.projects_completed, second.projects_total), (1, 2))
+
+    def test_only_deals_with_updated_projects_are_recounted(self):
+        first_version = Deal.objects.get(id=self.first.id).version
+        second_version = Deal.objects.get(id=self.second.id).version
+        data = self.bulk_update([str(self.mine[0].id), str(self.other.id)]).json()
+
+        self.assertEqual([d['deal_id'] for d in data['deals']], [str(self.first.id)])
+        self.assertEqual(Deal.objects.get(id=self.second.id).version, second_version)
+        # A deal whose counters change gets a new version for its ETag
+        self.assertEqual(Deal.objects.get(id=self.first.id).version, first_version + 1)
+
+    def test_repeated_status_leaves_the_counters_and_version_alone(self):
+        self.bulk_update([str(self.mine[0].id)])
+        version = Deal.objects.get(id=self.first.id).version
+        self.bulk_update([str(self.mine[0].id)])
+        self.assertEqual(Deal.objects.get(id=self.first.id).version, version)
+
+    def test_invalid_requests(self):
+        self.assertEqual(self.bulk_update([]).status_code, 400)
+        self.assertEqual(self.bulk_update([str(self.mine[0].id)], status='done').status_code, 400)
+        self.assertEqual(self.bulk_update([str(self.mine[0].id)], supervisor='').status_code, 400)
+
+
+class CreateProjectTests(MongoTestCase):
+
+    def setUp(self):
+        super().setUp()
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        overrides = override_settings(MEDIA_ROOT=media.name)
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+        self.media = media.name
+
+    def test_attachments_are_recorded_in_the_manifest(self):
+        deal = make_deal()
+        brief, plan = b'brief' * 1000, b'%PDF-1.4 plan'
+        response = self.client.post('/api/projects/create/', {
+            'deal_id': str(deal.id), 'name': 'Launch', 'supervisor': 'super1',
+            'files': [SimpleUploadedFile('brief.txt', brief, 'text/plain'),
+                      SimpleUploadedFile('plan.pdf', plan, 'application/pdf')],
+        })
+
+        self.assertEqual(response.status_code, 201)
+        project = Project.objects.get(id=response.json()['project_id'])
+        manifest = [(f.name, f.size, f.sha256, f.content_type) for f in project.manifest]
+        self.assertEqual(manifest, [
+            ('brief.txt', len(brief), hashlib.sha256(brief).hexdigest(), 'text/plain'),
+            ('plan.pdf', len(plan), hashlib.sha256(plan).hexdigest(), 'application/pdf'),
+        ])
+        with open(os.path.join(self.media, project.files, 'brief.txt'), 'rb') as f:
+            self.assertEqual(f.read(), brief)
+
+        deal.reload()
+        self.assertEqual((deal.projects_total, deal.projects_completed), (1, 0))
+        self.assertEqual([p.id for p in deal.projects], [project.id])
@@ -1,24 +1,35 @@
 from datetime import datetime
 import json
+import mimetypes
 import os
 from django.http import JsonResponse
 from django.views.decorators.csrf import csrf_exempt
 from django.conf import settings
 from django.core.files.storage import default_storage
 from django.core.files.base import ContentFile
+from bson import ObjectId
 from mongoengine.errors import ValidationError
-from projects.models import Project
+from projects.models import Project, ProjectFile
+from files.writer import persist_files
 from deals.models import Deal
+from deals.views import parse_page
+from prs.breaker import mongo_guard
+from prs.idempotency import idempotent
+from deals.archive import find_archived, with_archived
+from projects.progress import refresh_deal_progress
 
 # Create your views here.
 
 # Function: Create a new project and assign supervisor
 # POST: {"deal_id": str, "name": str, "supervisor": str}
 @csrf_exempt
+@mongo_guard(timeout=settings.MONGODB_UPLOAD_TIMEOUT_SECONDS)
+@idempotent
 def create_project(request):
     """Create a new project associated with a deal.
     
     Projects can be created for a draft deal or for a verified deal with additional fee.
+    Accepts an Idempotency-Key header, like create_deal.
     """
     if request.method != 'POST':
         return JsonResponse({'success': False, 'error': 'Invalid request method'}, status=405)
@@ -69,43 +80,58 @@ def create_project(request):
             if not receipt_file:
                 return JsonResponse({'success': False, 'error': 'Receipt is required for projects added to verified deals'}, status=400)
             
-            # Save receipt file
-            file_name = f"receipts/project_{datetime.now().strftime('%Y%m%d_%H%M%S')}_{receipt_file.name}"
-            receipt_path = default_storage.save(file_name, ContentFile(receipt_file.read()))
-        
-        # Handle project files
-        files_path = None
-        if files:
-            # Create directory for project files
-            project_dir = f"project_files/{deal_id}/{datetime.now().strftime('%Y%m%d_%H%M%S')}"
-            os.makedirs(os.path.join(settings.MEDIA_ROOT, project_dir), exist_ok=True)
-            
-            # Save each file
-            saved_files = []
-            for file in files:
-                file_path = os.path.join(project_dir, file.name)
-                default_storage.save(file_path, ContentFile(file.read()))
-                saved_files.append(file_path)
-            
-            files_path = project_dir
+        
+        # Write the receipt and all project files concurrently
+        stamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+        jobs = []
+        if deal.status == 'verified':
+            jobs.append((f"receipts/project_{stamp}_{receipt_file.name}", receipt_file))
+        project_dir = f"project_files/{deal_id}/{stamp}"
+        jobs.extend((os.path.join(project_dir, file.name), file) for file in files)
+        stored = persist_files(jobs)
+        
+        if deal.status == 'verified':
+            receipt_path = stored.pop(0).name
+        
+        # Record each project file in the manifest
+        files_path = project_dir if files else None
+        manifest = [
+            ProjectFile(
+                name=os.path.relpath(saved.name, project_dir).replace(os.sep, '/'),
+                size=saved.size,
+                sha256=saved.sha256,
+                content_type=file.content_type or mimetypes.guess_type(file.name)[0],
+                mtime=datetime.utcnow()
+            ) for saved, file in zip(stored, files)
+        ]
         
         # Create the project
         project = Project(
-            deal=deal,
+            deal_id=str(deal.id),
             name=name,
             description=description,
             supervisor=supervisor,
             deadline=deadline,
             files=files_path,
+            manifest=manifest,
             additional_fee=additional_fee,
             receipt_file=receipt_path
         )
-        project.save()
+        try:
+            project.save()
+        except Exception:
+            # Do not leave orphaned uploads behind
+            for saved in stored:
+                default_storage.delete(saved.name)
+            if receipt_path:
+                default_storage.delete(receipt_path)
+            raise
         
-        # Add project to deal's project list if not already present
-        if project not in deal.projects:
-            deal.projects.append(project)
-            deal.save()
+        # Add project to deal's project list; one atomic update, so concurrent
+        # project creations and deal edits do not overwrite each other
+        Deal.objects(id=deal.id).update_one(add_to_set__projects=project, set__updated_at=datetime.utcnow(), inc__version=1)
+        
+        refresh_deal_progress([deal.id])
         
         return JsonResponse({
             'success': True, 
@@ -120,14 +146,50 @@ def create_project(request):
         print(traceback.format_exc())
         return JsonResponse({'success': False, 'error': f'Unexpected error: {str(e)}'}, status=500)
 
+def serialize_projects(projects):
+    """Convert projects to the JSON shape used by list_projects and the dashboards.
+    
+    Deal titles are looked up with a single query for the whole list.
+    """
+    projects = list(projects)
+    deal_ids = {p.deal_id for p in projects if p.deal_id}
+    deal_titles = {
+        str(d.id): d.title for d in Deal.objects(id__in=list(deal_ids)).only('id', 'title')
+    } if deal_ids else {}
+    # Archived projects belong to archived deals
+    missing = [ObjectId(i) for i in deal_ids - deal_titles.keys() if ObjectId.is_valid(i)]
+    if missing and any(getattr(p, '_archived', False) for p in projects):
+        deal_titles.update({str(d.id): d.title for d in find_archived(Deal, {'_id': {'$in': missing}}, ['id', 'title'])})
+    return [
+        {
+            'id': str(p.id),
+            'deal_id': p.deal_id,
+            'deal_title': deal_titles.get(p.deal_id),
+            'name': p.name,
+            'description': p.description,
+            'supervisor': p.supervisor,
+            'deadline': p.deadline.isoformat() if p.deadline else None,
+            'files': p.files,
+            'additional_fee': p.additional_fee,
+            'receipt_file': p.receipt_file,
+            'status': p.status,
+            'created_at': p.created_at.isoformat(),
+            'updated_at': p.updated_at.isoformat(),
+            'archived': getattr(p, '_archived', False)
+        } for p in projects
+    ]
+
 # Function: List all projects for a deal
 # GET: /api/projects/?deal_id=<deal_id>
+@mongo_guard
 def list_projects(request):
     """List projects filtered by deal_id or supervisor.
     
     GET parameters:
     - deal_id: ID of the deal to list projects for
     - supervisor: Username of supervisor to list projects for
+    - page, page_size: Optional pagination
+    - include_archived: 1 to also return archived projects
     """
     if request.method != 'GET':
         return JsonResponse({'success': False, 'error': 'Invalid request method'}, status=405)
@@ -142,30 +204,26 @@ def list_projects(request):
         # Build query based on provided parameters
         query = {}
         if deal_id:
-            query['deal'] = deal_id
+            query['deal_id'] = deal_id
         if supervisor:
             query['supervisor'] = supervisor
         
-        projects = Project.objects(**query).order_by('-created_at')
-        project_list = [
-            {
-                'id': str(p.id),
-                'deal_id': str(p.deal.id),
-                'deal_title': p.deal.title,
-                'name': p.name,
-                'description': p.description,
-                'supervisor': p.supervisor,
-                'deadline': p.deadline.isoformat() if p.deadline else None,
-                'files': p.files,
-                'additional_fee': p.additional_fee,
-                'receipt_file': p.receipt_file,
-                'status': p.status,
-                'created_at': p.created_at.isoformat(),
-                'updated_at': p.updated_at.isoformat()
-            } for p in projects
-        ]
+        projects = Project.objects(**query).exclude('manifest').order_by('-created_at')
+        
+        # Optional pagination: page (1-based) and page_size
+        page, page_size = parse_page(request.GET)
+        if request.GET.get('include_archived') == '1':
+            fields = [name for name in Project._fields if name != 'manifest']
+            projects = with_archived(projects, Project, query, fields, '-created_at', page, page_size)
+        elif page_size:
+            projects = projects.skip((page - 1) * page_size).limit(page_size + 1)
         
-        return JsonResponse({'success': True, 'projects': project_list}, status=200)
+        project_list = serialize_projects(projects)
+        has_more = bool(page_size) and len(project_list) > page_size
+        if has_more:
+            project_list = project_list[:page_size]
+        
+        return JsonResponse({'success': True, 'projects': project_list, 'page': page, 'has_more': has_more}, status=200)
     except Exception as e:
         import traceback
         print(traceback.format_exc())
@@ -173,6 +231,7 @@ def list_projects(request):
 
 
 @csrf_exempt
+@mongo_guard
 def update_project_status(request, project_id):
     """Update a project's status.
     
@@ -209,15 +268,100 @@ def update_project_status(request, project_id):
         project.status = status
         project.updated_at = datetime.utcnow()
         project.save()
+        completed, total = refresh_deal_progress([project.deal_id]).get(project.deal_id, (0, 0))
         
         return JsonResponse({
             'success': True,
             'message': f'Project status updated to {status}',
             'project_id': str(project.id),
             'status': status,
-            'updated_at': project.updated_at.isoformat()
+            'updated_at': project.updated_at.isoformat(),
+            'deal_progress': {'deal_id': project.deal_id, 'projects_completed': completed, 'projects_total': total}
+        })
+        
+    except Exception as e:
+        import traceback
+        print(traceback.format_exc())
+        return JsonResponse({'success': False, 'error': f'Unexpected error: {str(e)}'}, status=500)
+
+
+@csrf_exempt
+@mongo_guard
+def bulk_update_project_status(request):
+    """Update the status of many projects in one request.
+    
+    POST JSON:
+    - project_ids: List of project IDs (at most MAX_PAGE_SIZE, one dashboard page)
+    - status: New status (pending, in_progress, completed)
+    - supervisor: Username of supervisor making the change; only their projects are updated
+    
+    All matching projects are changed with one update_many. The response
+    has a result per id and the recounted progress of every affected deal.
+    """
+    if request.method != 'POST':
+        return JsonResponse({'success': False, 'error': 'Invalid request method'}, status=405)
+    
+    try:
+        data = json.loads(request.body) if request.body else {}
+        project_ids = data.get('project_ids')
+        status = data.get('status')
+        supervisor = data.get('supervisor')
+        
+        if not isinstance(project_ids, list) or not project_ids:
+            return JsonResponse({'success': False, 'error': 'project_ids must be a non-empty list'}, status=400)
+        if len(project_ids) > settings.MAX_PAGE_SIZE:
+            return JsonResponse({'success': False, 'error': f'At most {settings.MAX_PAGE_SIZE} projects per request'}, status=400)
+        if not status or status not in ['pending', 'in_progress', 'completed']:
+            return JsonResponse({'success': False, 'error': 'Invalid or missing status parameter'}, status=400)
+        if not supervisor:
+            return JsonResponse({'success': False, 'error': 'Supervisor username is required'}, status=400)
+        
+        # One read to tell missing projects from other supervisors' projects
+        project_ids = list(dict.fromkeys(str(pid) for pid in project_ids))
+        valid_ids = [ObjectId(pid) for pid in project_ids if ObjectId.is_valid(pid)]
+        found = {
+            str(p['_id']): p
+            for p in Project.objects(id__in=valid_ids).only('id', 'supervisor', 'deal_id').as_pymongo()
+        }
+        owned = [pid for pid in project_ids if pid in found and found[pid]['supervisor'] == supervisor]
+        
+        now = datetime.utcnow()
+        lost = set()
+        if owned:
+            result = Project.objects(id__in=owned, supervisor=supervisor).update(
+                set__status=status, set__updated_at=now, full_result=True
+            )
+            if result.matched_count < len(owned):
+                # Reassigned between the read and the update
+                lost = {str(i) for i in Project.objects(id__in=owned, supervisor__ne=supervisor).scalar('id')}
+        
+        results = []
+        for pid in project_ids:
+            if pid not in found:
+                results.append({'project_id': pid, 'success': False, 'error': 'Project not found'})
+            elif pid not in owned or pid in lost:
+                results.append({'project_id': pid, 'success': False, 'error': 'Only the assigned supervisor can update this project'})
+            else:
+                results.append({'project_id': pid, 'success': True, 'status': status})
+        
+        updated = [pid for pid in owned if pid not in lost]
+        progress = refresh_deal_progress({found[pid]['deal_id'] for pid in updated})
+        
+        return JsonResponse({
+            'success': True,
+            'message': f'{len(updated)} of {len(project_ids)} projects updated to {status}',
+            'status': status,
+            'updated': len(updated),
+            'updated_at': now.isoformat(),
+            'results': results,
+            'deals': [
+                {'deal_id': deal_id, 'projects_completed': completed, 'projects_total': total}
+                for deal_id, (completed, total) in progress.items()
+            ]
         })
         
+    except json.JSONDecodeError:
+        return JsonResponse({'success': False, 'error': 'Invalid JSON'}, status=400)
     except Exception as e:
         import traceback
         print(traceback.format_exc())
@@ -0,0 +1,125 @@
+"""POST /api/batch/: run several GET API requests in one round trip.
+
+Sub-requests are resolved against the project URLconf and call their views
+directly in this process, sharing the batch request's session, so they skip
+the middleware stack and the per-request connection overhead. They run on a
+small thread pool, since the views spend most of their time waiting on
+MongoDB.
+"""
+import json
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.db import connections
+from django.http import HttpRequest, JsonResponse, QueryDict
+from django.urls import Resolver404, resolve
+
+# Sub-request headers copied onto the sub-request, as WSGI META keys
+FORWARDED_HEADERS = {'If-None-Match': 'HTTP_IF_NONE_MATCH', 'Accept-Language': 'HTTP_ACCEPT_LANGUAGE'}
+
+
+def _sub_request(parent, path, query, headers):
+    """A GET request for `path` that shares the batch request's session, user and cookies."""
+    request = HttpRequest()
+    request.method = 'GET'
+    request.path = request.path_info = path
+    request.META = {
+        key: value for key, value in parent.META.items()
+        if not key.startswith('HTTP_IF_') and key not in ('CONTENT_TYPE', 'CONTENT_LENGTH')
+    }
+    request.META.update(REQUEST_METHOD='GET', PATH_INFO=path, QUERY_STRING=query)
+    for name, value in headers.items():
+        if name in FORWARDED_HEADERS:
+            request.META[FORWARDED_HEADERS[name]] = str(value)
+    request.GET = QueryDict(query)
+    request.COOKIES = parent.COOKIES
+    for attribute in ('session', 'user'):
+        if hasattr(parent, attribute):
+            setattr(request, attribute, getattr(parent, attribute))
+    return request
+
+
+def _error(status, message):
+    return {'status': status, 'body': {'success': False, 'error': message}}
+
+
+def _run(parent, spec):
+    """Run one sub-request and return its status, ETag and decoded JSON body."""
+    try:
+        if isinstance(spec, str):
+            spec = {'path': spec}
+        url = urlsplit(spec.get('path') or '')
+        if spec.get('method', 'GET').upper() != 'GET':
+            return _error(405, 'Only GET requests can be batched')
+        if url.scheme or url.netloc or not url.path.startswith('/api/') or url.path.rstrip('/') == '/api/batch':
+            return _error(400, 'Only /api/ endpoints other than /api/batch/ can be batched')
+        try:
+            match = resolve(url.path)
+        except Resolver404:
+            return _error(404, 'No endpoint matches this path')
+
+        request = _sub_request(parent, url.path, url.query, spec.get('headers') or {})
+        request.resolver_match = match
+        response = match.func(request, *match.args, **match.kwargs)
+
+        result = {'status': response.status_code}
+        if response.get('ETag'):
+            result['etag'] = response['ETag']
+        if response.status_code == 304:
+            return result
+        if response.streaming or not response.get('Content-Type', '').startswith('application/json'):
+            return _error(415, 'Only endpoints that return JSON can be batched')
+        result['body'] = json.loads(response.content)
+        return result
+    except Exception as e:
+        return _error(500, str(e))
+
+
+def _run_in_worker(parent, spec):
+    try:
+        return _run(parent, spec)
+    finally:
+        # Worker threads get their own Django DB connections; do not leak them
+        connections.close_all()
+
+
+def batch(request):
+    """Run GET sub-requests in-process and return all their responses at once.
+
+    POST JSON: a list of sub-requests, or {"requests": [...]}. Each one is a
+    site-relative path with its query string, or an object with path and optional id and
+    headers (If-None-Match, Accept-Language). At most BATCH_MAX_REQUESTS per
+    batch; they run concurrently on up to BATCH_WORKERS threads.
+
+    Responses come back in request order as {id, path, status, etag, body};
+    a failing sub-request does not fail the batch.
+    """
+    if request.method != 'POST':
+        return JsonResponse({'success': False, 'error': 'Invalid request method'}, status=405)
+
+    try:
+        data = json.loads(request.body)
+    except ValueError:
+        return JsonResponse({'success': False, 'error': 'Invalid JSON'}, status=400)
+    specs = data.get('requests') if isinstance(data, dict) else data
+    if not isinstance(specs, list) or not specs:
+        return JsonResponse({'success': False, 'error': 'Expected a non-empty list of requests'}, status=400)
+    if len(specs) > settings.BATCH_MAX_REQUESTS:
+        return JsonResponse({'success': False, 'error': f'At most {settings.BATCH_MAX_REQUESTS} requests per batch'}, status=400)
+    if not all(isinstance(spec, (str, dict)) for spec in specs):
+        return JsonResponse({'success': False, 'error': 'Each request must be a path or an object with a path'}, status=400)
+
+    workers = max(1, min(settings.BATCH_WORKERS, len(specs)))
+    if workers == 1:
+        results = [_run(request, spec) for spec in specs]
+    else:
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='api-batch') as pool:
+            results = list(pool.map(lambda spec: _run_in_worker(request, spec), specs))
+
+    responses = []
+    for index, (spec, result) in enumerate(zip(specs, results)):
+        path = spec if isinstance(spec, str) else spec.get('path')
+        ident = index if isinstance(spec, str) else spec.get('id', index)
+        responses.append({'id': ident, 'path': path, **result})
+    return JsonResponse({'success': True, 'responses': responses})
@@ -0,0 +1,216 @@
+"""Deadlines and a circuit breaker for MongoDB work done by views.
+
+Views guarded with @mongo_guard run their queries under a pymongo.timeout
+deadline, so every operation is sent with a maxTimeMS and a socket timeout
+taken from what is left of the request's budget. When mongod stalls, a
+request fails after MONGODB_REQUEST_TIMEOUT_SECONDS instead of holding a
+worker for as long as the driver's defaults allow.
+
+Network errors and timeouts reported by the driver count as failures.
+After MONGODB_BREAKER_FAILURES of them in a row the breaker opens, and
+guarded views answer 503 straight away without touching MongoDB. After
+MONGODB_BREAKER_RESET_SECONDS one request is let through as a trial: if
+its commands succeed the breaker closes, if they fail it opens again.
+
+The listener has to be passed to the client when it is created, so it is
+wired into mongoengine.connect in prs/settings.py. Breaker state is
+exported on /api/_metrics.
+"""
+import math
+import threading
+import time
+from functools import wraps
+
+import pymongo
+from django.conf import settings
+from django.http import HttpResponse, JsonResponse
+from pymongo import monitoring
+from pymongo.errors import ConnectionFailure, ExecutionTimeout, PyMongoError
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+# Gauge values for prs_mongo_breaker_state
+STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+# Client-side exceptions in failure documents that mean the server is unreachable or too slow
+OUTAGE_ERROR_TYPES = {
+    'AutoReconnect', 'ConnectionFailure', 'NetworkTimeout', 'ExecutionTimeout',
+    'ServerSelectionTimeoutError', 'WaitQueueTimeoutError',
+}
+
+# Server error codes with the same meaning: HostUnreachable, HostNotFound,
+# MaxTimeMSExpired, NetworkTimeout, ShutdownInProgress, PrimarySteppedDown,
+# ExceededTimeLimit, NotWritablePrimary, InterruptedAtShutdown,
+# InterruptedDueToReplStateChange, NotPrimaryNoSecondaryOk, NotPrimaryOrSecondary
+OUTAGE_ERROR_CODES = {6, 7, 50, 89, 91, 189, 262, 10107, 11600, 11602, 13435, 13436}
+
+
+class CircuitBreaker:
+    """Consecutive-failure circuit breaker: closed, open, then half-open for one trial request."""
+
+    def __init__(self, name):
+        self.name = name
+        self._lock = threading.Lock()
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = None
+        self.trial_started_at = None
+        self.trips = 0
+        self.rejected = 0
+
+    def allow(self):
+        """Whether a request may go to the database now; lets one trial through once the reset time has passed."""
+        reset = settings.MONGODB_BREAKER_RESET_SECONDS
+        now = time.monotonic()
+        with self._lock:
+            if self.state == CLOSED:
+                return True
+            if self.state == OPEN and now - self.opened_at >= reset:
+                self.state = HALF_OPEN
+                self.trial_started_at = now
+                return True
+            if self.state == HALF_OPEN and now - self.trial_started_at >= reset:
+                # The trial never reported back (it issued no commands); try another
+                self.trial_started_at = now
+                return True
+            self.rejected += 1
+            return False
+
+    def retry_after(self):
+        """Whole seconds until the next trial request is let through."""
+        with self._lock:
+            if self.state == CLOSED:
+                return 0
+            started = self.opened_at if self.state == OPEN else self.trial_started_at
+            remaining = settings.MONGODB_BREAKER_RESET_SECONDS - (time.monotonic() - started)
+            return max(1, math.ceil(remaining))
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            if self.state != CLOSED:
+                self.state = CLOSED
+                self.opened_at = self.trial_started_at = None
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == HALF_OPEN or (self.state == CLOSED and self.failures >= settings.MONGODB_BREAKER_FAILURES):
+                self.state = OPEN
+                self.opened_at = time.monotonic()
+                self.trial_started_at = None
+                self.trips += 1
+
+    def is_open(self):
+        with self._lock:
+            return self.state == OPEN
+
+
+def is_outage(failure):
+    """Whether a command failure document means MongoDB is unreachable or timing out, rather than a bad query."""
+    return failure.get('errtype') in OUTAGE_ERROR_TYPES or failure.get('code') in OUTAGE_ERROR_CODES
+
+
+class BreakerListener(monitoring.CommandListener, monitoring.ServerHeartbeatListener):
+    """Feed command and heartbeat outcomes into a CircuitBreaker.
+
+    Also remembers, per thread, whether the current request hit an outage,
+    so mongo_guard can tell a database timeout from any other error even
+    though the views catch their exceptions.
+    """
+
+    def __init__(self, breaker):
+        self.breaker = breaker
+        self._local = threading.local()
+
+    def reset_request(self):
+        self._local.outage = False
+
+    def request_hit_outage(self):
+        return getattr(self._local, 'outage', False)
+
+    def started(self, event):
+        pass
+
+    def succeeded(self, event):
+        if isinstance(event, monitoring.CommandSucceededEvent):
+            self.breaker.record_success()
+
+    def failed(self, event):
+        if isinstance(event, monitoring.ServerHeartbeatFailedEvent):
+            # Runs on the monitor thread, so it only counts towards the breaker
+            self.breaker.record_failure()
+        elif is_outage(event.failure):
+            self._local.outage = True
+            self.breaker.record_failure()
+
+
+mongo_breaker = CircuitBreaker('mongodb')
+breaker_listener = BreakerListener(mongo_breaker)
+
+
+def _unavailable(request):
+    message = 'Database temporarily unavailable, please retry shortly'
+    if request.path.startswith('/api/'):
+        response = JsonResponse({'success': False, 'error': message}, status=503)
+    else:
+        response = HttpResponse(message, status=503, content_type='text/plain')
+    response['Retry-After'] = str(mongo_breaker.retry_after() or 1)
+    return response
+
+
+def mongo_guard(view=None, *, timeout=None):
+    """Run a view under a MongoDB deadline and behind the circuit breaker.
+
+    `timeout` is the view's budget in seconds for all of its queries,
+    MONGODB_REQUEST_TIMEOUT_SECONDS by default; views that also write
+    uploaded files pass a longer one. While the breaker is open the view is
+    not called and the client gets 503 with Retry-After. A 500 caused by a
+    database timeout or network error is turned into the same 503.
+
+    Usable bare (@mongo_guard) or with arguments (@mongo_guard(timeout=30)).
+    """
+    if view is None:
+        return lambda view: mongo_guard(view, timeout=timeout)
+
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if not mongo_breaker.allow():
+            return _unavailable(request)
+        breaker_listener.reset_request()
+        try:
+            with pymongo.timeout(timeout or settings.MONGODB_REQUEST_TIMEOUT_SECONDS):
+                response = view(request, *args, **kwargs)
+        except PyMongoError as e:
+            if not (e.timeout or isinstance(e, (ConnectionFailure, ExecutionTimeout))):
+                raise
+            if not breaker_listener.request_hit_outage():
+                # Server selection fails before any command event is published
+                mongo_breaker.record_failure()
+            return _unavailable(request)
+        if response.status_code == 500 and (breaker_listener.request_hit_outage() or mongo_breaker.is_open()):
+            return _unavailable(request)
+        return response
+    return wrapper
+
+
+def render_metrics():
+    breaker = mongo_breaker
+    with breaker._lock:
+        state, failures, trips, rejected = breaker.state, breaker.failures, breaker.trips, breaker.rejected
+    return [
+        '# HELP prs_mongo_breaker_state MongoDB circuit breaker state: 0 closed, 1 half-open, 2 open',
+        '# TYPE prs_mongo_breaker_state gauge',
+        f'prs_mongo_breaker_state{{breaker="{breaker.name}",state="{state}"}} {STATE_VALUES[state]}',
+        '# HELP prs_mongo_breaker_consecutive_failures MongoDB timeouts and network errors since the last success',
+        '# TYPE prs_mongo_breaker_consecutive_failures gauge',
+        f'prs_mongo_breaker_consecutive_failures{{breaker="{breaker.name}"}} {failures}',
+        '# HELP prs_mongo_breaker_trips_total Times the breaker opened',
+        '# TYPE prs_mongo_breaker_trips_total counter',
+        f'prs_mongo_breaker_trips_total{{breaker="{breaker.name}"}} {trips}',
+        '# HELP prs_mongo_breaker_rejected_total Requests answered 503 without calling MongoDB',
+        '# TYPE prs_mongo_breaker_rejected_total counter',
+        f'prs_mongo_breaker_rejected_total{{breaker="{breaker.name}"}} {rejected}',
+    ]
@@ -0,0 +1,132 @@
+"""Idempotency-Key support for POST endpoints that create or decide things.
+
+A client that retries a request with the same Idempotency-Key header gets
+the response of the first attempt back instead of a second deal, project
+or verification. Keys and the responses they produced are kept in the
+idempotency_keys collection until its TTL index removes them.
+"""
+import hashlib
+from datetime import datetime, timedelta
+from functools import wraps
+
+from django.http import HttpResponse, JsonResponse
+from mongoengine import Document, StringField, DateTimeField, IntField
+from pymongo.errors import DuplicateKeyError
+
+# How long a key is remembered; retries after this run the request again
+IDEMPOTENCY_TTL_SECONDS = 24 * 60 * 60
+
+# A request still marked in progress after this long is assumed to have died
+# with its worker, and a retry may take the key over
+IDEMPOTENCY_LOCK_SECONDS = 10 * 60
+
+MAX_KEY_LENGTH = 255
+
+
+class IdempotencyRecord(Document):
+    """The first request made with an Idempotency-Key on one endpoint, and its response once finished."""
+    id = StringField(primary_key=True)  # "<path>:<key>"
+    fingerprint = StringField(required=True)  # Hash of the request, so a key cannot be reused for another one
+    status = StringField(choices=["in_progress", "completed"], default="in_progress")
+    response_status = IntField()
+    response_body = StringField()
+    content_type = StringField()
+    created_at = DateTimeField(default=datetime.utcnow)
+    locked_at = DateTimeField(default=datetime.utcnow)
+
+    meta = {
+        'collection': 'idempotency_keys',
+        'indexes': [
+            {'fields': ['created_at'], 'expireAfterSeconds': IDEMPOTENCY_TTL_SECONDS}
+        ]
+    }
+
+
+def request_fingerprint(request):
+    """Hash of the request's method, path and parameters.
+
+    Multipart requests are hashed from their form fields and the names and
+    sizes of their files, so large uploads are not read twice.
+    """
+    digest = hashlib.sha256(f'{request.method} {request.path}\n'.encode())
+    if request.content_type == 'multipart/form-data':
+        for name, values in sorted(request.POST.lists()):
+            digest.update(f'{name}={values!r}\n'.encode())
+        for name, files in sorted(request.FILES.lists()):
+            digest.update(f'{name}={[(f.name, f.size) for f in files]!r}\n'.encode())
+    else:
+        digest.update(request.body)
+    return digest.hexdigest()
+
+
+def _replay(record):
+    response = HttpResponse(record.response_body, status=record.response_status, content_type=record.content_type)
+    response['Idempotent-Replayed'] = 'true'
+    return response
+
+
+def _acquire(record_id, fingerprint):
+    """Claim the key for this request; returns None when it may run, or the response to send instead."""
+    now = datetime.utcnow()
+    collection = IdempotencyRecord._get_collection()
+    try:
+        collection.insert_one(IdempotencyRecord(id=record_id, fingerprint=fingerprint, created_at=now, locked_at=now).to_mongo())
+        return None
+    except DuplicateKeyError:
+        pass
+
+    record = IdempotencyRecord.objects(id=record_id).first()
+    if record is None:
+        # Expired between the insert and the read
+        return _acquire(record_id, fingerprint)
+    if record.fingerprint != fingerprint:
+        return JsonResponse({'success': False, 'error': 'Idempotency-Key was already used for a different request'}, status=422)
+    if record.status == 'completed':
+        return _replay(record)
+    if record.locked_at < now - timedelta(seconds=IDEMPOTENCY_LOCK_SECONDS):
+        # Take over from a request that never finished; only one retry can win
+        result = collection.update_one({'_id': record_id, 'status': 'in_progress', 'locked_at': record.locked_at},
+                                       {'$set': {'locked_at': now}})
+        if result.modified_count:
+            return None
+    response = JsonResponse({'success': False, 'error': 'A request with this Idempotency-Key is still being processed'}, status=409)
+    response['Retry-After'] = '1'
+    return response
+
+
+def idempotent(view):
+    """Honour an Idempotency-Key header on a POST view.
+
+    Responses below 500 are stored and replayed for retries with the same
+    key; after a server error or an exception the key is released so the
+    client can try again.
+    """
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        key = request.headers.get('Idempotency-Key')
+        if request.method != 'POST' or not key:
+            return view(request, *args, **kwargs)
+        if len(key) > MAX_KEY_LENGTH:
+            return JsonResponse({'success': False, 'error': f'Idempotency-Key is longer than {MAX_KEY_LENGTH} characters'}, status=400)
+
+        record_id = f'{request.path}:{key}'
+        early = _acquire(record_id, request_fingerprint(request))
+        if early is not None:
+            return early
+
+        try:
+            response = view(request, *args, **kwargs)
+        except Exception:
+            IdempotencyRecord.objects(id=record_id).delete()
+            raise
+        if response.status_code >= 500 or response.streaming:
+            IdempotencyRecord.objects(id=record_id).delete()
+        else:
+            IdempotencyRecord.objects(id=record_id).update_one(
+                set__status='completed',
+                set__response_status=response.status_code,
+                set__response_body=response.content.decode(response.charset),
+                set__content_type=response.get('Content-Type')
+            )
+        return response
+    return wrapper
@@ -0,0 +1,205 @@
+"""HTTP middleware shared across the project."""
+import mimetypes
+import os
+import re
+import zlib
+
+from django.conf import settings
+from django.http import FileResponse, HttpResponseNotModified
+from django.utils.cache import patch_vary_headers
+from django.utils.http import http_date
+
+try:
+    import brotli
+except ImportError:  # optional: br is only offered when installed
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:  # optional: zstd is only offered when installed
+    zstandard = None
+
+# Precompressed variants written by PrecompressedManifestStaticFilesStorage, best first
+STATIC_ENCODINGS = [('br', '.br'), ('gzip', '.gz')]
+
+# Matches the content hash ManifestStaticFilesStorage inserts before the extension
+HASHED_NAME = re.compile(r'\.[0-9a-f]{12}\.[^./]+$')
+
+# Media types that are already compressed and gain nothing from another pass
+INCOMPRESSIBLE_TYPES = (
+    'image/', 'video/', 'audio/', 'application/pdf', 'application/zip',
+    'application/gzip', 'application/x-7z-compressed', 'application/x-rar-compressed',
+    'application/vnd.openxmlformats-officedocument', 'font/woff',
+)
+
+
+class StaticFilesMiddleware:
+    """Serve collected static files from STATIC_ROOT without reaching the URL router.
+
+    Fingerprinted files get a far-future immutable Cache-Control since their
+    name changes with their content; other files are cached briefly. The .br
+    or .gz variant is sent when the client accepts it (q=0 refuses it), under
+    an ETag of its own. Requests for files not in STATIC_ROOT fall through,
+    so runserver's finder-based serving still works in development before
+    collectstatic has run.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.prefix = '/' + settings.STATIC_URL.lstrip('/')
+        self.root = os.path.realpath(settings.STATIC_ROOT) if settings.STATIC_ROOT else None
+
+    def __call__(self, request):
+        if self.root and request.path.startswith(self.prefix) and request.method in ('GET', 'HEAD'):
+            response = self.serve(request, request.path[len(self.prefix):])
+            if response is not None:
+                return response
+        return self.get_response(request)
+
+    def serve(self, request, name):
+        path = os.path.realpath(os.path.join(self.root, name))
+        if not path.startswith(self.root + os.sep) or not os.path.isfile(path):
+            return None
+        
+        variants = [encoding for encoding, suffix in STATIC_ENCODINGS if os.path.isfile(path + suffix)]
+        encoding = negotiate_encoding(request.headers.get('Accept-Encoding', ''), variants)
+        served_path = path + dict(STATIC_ENCODINGS)[encoding] if encoding else path
+        
+        # Each encoding is its own representation with its own validator
+        stat = os.stat(path)
+        variant = f'-{encoding}' if encoding else ''
+        etag = f'"{stat.st_mtime_ns:x}-{stat.st_size:x}{variant}"'
+        if_none_match = [tag.strip().removeprefix('W/') for tag in request.headers.get('If-None-Match', '').split(',')]
+        if etag in if_none_match or '*' in if_none_match:
+            response = HttpResponseNotModified()
+        else:
+            content_type = mimetypes.guess_type(path)[0] or 'application/octet-stream'
+            response = FileResponse(open(served_path, 'rb'), content_type=content_type)
+            if encoding:
+                response['Content-Encoding'] = encoding
+            response['Last-Modified'] = http_date(stat.st_mtime)
+        
+        response['ETag'] = etag
+        response['Vary'] = 'Accept-Encoding'
+        if HASHED_NAME.search(name):
+            response['Cache-Control'] = f'public, max-age={settings.STATIC_MAX_AGE}, immutable'
+        else:
+            response['Cache-Control'] = 'public, max-age=60'
+        return response
+
+
+class _Compressor:
+    """Incremental compressor with a common interface over the supported encodings."""
+
+    def __init__(self, encoding, level):
+        self.encoding = encoding
+        if encoding == 'gzip':
+            self._obj = zlib.compressobj(level, zlib.DEFLATED, 31)
+        elif encoding == 'br':
+            self._obj = brotli.Compressor(quality=level)
+        else:
+            self._obj = zstandard.ZstdCompressor(level=level).compressobj()
+
+    def compress(self, data):
+        if self.encoding == 'br':
+            return self._obj.process(data)
+        return self._obj.compress(data)
+
+    def flush(self):
+        """Emit everything compressed so far without ending the stream."""
+        if self.encoding == 'gzip':
+            return self._obj.flush(zlib.Z_SYNC_FLUSH)
+        if self.encoding == 'br':
+            return self._obj.flush()
+        return self._obj.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK)
+
+    def finish(self):
+        if self.encoding == 'br':
+            return self._obj.finish()
+        return self._obj.flush()
+
+
+def available_encodings():
+    """Encodings from COMPRESSION_ENCODINGS whose library is installed, in preference order."""
+    installed = {'gzip': True, 'br': brotli is not None, 'zstd': zstandard is not None}
+    return [encoding for encoding in settings.COMPRESSION_ENCODINGS if installed.get(encoding)]
+
+
+def negotiate_encoding(accept_encoding, encodings):
+    """Pick the first of encodings the client accepts with a non-zero q-value."""
+    accepted = {}
+    for part in accept_encoding.split(','):
+        coding, _, params = part.strip().partition(';')
+        quality = 1.0
+        if params.strip().startswith('q='):
+            try:
+                quality = float(params.strip()[2:])
+            except ValueError:
+                quality = 0.0
+        accepted[coding.strip().lower()] = quality
+    for encoding in encodings:
+        if accepted.get(encoding, accepted.get('*', 0)) > 0:
+            return encoding
+    return None
+
+
+class CompressionMiddleware:
+    """Compress /api/ responses with zstd, brotli or gzip, as negotiated.
+
+    Responses smaller than COMPRESSION_MIN_SIZE, already encoded, partial or
+    carrying already-compressed media (PDF receipts, images, archives) are
+    passed through untouched. Streaming responses are compressed chunk by
+    chunk, so large exports are never buffered in memory.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.encodings = available_encodings()
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        if not request.path.startswith('/api/') or not self.encodings:
+            return response
+        
+        patch_vary_headers(response, ('Accept-Encoding',))
+        # File downloads go out as-is so the server can use sendfile
+        if (
+            response.status_code in (204, 206, 304)
+            or isinstance(response, FileResponse)
+            or response.has_header('Content-Encoding')
+            or response.get('Content-Type', '').split(';')[0].strip().startswith(INCOMPRESSIBLE_TYPES)
+            or (not response.streaming and len(response.content) < settings.COMPRESSION_MIN_SIZE)
+        ):
+            return response
+        
+        encoding = negotiate_encoding(request.headers.get('Accept-Encoding', ''), self.encodings)
+        if encoding is None:
+            return response
+        
+        compressor = _Compressor(encoding, settings.COMPRESSION_LEVELS[encoding])
+        if response.streaming:
+            response.streaming_content = self._compress_stream(response.streaming_content, compressor)
+            del response['Content-Length']
+        else:
+            response.content = compressor.compress(response.content) + compressor.finish()
+            response['Content-Length'] = str(len(response.content))
+        
+        # The body changed, so a strong validator no longer applies
+        etag = response.get('ETag')
+        if etag and not etag.startswith('W/'):
+            response['ETag'] = 'W/' + etag
+        response['Content-Encoding'] = encoding
+        return response
+
+    @staticmethod
+    def _compress_stream(content, compressor):
+        first = True
+        for chunk in content:
+            data = compressor.compress(chunk)
+            if first:
+                # Get the first bytes (e.g. a CSV header) to the client straight away
+                data += compressor.flush()
+                first = False
+            if data:
+                yield data
+        yield compressor.finish()
@@ -0,0 +1,26 @@
+"""Helpers for talking to MongoDB below the mongoengine document layer."""
+from mongoengine.connection import get_connection
+
+
+def is_mongomock(client):
+    """True for mongomock's in-memory client, which lacks the newer aggregation operators."""
+    return type(client).__module__.split('.')[0] == 'mongomock'
+
+
+def supports_transactions(client):
+    """True when the deployment is a replica set or sharded cluster, where multi-document transactions work."""
+    description = getattr(client, 'topology_description', None)
+    return description is not None and description.topology_type_name in ('ReplicaSetWithPrimary', 'Sharded')
+
+
+def run_in_transaction(callback):
+    """Run callback(session) inside a transaction when the server supports one.
+
+    On a standalone mongod (and mongomock) callback runs with session=None,
+    so the writes it makes are applied one after another without atomicity.
+    """
+    client = get_connection()
+    if not supports_transactions(client):
+        return callback(None)
+    with client.start_session() as session:
+        return session.with_transaction(callback)
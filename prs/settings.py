@@ -13,6 +13,8 @@ https://docs.djangoproject.com/en/5.2/ref/settings/
 from pathlib import Path
 import mongoengine
 import os
+from monitoring.listeners import command_listener, SlowQueryListener
+from prs.breaker import breaker_listener
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -44,9 +46,16 @@ INSTALLED_APPS = [
     "projects",
     "notifications",
     "users",
+    "monitoring",
+    "files",
+    "sync",
+    "analytics",
 ]
 
 MIDDLEWARE = [
+    "prs.middleware.StaticFilesMiddleware",
+    "monitoring.middleware.ProfilingMiddleware",
+    "prs.middleware.CompressionMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
@@ -85,14 +94,96 @@ MONGODB_PORT = int(os.getenv('MONGODB_PORT', '27017'))
 MONGODB_USERNAME = os.getenv('MONGODB_USERNAME', '')
 MONGODB_PASSWORD = os.getenv('MONGODB_PASSWORD', '')
 
+# Commands slower than this are explained and logged to the slow_queries collection
+SLOW_QUERY_THRESHOLD_MS = float(os.getenv('SLOW_QUERY_THRESHOLD_MS', '100'))
+SLOW_QUERY_EXPLAIN = os.getenv('SLOW_QUERY_EXPLAIN', 'true').lower() == 'true'
+
+# Driver timeouts for every connection, including management commands: how
+# long to look for a reachable server, to open a connection, and to wait on
+# a reply. Long aggregations (refresh_rollups on a big database) may need a
+# larger MONGODB_SOCKET_TIMEOUT_MS
+MONGODB_SERVER_SELECTION_TIMEOUT_MS = int(os.getenv('MONGODB_SERVER_SELECTION_TIMEOUT_MS', '3000'))
+MONGODB_CONNECT_TIMEOUT_MS = int(os.getenv('MONGODB_CONNECT_TIMEOUT_MS', '3000'))
+MONGODB_SOCKET_TIMEOUT_MS = int(os.getenv('MONGODB_SOCKET_TIMEOUT_MS', '60000'))
+
+# Budget for all the queries of one request to a view guarded by
+# prs.breaker.mongo_guard; views that store uploaded files get the longer one
+MONGODB_REQUEST_TIMEOUT_SECONDS = float(os.getenv('MONGODB_REQUEST_TIMEOUT_SECONDS', '5'))
+MONGODB_UPLOAD_TIMEOUT_SECONDS = float(os.getenv('MONGODB_UPLOAD_TIMEOUT_SECONDS', '30'))
+
+# Circuit breaker: open after this many MongoDB timeouts or network errors in
+# a row, answer 503 while open, and let a trial request through after the reset time
+MONGODB_BREAKER_FAILURES = int(os.getenv('MONGODB_BREAKER_FAILURES', '5'))
+MONGODB_BREAKER_RESET_SECONDS = int(os.getenv('MONGODB_BREAKER_RESET_SECONDS', '30'))
+
 mongoengine.connect(
     db=MONGODB_NAME,
     host=MONGODB_HOST,
     port=MONGODB_PORT,
     username=MONGODB_USERNAME,
-    password=MONGODB_PASSWORD
+    password=MONGODB_PASSWORD,
+    serverSelectionTimeoutMS=MONGODB_SERVER_SELECTION_TIMEOUT_MS,
+    connectTimeoutMS=MONGODB_CONNECT_TIMEOUT_MS,
+    socketTimeoutMS=MONGODB_SOCKET_TIMEOUT_MS,
+    event_listeners=[
+        command_listener,
+        SlowQueryListener(threshold_ms=SLOW_QUERY_THRESHOLD_MS, explain=SLOW_QUERY_EXPLAIN),
+        breaker_listener
+    ]
 )
 
+# Request profiling
+# Fraction of requests profiled for Server-Timing and /api/_metrics (0 disables)
+PROFILING_SAMPLE_RATE = float(os.getenv('PROFILING_SAMPLE_RATE', '1.0'))
+# Sliding window covered by the /api/_metrics histograms
+PROFILING_WINDOW_SECONDS = int(os.getenv('PROFILING_WINDOW_SECONDS', '300'))
+# Who may scrape /api/_metrics: clients sending "Authorization: Bearer <METRICS_TOKEN>"
+# when a token is set, and clients connecting from METRICS_ALLOWED_IPS
+METRICS_TOKEN = os.getenv('METRICS_TOKEN', '')
+METRICS_ALLOWED_IPS = [ip.strip() for ip in os.getenv('METRICS_ALLOWED_IPS', '127.0.0.1,::1').split(',') if ip.strip()]
+
+# Pagination
+# Rows embedded in the first render of each dashboard
+DASHBOARD_PAGE_SIZE = int(os.getenv('DASHBOARD_PAGE_SIZE', '50'))
+# Upper bound for the page_size parameter of the list APIs
+MAX_PAGE_SIZE = int(os.getenv('MAX_PAGE_SIZE', '500'))
+
+# Incremental sync (/api/sync/): writes newer than SYNC_SETTLE_SECONDS are held
+# back so clock skew and in-flight writes cannot slip behind a token, and one
+# response carries at most SYNC_MAX_CHANGES documents per collection
+SYNC_SETTLE_SECONDS = float(os.getenv('SYNC_SETTLE_SECONDS', '2'))
+SYNC_MAX_CHANGES = int(os.getenv('SYNC_MAX_CHANGES', '500'))
+
+# How long /api/supervisors/workload/ reuses its aggregation
+WORKLOAD_CACHE_SECONDS = int(os.getenv('WORKLOAD_CACHE_SECONDS', '30'))
+
+# /api/batch/: sub-requests per batch, and threads running them concurrently
+BATCH_MAX_REQUESTS = int(os.getenv('BATCH_MAX_REQUESTS', '20'))
+BATCH_WORKERS = int(os.getenv('BATCH_WORKERS', '4'))
+
+# Single-flight coalescing of identical concurrent list queries. With
+# SINGLE_FLIGHT_CACHE_LOCK, processes also coordinate through the cache: one
+# runs the query and shares its result for SINGLE_FLIGHT_SHARE_SECONDS, the
+# others wait up to SINGLE_FLIGHT_WAIT_SECONDS for it (needs a shared cache)
+SINGLE_FLIGHT_CACHE_LOCK = os.getenv('SINGLE_FLIGHT_CACHE_LOCK', 'false').lower() == 'true'
+SINGLE_FLIGHT_SHARE_SECONDS = int(os.getenv('SINGLE_FLIGHT_SHARE_SECONDS', '1'))
+SINGLE_FLIGHT_WAIT_SECONDS = int(os.getenv('SINGLE_FLIGHT_WAIT_SECONDS', '5'))
+
+# How long a deal claimed through /api/deals/claim/ stays with its verifier
+# without a heartbeat before it goes back to the queue
+VERIFICATION_LEASE_SECONDS = int(os.getenv('VERIFICATION_LEASE_SECONDS', '300'))
+
+# API response compression
+# Encodings offered, in order of preference; br and zstd need the brotli and zstandard packages
+COMPRESSION_ENCODINGS = ['zstd', 'br', 'gzip']
+COMPRESSION_LEVELS = {
+    'gzip': int(os.getenv('COMPRESSION_LEVEL_GZIP', '6')),
+    'br': int(os.getenv('COMPRESSION_LEVEL_BR', '4')),
+    'zstd': int(os.getenv('COMPRESSION_LEVEL_ZSTD', '3')),
+}
+# Responses smaller than this are sent uncompressed
+COMPRESSION_MIN_SIZE = int(os.getenv('COMPRESSION_MIN_SIZE', '1024'))
+
 # Django still needs a database for its internal operations
 # We'll use SQLite as a lightweight option
 DATABASES = {
@@ -140,6 +231,19 @@ STATIC_URL = "static/"
 STATICFILES_DIRS = [
     os.path.join(BASE_DIR, 'static'),
 ]
+STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
+# Cache lifetime for fingerprinted static files served by StaticFilesMiddleware
+STATIC_MAX_AGE = 60 * 60 * 24 * 365
+
+STORAGES = {
+    "default": {
+        "BACKEND": "django.core.files.storage.FileSystemStorage",
+    },
+    # Content-hashed names plus .gz/.br variants, written by collectstatic
+    "staticfiles": {
+        "BACKEND": "prs.storage.PrecompressedManifestStaticFilesStorage",
+    },
+}
 
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
@@ -150,6 +254,26 @@ DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# How /api/files/ hands downloads to the front proxy: '' (serve from Django),
+# 'x-accel-redirect' (nginx) or 'x-sendfile' (Apache mod_xsendfile, lighttpd)
+MEDIA_ACCEL_REDIRECT = os.getenv('MEDIA_ACCEL_REDIRECT', '')
+# nginx `internal` location aliased to MEDIA_ROOT, used with x-accel-redirect
+MEDIA_ACCEL_PREFIX = os.getenv('MEDIA_ACCEL_PREFIX', '/protected-media/')
+
+# Resumable uploads: partial files are kept here (on the same volume as
+# MEDIA_ROOT so finalize is an atomic rename) and each chunk request may
+# carry at most UPLOAD_MAX_CHUNK_SIZE bytes
+UPLOAD_TEMP_DIR = os.getenv('UPLOAD_TEMP_DIR', os.path.join(MEDIA_ROOT, 'uploads_tmp'))
+UPLOAD_MAX_CHUNK_SIZE = int(os.getenv('UPLOAD_MAX_CHUNK_SIZE', str(8 * 1024 * 1024)))
+UPLOAD_MAX_FILE_SIZE = int(os.getenv('UPLOAD_MAX_FILE_SIZE', str(10 * 1024 * 1024 * 1024)))
+
+# Uploaded files in a request are written on up to FILE_WRITE_WORKERS threads.
+# FILE_FSYNC: 'none' (leave flushing to the OS), 'file' (fsync each file) or
+# 'full' (also fsync the directories they were written to)
+FILE_WRITE_WORKERS = int(os.getenv('FILE_WRITE_WORKERS', '8'))
+FILE_FSYNC = os.getenv('FILE_FSYNC', 'none')
+
 # Create media directories
 RECEIPT_UPLOAD_PATH = os.path.join(MEDIA_ROOT, 'receipts')
 os.makedirs(RECEIPT_UPLOAD_PATH, exist_ok=True)
+os.makedirs(UPLOAD_TEMP_DIR, exist_ok=True)
@@ -0,0 +1,152 @@
+"""Coalesce identical concurrent work into one execution.
+
+When many requests ask for the same thing at once (every verifier opening
+the pending queue at 9am), only the first one runs the query; the others
+wait for it and reuse its result. This is not a cache: once the leading
+call finishes, the next request runs the work again.
+
+With SINGLE_FLIGHT_CACHE_LOCK enabled, leaders in different processes also
+coordinate through the cache backend: one of them takes a lock key and
+publishes its result for SINGLE_FLIGHT_SHARE_SECONDS, and the rest poll
+for it instead of running the query themselves. That needs a cache shared
+between processes (Redis, Memcached); with the default LocMemCache it only
+adds overhead.
+"""
+import hashlib
+import json
+import threading
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.core.cache import cache
+
+from monitoring.metrics import registry
+
+# Seconds between polls for a result published by another process
+CACHE_POLL_INTERVAL = 0.025
+
+_flights = []
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """Share one in-flight execution per key among concurrent callers.
+
+    Each instance counts its outcomes for /api/_metrics: leader (ran the
+    work), coalesced (waited for a leader in this process), shared (used a
+    result published by another process) and fallback (gave up waiting on
+    another process and ran the work anyway).
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self._lock = threading.Lock()
+        self._calls = {}
+        self.counts = Counter()
+        _flights.append(self)
+
+    def do(self, key, fn):
+        """Return fn(), or the result of an identical call already running for `key`.
+
+        Exceptions raised by the leading call are raised in every caller
+        that waited for it.
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+            else:
+                self.counts['coalesced'] += 1
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = self._run(key, fn)
+            return call.result
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+    def _run(self, key, fn):
+        if not settings.SINGLE_FLIGHT_CACHE_LOCK:
+            self._count('leader')
+            return fn()
+
+        digest = hashlib.sha1(key.encode()).hexdigest()
+        result_key = f'singleflight:{self.name}:{digest}:result'
+        lock_key = f'singleflight:{self.name}:{digest}:lock'
+        wait = settings.SINGLE_FLIGHT_WAIT_SECONDS
+
+        if cache.add(lock_key, 1, timeout=wait):
+            try:
+                self._count('leader')
+                result = fn()
+                cache.set(result_key, result, timeout=settings.SINGLE_FLIGHT_SHARE_SECONDS)
+                return result
+            finally:
+                cache.delete(lock_key)
+
+        # Another process is running it; wait for its result
+        deadline = time.monotonic() + wait
+        while time.monotonic() < deadline:
+            result = cache.get(result_key)
+            if result is not None:
+                self._count('shared')
+                return result
+            if cache.get(lock_key) is None:
+                break
+            time.sleep(CACHE_POLL_INTERVAL)
+        result = cache.get(result_key)
+        if result is not None:
+            self._count('shared')
+            return result
+        self._count('fallback')
+        return fn()
+
+    def _count(self, outcome):
+        with self._lock:
+            self.counts[outcome] += 1
+
+    def in_flight(self):
+        with self._lock:
+            return len(self._calls)
+
+
+def flight_key(**params):
+    """Normalized key for a set of parameters: order-independent and JSON-stable."""
+    return json.dumps(params, sort_keys=True, default=str, separators=(',', ':'))
+
+
+def _render_metrics():
+    lines = [
+        '# HELP prs_singleflight_calls_total Calls by outcome: leader ran the work, coalesced/shared reused a result',
+        '# TYPE prs_singleflight_calls_total counter',
+    ]
+    for flight in _flights:
+        with flight._lock:
+            counts = dict(flight.counts)
+        for outcome in ('leader', 'coalesced', 'shared', 'fallback'):
+            lines.append(f'prs_singleflight_calls_total{{flight="{flight.name}",outcome="{outcome}"}} {counts.get(outcome, 0)}')
+    lines.append('# HELP prs_singleflight_in_flight Keys currently being computed')
+    lines.append('# TYPE prs_singleflight_in_flight gauge')
+    for flight in _flights:
+        lines.append(f'prs_singleflight_in_flight{{flight="{flight.name}"}} {flight.in_flight()}')
+    return lines
+
+
+registry.register_collector(_render_metrics)
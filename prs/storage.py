@@ -0,0 +1,60 @@
+"""Static file storage that fingerprints and precompresses assets at collectstatic time."""
+import gzip
+
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+
+try:
+    import brotli
+except ImportError:  # brotli is optional; gzip variants are always written
+    brotli = None
+
+# Only text assets benefit from compression
+COMPRESSIBLE_EXTENSIONS = ('.js', '.css', '.html', '.svg', '.json', '.txt', '.map', '.xml')
+
+# Files smaller than this are not worth a compressed variant
+MIN_COMPRESS_SIZE = 256
+
+
+class PrecompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    """ManifestStaticFilesStorage that also writes .gz and .br next to each text asset.
+
+    StaticFilesMiddleware serves the variants when the client accepts them, so
+    nothing is compressed per request.
+    """
+
+    def post_process(self, paths, dry_run=False, **options):
+        processed_names = set()
+        for name, hashed_name, processed in super().post_process(paths, dry_run, **options):
+            if hashed_name and not isinstance(processed, Exception):
+                processed_names.update((name, hashed_name))
+            yield name, hashed_name, processed
+        
+        if dry_run:
+            return
+        for name in sorted(processed_names):
+            for compressed_name in self.compress(name):
+                yield name, compressed_name, True
+
+    def compress(self, name):
+        """Write compressed variants of name, returning the variant names written."""
+        if not name.endswith(COMPRESSIBLE_EXTENSIONS):
+            return []
+        path = self.path(name)
+        with open(path, 'rb') as f:
+            content = f.read()
+        if len(content) < MIN_COMPRESS_SIZE:
+            return []
+        
+        written = []
+        variants = [('.gz', lambda data: gzip.compress(data, compresslevel=9, mtime=0))]
+        if brotli is not None:
+            variants.append(('.br', lambda data: brotli.compress(data, quality=11)))
+        for suffix, compressor in variants:
+            compressed = compressor(content)
+            # Skip variants that do not actually save anything
+            if len(compressed) >= len(content):
+                continue
+            with open(path + suffix, 'wb') as f:
+                f.write(compressed)
+            written.append(name + suffix)
+        return written
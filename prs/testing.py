@@ -0,0 +1,63 @@
+"""Test helpers: run MongoDB-backed tests against an in-memory mongomock database.
+
+mongomock is only needed to run the tests (and the mongomock benchmark
+backend); test cases built on MongoTestCase are skipped without it.
+"""
+import unittest
+
+import mongoengine
+from django.conf import settings
+from django.test import SimpleTestCase, override_settings
+from mongoengine.connection import disconnect, get_db
+
+from deals.models import Deal
+from prs.breaker import mongo_breaker
+
+try:
+    import mongomock
+except ImportError:
+    mongomock = None
+
+
+def make_deal(**fields):
+    """Save a deal with the required fields filled in; keyword arguments override them."""
+    fields = {'title': 'Deal', 'client_name': 'Client', 'contact_info': 'c@example.com', 'budget': 100,
+              'created_by': 'sales1', **fields}
+    return Deal(**fields).save()
+
+
+@unittest.skipIf(mongomock is None, 'mongomock is not installed')
+@override_settings(SESSION_ENGINE='django.contrib.sessions.backends.signed_cookies')
+class MongoTestCase(SimpleTestCase):
+    """SimpleTestCase connected to an empty mongomock database for every test.
+
+    Sessions are kept in signed cookies, so the test client needs no SQL database.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        # Also closes the client from settings, whose failing heartbeats would trip the breaker
+        disconnect()
+        mongoengine.connect('prs_test', host='mongodb://localhost', mongo_client_class=mongomock.MongoClient)
+
+    @classmethod
+    def tearDownClass(cls):
+        disconnect()
+        super().tearDownClass()
+
+    def setUp(self):
+        super().setUp()
+        db = get_db()
+        for name in db.list_collection_names():
+            db.drop_collection(name)
+        mongo_breaker.record_success()
+
+    def login(self, username, role):
+        """Put username and role in the test client's session, as login_view does."""
+        session = self.client.session
+        session['username'] = username
+        session['role'] = role
+        session.save()
+        # Signed-cookie sessions change key whenever they are saved
+        self.client.cookies[settings.SESSION_COOKIE_NAME] = session.session_key
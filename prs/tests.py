@@ -0,0 +1,343 @@
+import hashlib
+import json
+import threading
+import time
+from unittest import mock
+
+from bson import ObjectId
+from django.core.cache import cache
+from django.http import JsonResponse
+from django.test import RequestFactory, SimpleTestCase, override_settings
+
+from prs.breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker, mongo_breaker, mongo_guard
+from prs.idempotency import IdempotencyRecord, idempotent, request_fingerprint
+from prs.middleware import negotiate_encoding
+from prs.singleflight import SingleFlight, flight_key
+from prs.testing import MongoTestCase, make_deal
+
+
+class NegotiateEncodingTests(SimpleTestCase):
+
+    def test_first_supported_encoding_in_server_order(self):
+        self.assertEqual(negotiate_encoding('gzip, br', ['zstd', 'br', 'gzip']), 'br')
+        self.assertEqual(negotiate_encoding('gzip', ['zstd', 'br', 'gzip']), 'gzip')
+        self.assertIsNone(negotiate_encoding('deflate', ['br', 'gzip']))
+        self.assertIsNone(negotiate_encoding('', ['br', 'gzip']))
+
+    def test_zero_quality_refuses_an_encoding(self):
+        self.assertEqual(negotiate_encoding('br;q=0, gzip', ['br', 'gzip']), 'gzip')
+        self.assertEqual(negotiate_encoding('br; q=0.0, gzip;q=0.5', ['br', 'gzip']), 'gzip')
+        self.assertIsNone(negotiate_encoding('br;q=0, gzip;q=0', ['br', 'gzip']))
+        # A q-value that does not parse counts as refusal
+        self.assertIsNone(negotiate_encoding('br;q=high', ['br']))
+
+    def test_wildcard_covers_unlisted_encodings(self):
+        self.assertEqual(negotiate_encoding('*', ['zstd', 'gzip']), 'zstd')
+        self.assertEqual(negotiate_encoding('zstd;q=0, *', ['zstd', 'gzip']), 'gzip')
+        self.assertIsNone(negotiate_encoding('*;q=0', ['gzip']))
+
+    def test_codings_are_case_insensitive(self):
+        self.assertEqual(negotiate_encoding(' GZIP ', ['gzip']), 'gzip')
+
+
+class IdempotencyTests(MongoTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.factory = RequestFactory()
+        self.calls = 0
+        self.status = 201
+
+        @idempotent
+        def create(request):
+            self.calls += 1
+            return JsonResponse({'success': self.status < 500, 'id': self.calls}, status=self.status)
+        self.view = create
+
+    def post(self, data, key='key-1'):
+        headers = {'Idempotency-Key': key} if key else {}
+        return self.view(self.factory.post('/api/things/', json.dumps(data), content_type='application/json', headers=headers))
+
+    def test_retry_replays_the_first_response(self):
+        first = self.post({'name': 'a'})
+        retry = self.post({'name': 'a'})
+
+        self.assertEqual(self.calls, 1)
+        self.assertEqual(retry.status_code, 201)
+        self.assertEqual(retry.content, first.content)
+        self.assertEqual(retry['Content-Type'], 'application/json')
+        self.assertEqual(retry['Idempotent-Replayed'], 'true')
+        self.assertFalse(first.has_header('Idempotent-Replayed'))
+
+    def test_key_reused_for_another_request_is_rejected(self):
+        self.post({'name': 'a'})
+        self.assertEqual(self.post({'name': 'b'}).status_code, 422)
+        self.assertEqual(self.calls, 1)
+
+    def test_requests_without_a_key_always_run(self):
+        self.post({'name': 'a'}, key=None)
+        self.post({'name': 'a'}, key=None)
+        self.assertEqual(self.calls, 2)
+        self.assertEqual(self.post({'name': 'a'}, key='k' * 256).status_code, 400)
+
+    def test_server_error_releases_the_key(self):
+        self.status = 500
+        self.post({'name': 'a'})
+        self.status = 201
+        self.assertEqual(self.post({'name': 'a'}).status_code, 201)
+        self.assertEqual(self.calls, 2)
+
+    def test_retry_while_the_first_request_runs_gets_409(self):
+        # The first attempt has claimed the key and not finished yet
+        request = self.factory.post('/api/things/', json.dumps({'name': 'a'}), content_type='application/json')
+        IdempotencyRecord(id='/api/things/:key-1', fingerprint=request_fingerprint(request)).save()
+
+        response = self.post({'name': 'a'})
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response['Retry-After'], '1')
+        self.assertEqual(self.calls, 0)
+
+
+@override_settings(SINGLE_FLIGHT_CACHE_LOCK=False)
+class SingleFlightTests(SimpleTestCase):
+
+    def setUp(self):
+        self.flight = SingleFlight('test')
+        self.release = threading.Event()
+        self.runs = 0
+
+    def work(self):
+        self.runs += 1
+        self.release.wait(5)
+        return ['result', self.runs]
+
+    def run_concurrently(self, fn, callers=5):
+        results, errors = [], []
+
+        def call():
+            try:
+                results.append(self.flight.do('key', fn))
+            except Exception as e:
+                errors.append(e)
+        threads = [threading.Thread(target=call) for _ in range(callers)]
+        for thread in threads:
+            thread.start()
+        # Let every follower find the leader's call before it finishes
+        deadline = time.monotonic() + 5
+        while self.flight.counts['coalesced'] < callers - 1 and time.monotonic() < deadline:
+            time.sleep(0.005)
+        self.release.set()
+        for thread in threads:
+            thread.join(5)
+        return results, errors
+
+    def test_concurrent_callers_share_one_execution(self):
+        results, errors = self.run_concurrently(self.work)
+
+        self.assertEqual(errors, [])
+        self.assertEqual(self.runs, 1)
+        self.assertEqual(results, [['result', 1]] * 5)
+        self.assertEqual(self.flight.counts, {'leader': 1, 'coalesced': 4})
+        self.assertEqual(self.flight.in_flight(), 0)
+
+    def test_leader_exception_reaches_every_waiter(self):
+        def fail():
+            self.work()
+            raise ValueError('boom')
+        results, errors = self.run_concurrently(fail)
+
+        self.assertEqual(results, [])
+        self.assertEqual([str(e) for e in errors], ['boom'] * 5)
+        self.assertEqual(self.flight.in_flight(), 0)
+
+    def test_finished_calls_are_not_cached(self):
+        self.release.set()
+        self.flight.do('key', self.work)
+        self.assertEqual(self.flight.do('key', self.work), ['result', 2])
+
+    def test_flight_key_ignores_parameter_order(self):
+        self.assertEqual(flight_key(page=1, status='draft'), flight_key(status='draft', page=1))
+        self.assertNotEqual(flight_key(page=1), flight_key(page=2))
+
+
+@override_settings(SINGLE_FLIGHT_CACHE_LOCK=True, SINGLE_FLIGHT_SHARE_SECONDS=5, SINGLE_FLIGHT_WAIT_SECONDS=1)
+class SingleFlightCacheLockTests(SimpleTestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.flight = SingleFlight('shared')
+
+    def lock_key(self):
+        return f'singleflight:shared:{hashlib.sha1(b"key").hexdigest()}:lock'
+
+    def test_leader_publishes_its_result(self):
+        self.assertEqual(self.flight.do('key', lambda: 'fresh'), 'fresh')
+        # Another process polling for the result now finds it
+        other = SingleFlight('shared')
+        cache.add(self.lock_key(), 1)
+        self.assertEqual(other.do('key', lambda: 'recomputed'), 'fresh')
+        self.assertEqual(other.counts['shared'], 1)
+
+    def test_runs_the_work_when_the_other_process_gives_up(self):
+        cache.add(self.lock_key(), 1)
+        threading.Timer(0.1, cache.delete, [self.lock_key()]).start()
+        self.assertEqual(self.flight.do('key', lambda: 'own'), 'own')
+        self.assertEqual(self.flight.counts['fallback'], 1)
+
+
+@override_settings(MONGODB_BREAKER_FAILURES=3, MONGODB_BREAKER_RESET_SECONDS=10)
+class CircuitBreakerTests(SimpleTestCase):
+
+    def setUp(self):
+        self.now = 1000.0
+        patcher = mock.patch('prs.breaker.time.monotonic', lambda: self.now)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.breaker = CircuitBreaker('test')
+
+    def trip(self):
+        for _ in range(3):
+            self.breaker.record_failure()
+
+    def test_opens_after_consecutive_failures(self):
+        self.breaker.record_failure()
+        self.breaker.record_failure()
+        self.assertEqual(self.breaker.state, CLOSED)
+        self.assertTrue(self.breaker.allow())
+
+        self.breaker.record_failure()
+        self.assertEqual(self.breaker.state, OPEN)
+        self.assertFalse(self.breaker.allow())
+        self.assertEqual((self.breaker.trips, self.breaker.rejected), (1, 1))
+
+    def test_success_resets_the_failure_count(self):
+        self.breaker.record_failure()
+        self.breaker.record_failure()
+        self.breaker.record_success()
+        self.breaker.record_failure()
+        self.assertEqual(self.breaker.state, CLOSED)
+        self.assertEqual(self.breaker.failures, 1)
+
+    def test_one_trial_after_the_reset_time(self):
+        self.trip()
+        self.now += 4
+        self.assertEqual(self.breaker.retry_after(), 6)
+        self.assertFalse(self.breaker.allow())
+
+        self.now += 6
+        self.assertTrue(self.breaker.allow())
+        self.assertEqual(self.breaker.state, HALF_OPEN)
+        # Only the trial goes through
+        self.assertFalse(self.breaker.allow())
+
+    def test_trial_success_closes(self):
+        self.trip()
+        self.now += 10
+        self.breaker.allow()
+        self.breaker.record_success()
+        self.assertEqual(self.breaker.state, CLOSED)
+        self.assertEqual(self.breaker.retry_after(), 0)
+        self.assertTrue(self.breaker.allow())
+
+    def test_trial_failure_reopens(self):
+        self.trip()
+        self.now += 10
+        self.breaker.allow()
+        self.breaker.record_failure()
+        self.assertEqual(self.breaker.state, OPEN)
+        self.assertEqual(self.breaker.trips, 2)
+        self.assertFalse(self.breaker.allow())
+
+    def test_silent_trial_is_replaced_after_the_reset_time(self):
+        self.trip()
+        self.now += 10
+        self.assertTrue(self.breaker.allow())
+        self.now += 10
+        self.assertTrue(self.breaker.allow())
+        self.assertEqual(self.breaker.state, HALF_OPEN)
+
+
+@override_settings(MONGODB_BREAKER_FAILURES=3, MONGODB_BREAKER_RESET_SECONDS=10)
+class MongoGuardTests(SimpleTestCase):
+
+    def setUp(self):
+        mongo_breaker.record_success()
+        self.addCleanup(mongo_breaker.record_success)
+        self.factory = RequestFactory()
+        self.calls = 0
+
+        @mongo_guard
+        def view(request):
+            self.calls += 1
+            return JsonResponse({'success': True})
+        self.view = view
+
+    def test_open_breaker_answers_503_without_calling_the_view(self):
+        for _ in range(3):
+            mongo_breaker.record_failure()
+
+        response = self.view(self.factory.get('/api/deals/'))
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response['Retry-After'], '10')
+        self.assertEqual(self.calls, 0)
+
+    def test_closed_breaker_calls_the_view(self):
+        self.assertEqual(self.view(self.factory.get('/api/deals/')).status_code, 200)
+        self.assertEqual(self.calls, 1)
+
+
+@override_settings(BATCH_MAX_REQUESTS=3, BATCH_WORKERS=2)
+class BatchTests(MongoTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.deal = make_deal(title='Batched')
+
+    def batch(self, requests):
+        return self.client.post('/api/batch/', json.dumps({'requests': requests}), content_type='application/json')
+
+    def test_each_sub_request_keeps_its_own_status(self):
+        missing = str(ObjectId())
+        response = self.batch([
+            f'/api/deals/{self.deal.id}/',
+            {'id': 'gone', 'path': f'/api/deals/{missing}/'},
+            '/api/deals/?username=sales1&role=salesperson',
+        ])
+
+        self.assertEqual(response.status_code, 200)
+        found, gone, listed = response.json()['responses']
+        self.assertEqual((found['id'], found['status'], found['body']['deal']['title']), (0, 200, 'Batched'))
+        self.assertTrue(found['etag'])
+        self.assertEqual((gone['id'], gone['path'], gone['status']), ('gone', f'/api/deals/{missing}/', 404))
+        self.assertFalse(gone['body']['success'])
+        self.assertEqual([d['title'] for d in listed['body']['deals']], ['Batched'])
+
+    def test_if_none_match_is_forwarded(self):
+        etag = self.batch([f'/api/deals/{self.deal.id}/']).json()['responses'][0]['etag']
+        [result] = self.batch([{'path': f'/api/deals/{self.deal.id}/', 'headers': {'If-None-Match': etag}}]).json()['responses']
+        self.assertEqual(result['status'], 304)
+        self.assertNotIn('body', result)
+
+    def test_only_site_relative_api_gets_are_run(self):
+        path = f'/api/deals/{self.deal.id}/'
+        results = self.batch([
+            {'path': path, 'method': 'POST'},
+            f'https://example.com{path}',
+            '/api/batch/',
+        ]).json()['responses']
+        self.assertEqual([r['status'] for r in results], [405, 400, 400])
+
+        results = self.batch([f'//example.com{path}', '/dashboard/', '/api/nowhere/']).json()['responses']
+        self.assertEqual([r['status'] for r in results], [400, 400, 404])
+
+    def test_size_limit(self):
+        response = self.batch([f'/api/deals/{self.deal.id}/'] * 4)
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()['error'], 'At most 3 requests per batch')
+
+    def test_malformed_batches(self):
+        self.assertEqual(self.batch([]).status_code, 400)
+        self.assertEqual(self.batch([42]).status_code, 400)
+        self.assertEqual(self.client.post('/api/batch/', 'nope', content_type='application/json').status_code, 400)
+        self.assertEqual(self.client.get('/api/batch/').status_code, 405)
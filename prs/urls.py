@@ -19,19 +19,30 @@ from django.urls import path, include
 from django.views.decorators.csrf import csrf_exempt
 from deals.views import (
     create_deal, verify_deal, submit_for_verification, update_deal,
-    list_deals, delete_deal
+    list_deals, delete_deal, export_deals_csv, deal_history, verification_turnaround,
+    claim_deal, deal_lease_heartbeat, release_deal_lease, deal_detail
 )
-from projects.views import create_project, list_projects, update_project_status
+from projects.views import create_project, list_projects, update_project_status, bulk_update_project_status
 from django.http import JsonResponse
 from django.conf import settings
 from django.conf.urls.static import static
-from users.views import home_view, login_view, logout_view, register_view, dashboard_view
+from users.views import home_view, login_view, logout_view, register_view, dashboard_view, supervisor_workload
+from monitoring.views import metrics
+from sync.views import sync_changes
+from analytics.views import timeseries
+from prs.batch import batch
+from files.views import download_file, download_project_zip, list_project_files, init_upload, upload_status, upload_chunk, finalize_upload
 
 def api_home(request):
     """API root view providing endpoint documentation."""
     api_endpoints = {
         "message": "PRS API v0.3",
         "endpoints": {
+            "batch": {
+                "url": "/api/batch/",
+                "method": "POST",
+                "fields": ["requests"]
+            },
             "deals": {
                 "list": {
                     "url": "/api/deals/",
@@ -41,16 +52,108 @@ def api_home(request):
                 "create": {
                     "url": "/api/deals/create/",
                     "method": "POST",
+                    "headers": ["Idempotency-Key"],
                     "fields": ["title", "client_name", "contact_info", "budget", "requirements", "receipt"]
                 },
+                "detail": {
+                    "url": "/api/deals/<deal_id>/",
+                    "method": "GET",
+                    "headers": ["If-None-Match"]
+                },
+                "update": {
+                    "url": "/api/deals/<deal_id>/update/",
+                    "method": "POST",
+                    "headers": ["If-Match"],
+                    "fields": ["username", "title", "client_name", "contact_info", "budget", "requirements", "receipt"]
+                },
                 "verify": {
                     "url": "/api/deals/<deal_id>/verify/",
                     "method": "POST",
+                    "headers": ["Idempotency-Key"],
                     "fields": ["action", "verifier", "reason"]
                 },
                 "submit": {
                     "url": "/api/deals/<deal_id>/submit/",
                     "method": "POST"
+                },
+                "claim": {
+                    "url": "/api/deals/claim/",
+                    "method": "POST",
+                    "fields": ["verifier"]
+                },
+                "lease_heartbeat": {
+                    "url": "/api/deals/<deal_id>/lease/heartbeat/",
+                    "method": "POST",
+                    "fields": ["verifier"]
+                },
+                "lease_release": {
+                    "url": "/api/deals/<deal_id>/lease/release/",
+                    "method": "POST",
+                    "fields": ["verifier"]
+                },
+                "export": {
+                    "url": "/api/deals/export.csv",
+                    "method": "GET",
+                    "params": "?status=<status|all>&start=<YYYY-MM-DD>&end=<YYYY-MM-DD>"
+                },
+                "history": {
+                    "url": "/api/deals/<deal_id>/history/",
+                    "method": "GET"
+                },
+                "turnaround": {
+                    "url": "/api/deals/turnaround/",
+                    "method": "GET",
+                    "params": "?start=<YYYY-MM-DD>&end=<YYYY-MM-DD>&group_by=<verifier|salesperson|outcome>"
+                }
+            },
+            "supervisors": {
+                "workload": {
+                    "url": "/api/supervisors/workload/",
+                    "method": "GET",
+                    "params": "?supervisor=<username>"
+                }
+            },
+            "analytics": {
+                "timeseries": {
+                    "url": "/api/analytics/timeseries",
+                    "method": "GET",
+                    "params": "?start=<YYYY-MM-DD>&end=<YYYY-MM-DD>&salesperson=<username>&status=<status,...>&group_by=<salesperson|status>"
+                }
+            },
+            "sync": {
+                "changes": {
+                    "url": "/api/sync/",
+                    "method": "GET",
+                    "params": "?username=<username>&role=<role>&since=<next_token>"
+                }
+            },
+            "files": {
+                "download": {
+                    "url": "/api/files/<media path>",
+                    "method": "GET",
+                    "params": "?download=1",
+                    "headers": "Range"
+                }
+            },
+            "uploads": {
+                "init": {
+                    "url": "/api/uploads/",
+                    "method": "POST",
+                    "fields": ["filename", "size", "target", "target_id", "purpose"]
+                },
+                "status": {
+                    "url": "/api/uploads/<upload_id>/",
+                    "method": "GET"
+                },
+                "chunk": {
+                    "url": "/api/uploads/<upload_id>/chunk/",
+                    "method": "PUT",
+                    "params": "?offset=<bytes>"
+                },
+                "finalize": {
+                    "url": "/api/uploads/<upload_id>/finalize/",
+                    "method": "POST",
+                    "fields": ["sha256"]
                 }
             },
             "projects": {
@@ -62,7 +165,26 @@ def api_home(request):
                 "create": {
                     "url": "/api/projects/create/",
                     "method": "POST",
+                    "headers": ["Idempotency-Key"],
                     "fields": ["deal_id", "name", "supervisor"]
+                },
+                "update_status": {
+                    "url": "/api/projects/<project_id>/update-status/",
+                    "method": "POST",
+                    "fields": ["status", "supervisor"]
+                },
+                "update_status_bulk": {
+                    "url": "/api/projects/update-status/bulk/",
+                    "method": "POST",
+                    "fields": ["project_ids", "status", "supervisor"]
+                },
+                "files": {
+                    "url": "/api/projects/<project_id>/files/",
+                    "method": "GET"
+                },
+                "files_zip": {
+                    "url": "/api/projects/<project_id>/files.zip",
+                    "method": "GET"
                 }
             }
         }
@@ -80,17 +202,42 @@ urlpatterns = [
     # Admin and API routes
     path("admin/", admin.site.urls),
     path("api/", api_home, name="api_home"),
+    path("api/_metrics", metrics, name="metrics"),
+    path('api/batch/', csrf_exempt(batch), name='batch'),
     # Deal endpoints
     path('api/deals/create/', csrf_exempt(create_deal), name='create_deal'),
+    path('api/deals/claim/', csrf_exempt(claim_deal), name='claim_deal'),
+    path('api/deals/<str:deal_id>/lease/heartbeat/', csrf_exempt(deal_lease_heartbeat), name='deal_lease_heartbeat'),
+    path('api/deals/<str:deal_id>/lease/release/', csrf_exempt(release_deal_lease), name='release_deal_lease'),
     path('api/deals/<str:deal_id>/verify/', csrf_exempt(verify_deal), name='verify_deal'),
     path('api/deals/<str:deal_id>/submit/', csrf_exempt(submit_for_verification), name='submit_deal'),
     path('api/deals/<str:deal_id>/delete/', csrf_exempt(delete_deal), name='delete_deal'),
     path('api/deals/<str:deal_id>/update/', csrf_exempt(update_deal), name='update_deal'),
+    path('api/deals/<str:deal_id>/history/', deal_history, name='deal_history'),
+    path('api/deals/export.csv', export_deals_csv, name='export_deals_csv'),
+    path('api/deals/turnaround/', verification_turnaround, name='verification_turnaround'),
+    path('api/deals/<str:deal_id>/', deal_detail, name='deal_detail'),
     path('api/deals/', list_deals, name='list_deals'),
     # Project endpoints
     path('api/projects/create/', csrf_exempt(create_project), name='create_project'),
     path('api/projects/', list_projects, name='list_projects'),
+    path('api/projects/update-status/bulk/', csrf_exempt(bulk_update_project_status), name='bulk_update_project_status'),
     path('api/projects/<str:project_id>/update-status/', csrf_exempt(update_project_status), name='update_project_status'),
+    path('api/projects/<str:project_id>/files/', list_project_files, name='list_project_files'),
+    path('api/projects/<str:project_id>/files.zip', download_project_zip, name='download_project_zip'),
+    # Supervisors
+    path('api/supervisors/workload/', supervisor_workload, name='supervisor_workload'),
+    # Analytics
+    path('api/analytics/timeseries', timeseries, name='analytics_timeseries'),
+    # Incremental sync
+    path('api/sync/', sync_changes, name='sync_changes'),
+    # File downloads
+    path('api/files/<path:name>', download_file, name='download_file'),
+    # Resumable uploads; session-authenticated, so they keep CSRF protection (clients send X-CSRFToken)
+    path('api/uploads/', init_upload, name='init_upload'),
+    path('api/uploads/<str:upload_id>/', upload_status, name='upload_status'),
+    path('api/uploads/<str:upload_id>/chunk/', upload_chunk, name='upload_chunk'),
+    path('api/uploads/<str:upload_id>/finalize/', finalize_upload, name='finalize_upload'),
 ]
 
 # Serve media files in development
@@ -0,0 +1,1718 @@
+/**
+ * Salesperson dashboard behaviour, served as a static bundle.
+ *
+ * Per-request values (current user, page) come from the JSON embedded by
+ * salesperson_dashboard.html rather than from template variables.
+ */
+const dashboardConfig = JSON.parse(document.getElementById('dashboard-config').textContent);
+
+let currentDealId = null;
+let currentDealData = null;
+let dealProjects = [];
+
+// Idempotency-Key per pending action. A key is kept only while its request
+// failed without a response, so retrying after a network error cannot
+// create a second record
+const pendingIdempotencyKeys = new Map();
+
+/**
+ * Function to get the Idempotency-Key for an action, reused until a response arrives
+ * @param {string} action - Name of the action, e.g. 'create-deal'
+ * @returns {string} The key to send
+ */
+function idempotencyKey(action) {
+    if (!pendingIdempotencyKeys.has(action)) {
+        const key = window.crypto && crypto.randomUUID
+            ? crypto.randomUUID()
+            : `${Date.now()}-${Math.random().toString(36).slice(2)}`;
+        pendingIdempotencyKeys.set(action, key);
+    }
+    return pendingIdempotencyKeys.get(action);
+}
+
+// Deals rendered with the page, keyed by ID, so opening one needs no request
+const dealsById = new Map(
+    JSON.parse(document.getElementById('initial-deals').textContent).map(deal => [deal.id, deal])
+);
+
+/**
+ * Function to look up a deal, fetching the full list only if it is not on this page
+ * @param {string} dealId - The ID of the deal to look up
+ * @returns {Promise<Object|null>} The deal, or null if it does not exist
+ */
+function getDeal(dealId) {
+    if (dealsById.has(dealId)) {
+        return Promise.resolve(dealsById.get(dealId));
+    }
+    return fetch(`/api/deals/?username=${dashboardConfig.username}&role=${dashboardConfig.role}&status=all`)
+        .then(response => {
+            if (!response.ok) {
+                throw new Error(`Server responded with ${response.status}: ${response.statusText}`);
+            }
+            return response.json();
+        })
+        .then(data => {
+            if (!data.success) {
+                throw new Error(data.error || 'API returned failure status');
+            }
+            data.deals.forEach(deal => dealsById.set(deal.id, deal));
+            return dealsById.get(dealId) || null;
+        });
+}
+
+/**
+ * Function to run several GET API requests in one round trip through /api/batch/
+ * @param {Array<string>} paths - API paths, with their query strings
+ * @returns {Promise<Array<Object>>} One {status, body} per path, in order
+ */
+function batchGet(paths) {
+    return fetch('/api/batch/', {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify({ requests: paths })
+    })
+    .then(response => response.json())
+    .then(data => {
+        if (!data.success) {
+            throw new Error(data.error || 'Batch request failed');
+        }
+        return data.responses;
+    });
+}
+
+/**
+ * Function to fetch the latest version of one deal and update its row
+ * @param {string} dealId - The ID of the deal to refresh
+ * @returns {Promise<Object|null>} The deal, or null if it no longer exists
+ */
+function refreshDeal(dealId) {
+    return fetch(`/api/deals/${dealId}/`)
+        .then(response => response.json())
+        .then(data => {
+            if (!data.success) {
+                removeDealRow(dealId);
+                return null;
+            }
+            updateDealRow(data.deal);
+            return data.deal;
+        });
+}
+
+/**
+ * Function to redraw a deal's row in the deals table from the deal data
+ * @param {Object} deal - The deal object, as returned by the API
+ */
+function updateDealRow(deal) {
+    dealsById.set(deal.id, deal);
+    if (currentDealId === deal.id) {
+        currentDealData = deal;
+    }
+    const row = document.querySelector(`.deal-row[data-deal-id="${deal.id}"]`);
+    if (!row) {
+        return;
+    }
+
+    const badges = {
+        draft: '<span class="badge bg-secondary">Draft</span>',
+        pending_verification: '<span class="badge bg-warning text-dark">Pending</span>',
+        verified: '<span class="badge bg-success">Verified</span>',
+        rejected: '<span class="badge bg-danger">Rejected</span>'
+    };
+    let actions = `<button class="btn btn-sm btn-info" onclick="viewDealDetails('${deal.id}')">View</button>`;
+    if (deal.status === 'draft') {
+        actions += `
+            <button class="btn btn-sm btn-warning" onclick="editDeal('${deal.id}')">Edit</button>
+            <button class="btn btn-sm btn-success" onclick="submitForVerification('${deal.id}')">Submit</button>
+            <button class="btn btn-sm btn-danger" onclick="deleteDeal('${deal.id}')">Delete</button>`;
+    } else if (deal.status === 'rejected') {
+        actions += `
+            <button class="btn btn-sm btn-warning" onclick="editDeal('${deal.id}')">Edit</button>
+            <button class="btn btn-sm btn-danger" onclick="deleteDeal('${deal.id}')">Delete</button>`;
+    } else if (deal.status === 'verified') {
+        actions += `
+            <button class="btn btn-sm btn-primary" onclick="manageProjects('${deal.id}')">Projects</button>`;
+    }
+    const progress = deal.projects_total
+        ? `<small class="text-muted ms-1">${deal.projects_completed}/${deal.projects_total} projects done</small>`
+        : '';
+
+    row.dataset.status = deal.status;
+    row.cells[0].textContent = deal.title;
+    row.cells[1].textContent = deal.client_name;
+    row.cells[2].textContent = `$${deal.budget}`;
+    row.cells[3].innerHTML = (badges[deal.status] || `<span class="badge bg-info">${deal.status}</span>`) + progress;
+    row.cells[5].innerHTML = actions;
+}
+
+/**
+ * Function to remove a deal's row from the deals table
+ * @param {string} dealId - The ID of the deal
+ */
+function removeDealRow(dealId) {
+    dealsById.delete(dealId);
+    const row = document.querySelector(`.deal-row[data-deal-id="${dealId}"]`);
+    if (row) {
+        row.remove();
+    }
+}
+
+/**
+ * Function to handle project management for a deal
+ * @param {string} dealId - ID of the deal to manage projects for
+ */
+function manageProjects(dealId) {
+    currentDealId = dealId;
+
+    // Reset the project form
+    document.getElementById('projectForm').reset();
+    toggleNewProjectForm(false);
+
+    // Show loading indicator
+    document.getElementById('projectsList').innerHTML = `
+        <div class="text-center py-3">
+            <div class="spinner-border text-primary" role="status">
+                <span class="visually-hidden">Loading...</span>
+            </div>
+            <p class="mt-2">Loading projects...</p>
+        </div>
+    `;
+
+    // Load deal details
+    fetch(`/api/deals/${dealId}/`)
+        .then(response => response.json())
+        .then(data => {
+            if (data.success && data.deal) {
+                const deal = data.deal;
+
+                // Show deal header information
+                document.getElementById('projectManagementHeader').innerHTML = `
+                    <div class="card">
+                        <div class="card-header bg-primary text-white">
+                            <h5 class="mb-0">${deal.title}</h5>
+                        </div>
+                        <div class="card-body">
+                            <div class="row">
+                                <div class="col-md-6">
+                                    <p><strong>Client:</strong> ${deal.client_name}</p>
+                                    <p><strong>Status:</strong> <span class="badge bg-success">Verified</span></p>
+                                </div>
+                                <div class="col-md-6">
+                                    <p><strong>Created:</strong> ${new Date(deal.created_at).toLocaleDateString()}</p>
+                                </div>
+                            </div>
+                        </div>
+                    </div>
+                `;
+
+                // Check if adding a new project requires additional fee
+                const additionalFeeSection = document.getElementById('project_additional_fee').parentNode;
+                additionalFeeSection.classList.toggle('d-none', !deal.verified);
+
+                // Load projects for this deal
+                loadDealProjects(dealId);
+            } else {
+                document.getElementById('projectManagementHeader').innerHTML = `
+                    <div class="alert alert-danger">Error: Could not load deal details</div>
+                `;
+            }
+        })
+        .catch(error => {
+            console.error('Error fetching deal:', error);
+            document.getElementById('projectManagementHeader').innerHTML = `
+                <div class="alert alert-danger">Error: Could not load deal details</div>
+            `;
+        });
+
+    // Show the modal
+    const modal = new bootstrap.Modal(document.getElementById('projectManagementModal'));
+    modal.show();
+}
+
+/**
+ * Function to load projects for a deal
+ * @param {string} dealId - ID of the deal to load projects for
+ */
+function loadDealProjects(dealId) {
+    // Fetch projects for this deal
+    fetch(`/api/projects/?deal_id=${dealId}`)
+        .then(response => response.json())
+        .then(data => {
+            if (data.success) {
+                dealProjects = data.projects || [];
+                renderProjects();
+            } else {
+                document.getElementById('projectsList').innerHTML = `
+                    <div class="alert alert-danger">Error: ${data.error}</div>
+                `;
+            }
+        })
+        .catch(error => {
+            console.error('Error fetching projects:', error);
+            document.getElementById('projectsList').innerHTML = `
+                <div class="alert alert-danger">Error: Could not load projects</div>
+            `;
+        });
+}
+
+/**
+ * Function to render the list of projects
+ */
+function renderProjects() {
+    const projectsList = document.getElementById('projectsList');
+
+    // No projects
+    if (dealProjects.length === 0) {
+        projectsList.innerHTML = `
+            <div class="alert alert-info text-center">
+                <p>No projects found for this deal.</p>
+            </div>
+        `;
+        return;
+    }
+
+    // Create project cards
+    let projectsHtml = '';
+    dealProjects.forEach(project => {
+        // Format dates
+        const deadlineDate = project.deadline ? new Date(project.deadline) : null;
+        const formattedDeadline = deadlineDate ? deadlineDate.toLocaleDateString('en-US', {
+            year: 'numeric', month: 'long', day: 'numeric'
+        }) : 'No deadline set';
+
+        // Status badge
+        let statusBadge = '';
+        switch (project.status) {
+            case 'pending':
+                statusBadge = '<span class="badge bg-secondary">Pending</span>';
+                break;
+            case 'in_progress':
+                statusBadge = '<span class="badge bg-info">In Progress</span>';
+                break;
+            case 'completed':
+                statusBadge = '<span class="badge bg-success">Completed</span>';
+                break;
+            default:
+                statusBadge = '<span class="badge bg-secondary">Unknown</span>';
+        }
+
+        projectsHtml += `
+            <div class="card mb-3">
+                <div class="card-header d-flex justify-content-between align-items-center">
+                    <h6 class="mb-0">${project.name}</h6>
+                    ${statusBadge}
+                </div>
+                <div class="card-body">
+                    <div class="row">
+                        <div class="col-md-8">
+                            <p class="mb-2">${project.description || 'No description provided'}</p>
+                            <p class="mb-2"><strong>Deadline:</strong> ${formattedDeadline}</p>
+                            <p class="mb-2"><strong>Supervisor:</strong> ${project.supervisor || 'Not assigned'}</p>
+                            ${project.additional_fee ? `<p class="mb-2"><strong>Additional Fee:</strong> $${project.additional_fee.toFixed(2)}</p>` : ''}
+                        </div>
+                        <div class="col-md-4 text-end">
+                            ${project.files ? `
+                            <button class="btn btn-sm btn-outline-primary mb-2" onclick="viewProjectFiles('${project.id}')">
+                                <i class="bi bi-file-earmark"></i> View Files
+                            </button>
+                            ` : ''}
+                            ${project.receipt_file ? `
+                            <button class="btn btn-sm btn-outline-info" onclick="viewReceipt('${project.receipt_file}')">
+                                <i class="bi bi-receipt"></i> View Receipt
+                            </button>
+                            ` : ''}
+                        </div>
+                    </div>
+                </div>
+            </div>
+        `;
+    });
+
+    projectsList.innerHTML = projectsHtml;
+}
+
+/**
+ * Function to show the add new project form
+ */
+function addNewProject() {
+    // Reset form
+    document.getElementById('projectForm').reset();
+
+    // Set today as the minimum date for the deadline
+    const today = new Date().toISOString().split('T')[0];
+    document.getElementById('project_deadline').min = today;
+
+    // Show additional fee fields only if the deal is verified
+    const isVerified = currentDealData && currentDealData.status === 'verified';
+    document.getElementById('receipt_file_section').classList.toggle('d-none', !isVerified);
+
+    // Setup event listener for additional fee
+    const additionalFeeInput = document.getElementById('project_additional_fee');
+    additionalFeeInput.addEventListener('input', handleAdditionalFeeChange);
+
+    // Show the form
+    toggleNewProjectForm(true);
+}
+
+/**
+ * Function to toggle visibility of the new project form
+ * @param {boolean} show - Whether to show or hide the form
+ */
+function toggleNewProjectForm(show) {
+    document.getElementById('newProjectForm').classList.toggle('d-none', !show);
+}
+
+/**
+ * Function to handle changes to the additional fee input
+ */
+function handleAdditionalFeeChange() {
+    const additionalFee = parseFloat(document.getElementById('project_additional_fee').value) || 0;
+    const receiptSection = document.getElementById('receipt_file_section');
+
+    // Show receipt upload section if additional fee is greater than 0
+    if (additionalFee > 0) {
+        receiptSection.classList.remove('d-none');
+        document.getElementById('project_receipt_file').setAttribute('required', 'required');
+    } else {
+        receiptSection.classList.add('d-none');
+        document.getElementById('project_receipt_file').removeAttribute('required');
+    }
+}
+
+/**
+ * Function to save a new project
+ */
+function saveNewProject() {
+    // Validate form
+    const projectName = document.getElementById('project_name').value.trim();
+    const projectSupervisor = document.getElementById('project_supervisor').value;
+    const projectDescription = document.getElementById('project_description').value.trim();
+    const projectDeadline = document.getElementById('project_deadline').value;
+    const projectFiles = document.getElementById('project_files').files;
+    const additionalFee = parseFloat(document.getElementById('project_additional_fee').value) || 0;
+    const receiptFile = document.getElementById('project_receipt_file').files[0];
+
+    // Basic validation
+    if (!projectName) {
+        alert('Please enter a project name');
+        return;
+    }
+
+    if (!projectSupervisor) {
+        alert('Please select a supervisor');
+        return;
+    }
+
+    // Validate receipt if additional fee is provided
+    if (additionalFee > 0 && !receiptFile) {
+        alert('Please upload a receipt for the additional fee');
+        return;
+    }
+
+    // Create form data
+    const formData = new FormData();
+    formData.append('name', projectName);
+    formData.append('deal_id', currentDealId);
+    formData.append('supervisor', projectSupervisor);
+    formData.append('description', projectDescription);
+
+    if (projectDeadline) {
+        formData.append('deadline', projectDeadline);
+    }
+
+    if (additionalFee > 0) {
+        formData.append('additional_fee', additionalFee);
+    }
+
+    // Add all files
+    if (projectFiles && projectFiles.length > 0) {
+        for (let i = 0; i < projectFiles.length; i++) {
+            formData.append('files', projectFiles[i]);
+        }
+    }
+
+    // Add receipt file if present
+    if (receiptFile) {
+        formData.append('receipt_file', receiptFile);
+    }
+
+    // Show loading state
+    const saveButton = document.querySelector('#projectForm button[type="button"]');
+    saveButton.innerHTML = '<span class="spinner-border spinner-border-sm" role="status" aria-hidden="true"></span> Saving...';
+    saveButton.disabled = true;
+
+    // Send API request
+    fetch('/api/projects/create/', {
+        method: 'POST',
+        headers: { 'Idempotency-Key': idempotencyKey('create-project') },
+        body: formData
+    })
+    .then(response => response.json())
+    .then(data => {
+        pendingIdempotencyKeys.delete('create-project');
+        if (data.success) {
+            alert('Project created successfully!');
+
+            // Reset form and hide it
+            document.getElementById('projectForm').reset();
+            toggleNewProjectForm(false);
+
+            // Reload projects
+            loadDealProjects(currentDealId);
+        } else {
+            alert('Error: ' + (data.error || 'Could not create project'));
+        }
+    })
+    .catch(error => {
+        console.error('Error creating project:', error);
+        alert('An error occurred while creating the project.');
+    })
+    .finally(() => {
+        // Reset button state
+        saveButton.innerHTML = 'Save Project';
+        saveButton.disabled = false;
+    });
+}
+
+/**
+ * Function to view project files
+ * @param {string} projectId - ID of the project
+ */
+function viewProjectFiles(projectId) {
+    // Find project
+    const project = dealProjects.find(p => p.id === projectId);
+    if (!project || !project.files) {
+        alert('No files found for this project.');
+        return;
+    }
+
+    // In a production environment, this would make an API call to list files
+    // For demonstration, we'll show a message about accessing files
+    alert('In a production environment, this would show the list of files in the project directory: ' + project.files);
+}
+
+/**
+ * Function to view receipt
+ * @param {string} receiptPath - Path to the receipt file
+ */
+function viewReceipt(receiptPath) {
+    if (!receiptPath) {
+        alert('Receipt file not found.');
+        return;
+    }
+
+    // Set document preview content
+    const previewContainer = document.getElementById('documentPreviewContent');
+    const downloadBtn = document.getElementById('downloadDocumentBtn');
+
+    // Check file type
+    const fileExtension = receiptPath.split('.').pop().toLowerCase();
+    const isImage = ['jpg', 'jpeg', 'png', 'gif'].includes(fileExtension);
+    const isPdf = fileExtension === 'pdf';
+
+    if (isImage) {
+        previewContainer.innerHTML = `<img src="${receiptPath}" class="img-fluid" alt="Receipt">`;
+    } else if (isPdf) {
+        previewContainer.innerHTML = `
+            <div class="ratio ratio-16x9">
+                <iframe src="${receiptPath}" allowfullscreen></iframe>
+            </div>
+        `;
+    } else {
+        previewContainer.innerHTML = `
+            <div class="alert alert-info">
+                <p>This file type cannot be previewed in the browser.</p>
+            </div>
+        `;
+    }
+
+    // Set download link
+    downloadBtn.href = receiptPath;
+
+    // Show the preview modal
+    const modal = new bootstrap.Modal(document.getElementById('documentPreviewModal'));
+    modal.show();
+}
+
+/**
+ * Function to toggle the projects section visibility based on multi-project selection
+ */
+function toggleProjectsSection() {
+    const isMultiProject = document.getElementById('is_multiproject').value === 'true';
+    const projectsSection = document.getElementById('projectsSection');
+
+    projectsSection.classList.toggle('d-none', !isMultiProject);
+
+    // Reset projects data if switching to single project
+    if (!isMultiProject) {
+        resetProjectsData();
+    }
+}
+
+/**
+ * Function to show the add project form
+ */
+function showAddProjectForm() {
+    // Set today as the minimum date for the deadline
+    const today = new Date().toISOString().split('T')[0];
+    document.getElementById('new_project_deadline').min = today;
+
+    // Show the form
+    toggleAddProjectForm(true);
+}
+
+/**
+ * Function to toggle the add project form visibility
+ * @param {boolean} show - Whether to show or hide the form
+ */
+function toggleAddProjectForm(show) {
+    document.getElementById('addProjectForm').classList.toggle('d-none', !show);
+
+    if (show) {
+        // Reset form fields
+        document.getElementById('new_project_name').value = '';
+        document.getElementById('new_project_supervisor').selectedIndex = 0;
+        document.getElementById('new_project_description').value = '';
+        document.getElementById('new_project_deadline').value = '';
+    }
+}
+
+/**
+ * Function to add a project to the list of projects for this deal
+ */
+function addProjectToList() {
+    // Validate form
+    const projectName = document.getElementById('new_project_name').value.trim();
+    const projectSupervisor = document.getElementById('new_project_supervisor').value;
+    const projectDescription = document.getElementById('new_project_description').value.trim();
+    const projectDeadline = document.getElementById('new_project_deadline').value;
+
+    // Basic validation
+    if (!projectName) {
+        alert('Please enter a project name');
+        return;
+    }
+
+    if (!projectSupervisor) {
+        alert('Please select a supervisor');
+        return;
+    }
+
+    // Create a new project object
+    const newProject = {
+        name: projectName,
+        supervisor: projectSupervisor,
+        description: projectDescription,
+        deadline: projectDeadline,
+        id: 'temp_' + Date.now() // Temporary ID for frontend reference
+    };
+
+    // Get current projects array from hidden field
+    let projectsData = [];
+    try {
+        projectsData = JSON.parse(document.getElementById('projects_data').value);
+    } catch (e) {
+        projectsData = [];
+    }
+
+    // Add new project
+    projectsData.push(newProject);
+
+    // Update hidden field
+    document.getElementById('projects_data').value = JSON.stringify(projectsData);
+
+    // Update projects list UI
+    renderProjectsList(projectsData);
+
+    // Hide the form
+    toggleAddProjectForm(false);
+}
+
+/**
+ * Function to render the list of projects in the create deal form
+ * @param {Array} projectsData - Array of project objects
+ */
+function renderProjectsList(projectsData) {
+    const projectsList = document.getElementById('projectsList');
+
+    if (!projectsData || projectsData.length === 0) {
+        projectsList.innerHTML = `
+            <div class="alert alert-info">
+                <p class="mb-0">Add your first project using the button below.</p>
+            </div>
+        `;
+        return;
+    }
+
+    let projectsHtml = '';
+    projectsData.forEach((project, index) => {
+        // Format deadline if available
+        const deadline = project.deadline ? new Date(project.deadline).toLocaleDateString() : 'Not set';
+
+        projectsHtml += `
+            <div class="card mb-2 project-item" data-project-id="${project.id}">
+                <div class="card-header d-flex justify-content-between align-items-center py-2">
+                    <h6 class="mb-0">${project.name}</h6>
+                    <button type="button" class="btn btn-sm btn-outline-danger" onclick="removeProject('${project.id}')">
+                        <i class="bi bi-trash"></i>
+                    </button>
+                </div>
+                <div class="card-body py-2">
+                    <div class="row">
+                        <div class="col-md-6">
+                            <p class="mb-1"><small><strong>Supervisor:</strong> ${project.supervisor}</small></p>
+                            <p class="mb-1"><small><strong>Deadline:</strong> ${deadline}</small></p>
+                        </div>
+                        <div class="col-md-6">
+                            <p class="mb-0"><small>${project.description || 'No description'}</small></p>
+                        </div>
+                    </div>
+                </div>
+            </div>
+        `;
+    });
+
+    projectsList.innerHTML = projectsHtml;
+}
+
+/**
+ * Function to remove a project from the list
+ * @param {string} projectId - ID of the project to remove
+ */
+function removeProject(projectId) {
+    if (!confirm('Are you sure you want to remove this project?')) {
+        return;
+    }
+
+    // Get current projects array
+    let projectsData = [];
+    try {
+        projectsData = JSON.parse(document.getElementById('projects_data').value);
+    } catch (e) {
+        return;
+    }
+
+    // Remove the project
+    projectsData = projectsData.filter(project => project.id !== projectId);
+
+    // Update hidden field
+    document.getElementById('projects_data').value = JSON.stringify(projectsData);
+
+    // Update UI
+    renderProjectsList(projectsData);
+}
+
+/**
+ * Function to reset projects data
+ */
+function resetProjectsData() {
+    document.getElementById('projects_data').value = '[]';
+    renderProjectsList([]);
+}
+
+/**
+ * Function to show the create deal modal
+ */
+function showCreateDealModal() {
+    const createDealModal = new bootstrap.Modal(document.getElementById('createDealModal'));
+    createDealModal.show();
+}
+
+/**
+ * Function to handle deal creation with project data
+ */
+function createDeal() {
+    const form = document.getElementById('createDealForm');
+    const formData = new FormData(form);
+
+    // Form validation
+    if (!form.checkValidity()) {
+        form.reportValidity();
+        return;
+    }
+
+    // Check if it's a multi-project deal
+    const isMultiProject = document.getElementById('is_multiproject').value === 'true';
+
+    if (isMultiProject) {
+        // Get projects data from hidden field
+        let projectsData = [];
+        try {
+            projectsData = JSON.parse(document.getElementById('projects_data').value);
+        } catch (e) {
+            projectsData = [];
+        }
+
+        // Verify projects are added for multi-project deals
+        if (projectsData.length === 0) {
+            alert('Please add at least one project for a multi-project deal.');
+            return;
+        }
+
+        // Verify each project has a supervisor
+        for (const project of projectsData) {
+            if (!project.supervisor) {
+                alert('All projects must have a supervisor assigned.');
+                return;
+            }
+        }
+
+        // Log projects data being submitted
+        console.log('Submitting projects with deal:', projectsData);
+    }
+
+    // Show loading indicator
+    const submitBtn = document.querySelector('.modal-footer .btn-primary');
+    const originalBtnText = submitBtn.innerHTML;
+    submitBtn.innerHTML = '<span class="spinner-border spinner-border-sm" role="status" aria-hidden="true"></span> Creating...';
+    submitBtn.disabled = true;
+
+    // Submit form data
+    fetch('/api/deals/create/', {
+        method: 'POST',
+        headers: { 'Idempotency-Key': idempotencyKey('create-deal') },
+        body: formData
+    })
+    .then(response => response.json())
+    .then(data => {
+        pendingIdempotencyKeys.delete('create-deal');
+        if (data.success) {
+            alert('Deal created successfully!' + (data.projects && data.projects.length > 0 ? ' ' + data.projects.length + ' projects were also created.' : ''));
+            window.location.reload();
+        } else {
+            alert('Error: ' + data.error);
+            submitBtn.innerHTML = originalBtnText;
+            submitBtn.disabled = false;
+        }
+    })
+    .catch(error => {
+        console.error('Error:', error);
+        alert('An error occurred while creating the deal.');
+        submitBtn.innerHTML = originalBtnText;
+        submitBtn.disabled = false;
+    });
+}
+
+/**
+ * Function to view deal details
+ * @param {string} dealId - The ID of the deal to view
+ */
+function viewDealDetails(dealId) {
+    console.log('Viewing deal with ID:', dealId);
+    currentDealId = dealId;
+
+    // Show loading indicator in a modal first
+    const loadingContent = `
+        <div class="d-flex justify-content-center">
+            <div class="spinner-border text-primary" role="status">
+                <span class="visually-hidden">Loading...</span>
+            </div>
+        </div>
+        <p class="text-center mt-3">Loading deal details...</p>
+    `;
+
+    document.getElementById('dealDetailsContent').innerHTML = loadingContent;
+    const dealDetailsModal = new bootstrap.Modal(document.getElementById('dealDetailsModal'));
+    dealDetailsModal.show();
+
+    // Use the deal from the page data when we have it
+    getDeal(dealId)
+    .then(deal => {
+        if (deal) {
+            console.log('Found matching deal:', deal);
+            currentDealData = deal; // Store current deal data
+            renderDealDetails(deal);
+
+            // Show appropriate action buttons based on deal status
+            const submitBtn = document.getElementById('submitDealBtn');
+            const editBtn = document.getElementById('editDealBtn');
+            const deleteBtn = document.getElementById('deleteDealBtn');
+
+            submitBtn.style.display = deal.status === 'draft' ? 'inline-block' : 'none';
+            editBtn.style.display = (deal.status === 'draft' || deal.status === 'rejected') ? 'inline-block' : 'none';
+            deleteBtn.style.display = (deal.status === 'draft' || deal.status === 'rejected') ? 'inline-block' : 'none';
+        } else {
+            console.error('Deal not found in response data');
+            document.getElementById('dealDetailsContent').innerHTML = `
+                <div class="alert alert-warning">
+                    <h5>Deal Not Found</h5>
+                    <p>Could not find the deal with ID: ${dealId}</p>
+                    <p>This could be because the deal has been processed or removed.</p>
+                    <button class="btn btn-primary mt-2" onclick="window.location.reload()">Refresh Page</button>
+                </div>
+            `;
+        }
+    })
+    .catch(error => {
+        console.error('Error fetching deal details:', error);
+        document.getElementById('dealDetailsContent').innerHTML = `
+            <div class="alert alert-danger">
+                <h5>Error Loading Deal</h5>
+                <p>${error.message}</p>
+                <button class="btn btn-primary mt-2" onclick="window.location.reload()">Refresh Page</button>
+            </div>
+        `;
+    });
+}
+
+/**
+ * Function to render deal details in the modal
+ * @param {Object} deal - The deal object to render
+ */
+function renderDealDetails(deal) {
+    console.log('Rendering deal details for:', deal);
+
+    const content = document.getElementById('dealDetailsContent');
+    const submitBtn = document.getElementById('submitDealBtn');
+    const editBtn = document.getElementById('editDealBtn');
+    const deleteBtn = document.getElementById('deleteDealBtn');
+
+    // Format the created date and time
+    const createdDate = deal.created_at ? new Date(deal.created_at) : new Date();
+    const dateFormatted = createdDate.toLocaleDateString();
+    const timeFormatted = createdDate.toLocaleTimeString();
+
+    // Show appropriate action buttons based on deal status
+    submitBtn.style.display = deal.status === 'draft' ? 'inline-block' : 'none';
+    editBtn.style.display = (deal.status === 'draft' || deal.status === 'rejected') ? 'inline-block' : 'none';
+    deleteBtn.style.display = (deal.status === 'draft' || deal.status === 'rejected') ? 'inline-block' : 'none';
+
+    // Format date for display
+    const formattedDate = createdDate.toLocaleDateString('en-US', {
+        year: 'numeric',
+        month: 'long',
+        day: 'numeric'
+    });
+    const formattedTime = createdDate.toLocaleTimeString('en-US', {
+        hour: '2-digit',
+        minute: '2-digit'
+    });
+
+    // Prepare receipt HTML
+    let receiptHtml = '';
+    if (deal.receipt_file) {
+        const fileName = deal.receipt_file.split('/').pop();
+        const fileExt = fileName.split('.').pop().toLowerCase();
+        const isImage = ['jpg', 'jpeg', 'png', 'gif'].includes(fileExt);
+        const isPdf = fileExt === 'pdf';
+
+        receiptHtml = `
+            <div class="card mb-4">
+                <div class="card-header bg-light">
+                    <h6 class="m-0">Receipt Document</h6>
+                </div>
+                <div class="card-body">
+                    <div class="d-flex align-items-center mb-3">
+                        <div class="me-3">
+                            <i class="bi ${isImage ? 'bi-file-image' : isPdf ? 'bi-file-pdf' : 'bi-file-earmark'} fs-1 text-primary"></i>
+                        </div>
+                        <div>
+                            <p class="mb-1"><strong>Filename:</strong> ${fileName}</p>
+                            <p class="mb-0"><strong>Type:</strong> ${fileExt.toUpperCase()} ${isImage ? '(Image)' : isPdf ? '(PDF)' : 'File'}</p>
+                        </div>
+                    </div>
+                    <div class="d-flex gap-2">
+                        <button class="btn btn-primary" onclick="previewDocument('/api/files/${deal.receipt_file}')">
+                            <i class="bi bi-eye"></i> Preview Receipt
+                        </button>
+                        <a href="/api/files/${deal.receipt_file}" class="btn btn-outline-primary" download>
+                            <i class="bi bi-download"></i> Download Receipt
+                        </a>
+                    </div>
+                </div>
+            </div>
+        `;
+    } else {
+        receiptHtml = `
+            <div class="card mb-4">
+                <div class="card-header bg-light">
+                    <h6 class="m-0">Receipt Document</h6>
+                </div>
+                <div class="card-body">
+                    <div class="alert alert-warning mb-0">
+                        <i class="bi bi-exclamation-triangle me-2"></i>
+                        <span>No receipt file attached to this deal.</span>
+                    </div>
+                </div>
+            </div>
+        `;
+    }
+
+    // Prepare verification HTML
+    let verificationHtml = '';
+    if (deal.status === 'verified' || deal.status === 'rejected') {
+        verificationHtml = `
+            <div class="card mb-4">
+                <div class="card-header bg-light">
+                    <h6 class="m-0">Verification Details</h6>
+                </div>
+                <div class="card-body">
+                    <p><strong>Verified by:</strong> ${deal.verified_by || 'N/A'}</p>
+                    <p><strong>Verification Date:</strong> ${deal.verified_at ? new Date(deal.verified_at).toLocaleString() : 'N/A'}</p>
+                    ${deal.rejection_reason ? `
+                    <div class="alert alert-danger mt-3">
+                        <p class="mb-1"><strong>Rejection Reason:</strong></p>
+                        <p class="mb-0">${deal.rejection_reason}</p>
+                    </div>` : ''}
+                </div>
+            </div>
+        `;
+    }
+
+    // Render the content with all details
+    content.innerHTML = `
+        <div class="card mb-4">
+            <div class="card-header bg-primary text-white">
+                <h5 class="m-0">${deal.title}</h5>
+            </div>
+            <div class="card-body">
+                <div class="mb-3">
+                    <span class="badge bg-${deal.status === 'draft' ? 'secondary' : deal.status === 'pending_verification' ? 'warning text-dark' : deal.status === 'verified' ? 'success' : 'danger'} p-2">
+                        ${deal.status === 'draft' ? 'Draft' : deal.status === 'pending_verification' ? 'Pending Verification' : deal.status === 'verified' ? 'Verified' : 'Rejected'}
+                    </span>
+                </div>
+            </div>
+        </div>
+
+        <div class="card mb-4">
+            <div class="card-header bg-light">
+                <h6 class="m-0">Deal Information</h6>
+            </div>
+            <div class="card-body">
+                <div class="row mb-3">
+                    <div class="col-md-6">
+                        <h6>Client Details</h6>
+                        <p><strong>Client Name:</strong> ${deal.client_name || 'Not specified'}</p>
+                        <p><strong>Contact Info:</strong> ${deal.contact_info || 'Not specified'}</p>
+                    </div>
+                    <div class="col-md-6">
+                        <h6>Financial Details</h6>
+                        <p><strong>Budget:</strong> <span class="text-success fw-bold">$${typeof deal.budget === 'number' ? deal.budget.toLocaleString() : deal.budget}</span></p>
+                        <p><strong>Advance Payment:</strong> $${deal.advance_payment ? (typeof deal.advance_payment === 'number' ? deal.advance_payment.toLocaleString() : deal.advance_payment) : '0'}</p>
+                    </div>
+                </div>
+
+                <div class="row">
+                    <div class="col-md-6">
+                        <h6>Creation Details</h6>
+                        <p><strong>Created By:</strong> ${deal.created_by || 'Unknown'}</p>
+                        <p><strong>Created:</strong> ${formattedDate} at ${formattedTime}</p>
+                    </div>
+                    <div class="col-md-6">
+                        <h6>Deal Status</h6>
+                        <p><strong>Current Status:</strong> ${deal.status === 'draft' ? 'Draft' : deal.status === 'pending_verification' ? 'Pending Verification' : deal.status === 'verified' ? 'Verified' : 'Rejected'}</p>
+                        <p><strong>Deal ID:</strong> <code>${deal.id}</code></p>
+                    </div>
+                </div>
+            </div>
+        </div>
+
+        <div class="card mb-4">
+            <div class="card-header bg-light">
+                <h6 class="m-0">Requirements</h6>
+            </div>
+            <div class="card-body">
+                <div class="p-3 bg-light rounded">
+                    ${deal.requirements ? `<p>${deal.requirements}</p>` : '<p class="text-muted">No specific requirements provided for this deal.</p>'}
+                </div>
+            </div>
+        </div>
+
+        ${receiptHtml}
+        ${verificationHtml}
+    `;
+}
+
+/**
+ * Function to submit a deal for verification
+ */
+function submitForVerification(dealId) {
+    if (!confirm('Are you sure you want to submit this deal for verification?')) {
+        return;
+    }
+
+    fetch(`/api/deals/${dealId}/submit/`, {
+        method: 'POST',
+        headers: {
+            'Content-Type': 'application/json'
+        }
+    })
+    .then(response => response.json())
+    .then(data => {
+        if (data.success) {
+            alert('Deal submitted for verification successfully!');
+            const dealDetailsModal = bootstrap.Modal.getInstance(document.getElementById('dealDetailsModal'));
+            if (dealDetailsModal) {
+                dealDetailsModal.hide();
+            }
+            return refreshDeal(dealId);
+        } else {
+            alert('Error: ' + data.error);
+        }
+    })
+    .catch(error => {
+        console.error('Error:', error);
+        alert('An error occurred while submitting the deal.');
+    });
+}
+
+/**
+ * Function to submit deal from the modal
+ */
+function submitDealFromModal() {
+    if (currentDealId) {
+        submitForVerification(currentDealId);
+    }
+}
+
+/**
+ * Function to filter deals by status
+ */
+function filterDeals(status) {
+    const rows = document.querySelectorAll('.deal-row');
+    rows.forEach(row => {
+        const rowStatus = row.getAttribute('data-status');
+        if (status === 'all' || rowStatus === status) {
+            row.style.display = '';
+        } else {
+            row.style.display = 'none';
+        }
+    });
+}
+
+/**
+ * Function to fill the edit form from a deal
+ * @param {Object} deal - The deal object to edit
+ */
+function fillEditForm(deal) {
+    currentDealData = deal;
+
+    document.getElementById('edit_deal_id').value = deal.id;
+    document.getElementById('edit_title').value = deal.title;
+    document.getElementById('edit_client_name').value = deal.client_name;
+    document.getElementById('edit_budget').value = deal.budget;
+    document.getElementById('edit_advance_payment').value = deal.advance_payment || 0;
+    document.getElementById('edit_contact_info').value = deal.contact_info || '';
+    document.getElementById('edit_requirements').value = deal.requirements || '';
+    document.getElementById('edit_description').value = deal.description || '';
+
+    // Set multi-project selection
+    const multiProjectSelect = document.getElementById('edit_is_multiproject');
+    multiProjectSelect.value = deal.is_multiproject ? 'true' : 'false';
+
+    // Show current receipt if exists
+    if (deal.receipt_file) {
+        document.getElementById('current_receipt_container').classList.remove('d-none');
+        document.getElementById('current_receipt_name').textContent = deal.receipt_file.split('/').pop();
+    } else {
+        document.getElementById('current_receipt_container').classList.add('d-none');
+    }
+}
+
+/**
+ * Function to handle editing a rejected deal
+ * @param {string} dealId - The ID of the deal to edit
+ */
+function editDeal(dealId) {
+    currentDealId = dealId;
+
+    // Get the deal data
+    getDeal(dealId)
+    .then(deal => {
+        if (deal) {
+            fillEditForm(deal);
+
+            // Show the edit modal
+            const editDealModal = new bootstrap.Modal(document.getElementById('editDealModal'));
+            editDealModal.show();
+        } else {
+            alert('Deal not found.');
+        }
+    })
+    .catch(error => {
+        console.error('Error:', error);
+        alert('An error occurred while fetching deal details.');
+    });
+}
+
+/**
+ * Function to update a deal after editing
+ */
+function updateDeal() {
+    const form = document.getElementById('editDealForm');
+    if (!form.checkValidity()) {
+        form.reportValidity();
+        return;
+    }
+
+    const formData = new FormData(form);
+    formData.append('status', 'draft'); // Reset status to draft
+
+    // Send the version the form was filled from, so a save from another tab is not overwritten
+    fetch(`/api/deals/${currentDealId}/update/`, {
+        method: 'POST',
+        headers: { 'If-Match': `"${currentDealData.version || 0}"` },
+        body: formData
+    })
+    .then(response => response.json().then(data => ({ status: response.status, data })))
+    .then(({ status, data }) => {
+        if (data.success) {
+            alert('Deal updated successfully!');
+            updateDealRow(data.deal);
+            bootstrap.Modal.getInstance(document.getElementById('editDealModal')).hide();
+        } else if ((status === 412 || status === 409) && data.deal) {
+            // Someone else saved first: show their version and let the user redo the edit
+            updateDealRow(data.deal);
+            fillEditForm(data.deal);
+            alert(data.error);
+        } else {
+            alert('Error: ' + data.error);
+        }
+    })
+    .catch(error => {
+        console.error('Error:', error);
+        alert('An error occurred while updating the deal.');
+    });
+}
+
+/**
+ * Function to open edit modal from deal details
+ */
+function editDealFromModal() {
+    if (currentDealId && currentDealData) {
+        const dealDetailsModal = bootstrap.Modal.getInstance(document.getElementById('dealDetailsModal'));
+        dealDetailsModal.hide();
+        editDeal(currentDealId);
+    }
+}
+
+/**
+ * Function to confirm deal deletion
+ */
+function deleteDealConfirm() {
+    if (confirm('Are you sure you want to delete this deal? This action cannot be undone.')) {
+        deleteDeal(currentDealId);
+    }
+}
+
+/**
+ * Function to delete a deal
+ * @param {string} dealId - The ID of the deal to delete
+ */
+function deleteDeal(dealId) {
+    fetch(`/api/deals/${dealId}/delete/`, {
+        method: 'POST',
+        headers: {
+            'Content-Type': 'application/json'
+        },
+        body: JSON.stringify({
+            username: dashboardConfig.username
+        })
+    })
+    .then(response => response.json())
+    .then(data => {
+        if (data.success) {
+            alert('Deal deleted successfully!');
+            const dealDetailsModal = bootstrap.Modal.getInstance(document.getElementById('dealDetailsModal'));
+            if (dealDetailsModal) {
+                dealDetailsModal.hide();
+            }
+            removeDealRow(dealId);
+        } else {
+            alert('Error: ' + data.error);
+        }
+    })
+    .catch(error => {
+        console.error('Error:', error);
+        alert('An error occurred while deleting the deal.');
+    });
+}
+
+/**
+ * Function to open project management modal
+ * @param {string} dealId - The ID of the deal to manage projects for
+ */
+function manageProjects(dealId) {
+    currentDealId = dealId;
+
+    // Get the latest deal data and its projects in one request
+    batchGet([`/api/deals/${dealId}/`, `/api/projects/?deal_id=${dealId}`])
+    .then(([dealResult, projectsResult]) => {
+        const deal = dealResult.body.success ? dealResult.body.deal : null;
+        if (deal) {
+            updateDealRow(deal);
+
+            // Display deal info in header
+            document.getElementById('projectManagementHeader').innerHTML = `
+                <div class="card">
+                    <div class="card-body">
+                        <h5>${deal.title}</h5>
+                        <p><strong>Client:</strong> ${deal.client_name}</p>
+                        <p><strong>Budget:</strong> $${deal.budget}</p>
+                    </div>
+                </div>
+            `;
+
+            if (projectsResult.body.success) {
+                dealProjects = projectsResult.body.projects || [];
+                renderProjects();
+            } else {
+                document.getElementById('projectsList').innerHTML = `
+                    <div class="alert alert-warning">
+                        <p>Error loading projects: ${projectsResult.body.error}</p>
+                    </div>
+                `;
+            }
+
+            // Show the projects modal
+            const projectsModal = new bootstrap.Modal(document.getElementById('projectManagementModal'));
+            projectsModal.show();
+        } else {
+            alert('Deal not found.');
+        }
+    })
+    .catch(error => {
+        console.error('Error:', error);
+        alert('An error occurred while fetching deal details.');
+    });
+}
+
+/**
+ * Function to fetch projects for a deal
+ * @param {string} dealId - The ID of the deal to fetch projects for
+ */
+function fetchDealProjects(dealId) {
+    fetch(`/api/projects/?deal_id=${dealId}`)
+    .then(response => response.json())
+    .then(data => {
+        if (data.success) {
+            dealProjects = data.projects || [];
+            renderProjects();
+        } else {
+            alert('Error: ' + data.error);
+        }
+    })
+    .catch(error => {
+        console.error('Error:', error);
+        document.getElementById('projectsList').innerHTML = `
+            <div class="alert alert-warning">
+                <p>Error loading projects. Please try again.</p>
+            </div>
+        `;
+    });
+}
+
+/**
+ * Function to render the projects list
+ */
+function renderProjects() {
+    const projectsList = document.getElementById('projectsList');
+
+    if (dealProjects.length === 0) {
+        projectsList.innerHTML = `
+            <div class="alert alert-info">
+                <p>No projects found for this deal. Use the 'Add Project' button to create your first project.</p>
+            </div>
+        `;
+        return;
+    }
+
+    // Calculate total budget from all projects
+    const totalProjectBudget = dealProjects.reduce((sum, project) => sum + (parseFloat(project.budget) || 0), 0);
+
+    let projectsHtml = `
+        <div class="mb-3">
+            <p><strong>Total Project Budget:</strong> $${totalProjectBudget.toFixed(2)}</p>
+        </div>
+    `;
+
+    dealProjects.forEach((project, index) => {
+        projectsHtml += `
+            <div class="card mb-3 ${project.is_completed ? 'border-success' : ''}">
+                <div class="card-header ${project.is_completed ? 'bg-success text-white' : 'd-flex justify-content-between align-items-center'}">
+                    <div class="d-flex justify-content-between w-100">
+                        <h6 class="mb-0">${project.name}</h6>
+                        <div>
+                            <button class="btn btn-sm ${project.is_completed ? 'btn-light' : 'btn-success'}" 
+                                    onclick="toggleProjectCompletion(${index}, ${!project.is_completed})">
+                                ${project.is_completed ? '<i class="bi bi-x-circle"></i> Mark Incomplete' : '<i class="bi bi-check-circle"></i> Mark Complete'}
+                            </button>
+                            <button class="btn btn-sm btn-danger" onclick="removeProject(${index})">
+                                <i class="bi bi-trash"></i>
+                            </button>
+                        </div>
+                    </div>
+                </div>
+                <div class="card-body">
+                    <div class="row">
+                        <div class="col-md-6">
+                            <p><strong>Budget:</strong> $${project.budget}</p>
+                            <p><strong>Status:</strong> ${project.is_completed ? '<span class="badge bg-success">Completed</span>' : '<span class="badge bg-warning text-dark">In Progress</span>'}</p>
+                        </div>
+                        <div class="col-md-6">
+                            ${project.receipt_file ? `
+                            <p><strong>Receipt:</strong> 
+                                <a href="/api/files/${project.receipt_file}" target="_blank" class="btn btn-sm btn-outline-primary">View Receipt</a>
+                            </p>` : ''}                                
+                            ${project.created_at ? `<p><strong>Created:</strong> ${new Date(project.created_at).toLocaleDateString()}</p>` : ''}
+                        </div>
+                    </div>
+                    ${project.description ? `
+                    <div class="mt-2">
+                        <p><strong>Description:</strong></p>
+                        <p>${project.description}</p>
+                    </div>` : ''}
+                    ${!project.receipt_file ? `
+                    <div class="mt-3">
+                        <button class="btn btn-sm btn-outline-primary" onclick="showAddReceiptForm(${index})">
+                            <i class="bi bi-upload"></i> Add Receipt
+                        </button>
+                    </div>` : ''}
+                </div>
+            </div>
+        `;
+    });
+
+    projectsList.innerHTML = projectsHtml;
+}
+
+/**
+ * Function to show/hide the new project form
+ * @param {boolean} show - Whether to show or hide the form
+ */
+function toggleNewProjectForm(show = true) {
+    const formContainer = document.getElementById('newProjectForm');
+    if (show) {
+        formContainer.classList.remove('d-none');
+        document.getElementById('project_name').focus();
+    } else {
+        formContainer.classList.add('d-none');
+        document.getElementById('projectForm').reset();
+    }
+}
+
+/**
+ * Function to add a new project (show form)
+ */
+function addNewProject() {
+    toggleNewProjectForm(true);
+}
+
+/**
+ * Function to save a new project
+ */
+function saveNewProject() {
+    const form = document.getElementById('projectForm');
+    if (!form.checkValidity()) {
+        form.reportValidity();
+        return;
+    }
+
+    const projectData = {
+        name: document.getElementById('project_name').value,
+        budget: document.getElementById('project_budget').value,
+        description: document.getElementById('project_description').value,
+        is_completed: false
+    };
+
+    const receiptFile = document.getElementById('project_receipt').files[0];
+    const formData = new FormData();
+    formData.append('project_data', JSON.stringify(projectData));
+    if (receiptFile) {
+        formData.append('receipt', receiptFile);
+    }
+
+    fetch(`/api/deals/${currentDealId}/projects/add/`, {
+        method: 'POST',
+        body: formData
+    })
+    .then(response => response.json())
+    .then(data => {
+        if (data.success) {
+            alert('Project added successfully!');
+            toggleNewProjectForm(false);
+            fetchDealProjects(currentDealId); // Refresh the projects list
+        } else {
+            alert('Error: ' + data.error);
+        }
+    })
+    .catch(error => {
+        console.error('Error:', error);
+        alert('An error occurred while adding the project.');
+    });
+}
+
+/**
+ * Function to remove a project
+ * @param {number} index - The index of the project to remove
+ */
+function removeProject(index) {
+    if (!confirm('Are you sure you want to remove this project?')) {
+        return;
+    }
+
+    const projectId = dealProjects[index].id;
+
+    fetch(`/api/deals/${currentDealId}/projects/${projectId}/delete/`, {
+        method: 'POST',
+        headers: {
+            'Content-Type': 'application/json'
+        }
+    })
+    .then(response => response.json())
+    .then(data => {
+        if (data.success) {
+            alert('Project removed successfully!');
+            fetchDealProjects(currentDealId); // Refresh the projects list
+        } else {
+            alert('Error: ' + data.error);
+        }
+    })
+    .catch(error => {
+        console.error('Error:', error);
+        alert('An error occurred while removing the project.');
+    });
+}
+
+/**
+ * Function to toggle project completion status
+ * @param {number} index - The index of the project to update
+ * @param {boolean} isCompleted - The new completion status
+ */
+function toggleProjectCompletion(index, isCompleted) {
+    const projectId = dealProjects[index].id;
+
+    fetch(`/api/deals/${currentDealId}/projects/${projectId}/update/`, {
+        method: 'POST',
+        headers: {
+            'Content-Type': 'application/json'
+        },
+        body: JSON.stringify({
+            is_completed: isCompleted
+        })
+    })
+    .then(response => response.json())
+    .then(data => {
+        if (data.success) {
+            dealProjects[index].is_completed = isCompleted;
+            renderProjects(); // Update the UI
+        } else {
+            alert('Error: ' + data.error);
+        }
+    })
+    .catch(error => {
+        console.error('Error:', error);
+        alert('An error occurred while updating the project.');
+    });
+}
+
+/**
+ * Function to show form for adding a receipt to an existing project
+ * @param {number} index - The index of the project to add receipt to
+ */
+function showAddReceiptForm(index) {
+    const project = dealProjects[index];
+
+    // Create a temporary file input
+    const fileInput = document.createElement('input');
+    fileInput.type = 'file';
+    fileInput.accept = 'image/*,application/pdf';
+    fileInput.onchange = function() {
+        if (fileInput.files.length > 0) {
+            uploadProjectReceipt(index, fileInput.files[0]);
+        }
+    };
+    fileInput.click();
+}
+
+/**
+ * Function to read Django's CSRF token from its cookie
+ * @returns {string} The token, or an empty string when the cookie is not set
+ */
+function csrfToken() {
+    const match = document.cookie.match(/(?:^|;\s*)csrftoken=([^;]+)/);
+    return match ? decodeURIComponent(match[1]) : '';
+}
+
+/**
+ * Function to send a file through the resumable upload API, one chunk per request
+ * @param {File} file - The file to upload
+ * @param {string} target - 'deal' or 'project'
+ * @param {string} targetId - The ID of the deal or project
+ * @param {string} purpose - 'receipt' or 'file'
+ * @returns {Promise<Object>} The finished upload, with the stored path
+ */
+function resumableUpload(file, target, targetId, purpose) {
+    // The upload endpoints use the session, so Django checks the CSRF token
+    const headers = { 'X-CSRFToken': csrfToken() };
+    const send = (url, options) => fetch(url, options)
+        .then(response => response.json())
+        .then(data => {
+            if (!data.success) {
+                throw new Error(data.error || 'Upload failed');
+            }
+            return data;
+        });
+
+    return send('/api/uploads/', {
+        method: 'POST',
+        headers: { ...headers, 'Content-Type': 'application/json' },
+        body: JSON.stringify({ filename: file.name, size: file.size, target: target, target_id: targetId, purpose: purpose })
+    })
+    .then(upload => {
+        const sendFrom = offset => {
+            if (offset >= file.size) {
+                return send(`/api/uploads/${upload.upload_id}/finalize/`, { method: 'POST', headers: headers });
+            }
+            return send(`/api/uploads/${upload.upload_id}/chunk/?offset=${offset}`, {
+                method: 'PUT',
+                headers: headers,
+                body: file.slice(offset, offset + upload.max_chunk_size)
+            })
+            .then(state => sendFrom(state.offset));
+        };
+        return sendFrom(upload.offset);
+    });
+}
+
+/**
+ * Function to upload a receipt for an existing project
+ * @param {number} index - The index of the project
+ * @param {File} file - The receipt file to upload
+ */
+function uploadProjectReceipt(index, file) {
+    const projectId = dealProjects[index].id;
+
+    resumableUpload(file, 'project', projectId, 'receipt')
+    .then(() => {
+        alert('Receipt uploaded successfully!');
+        fetchDealProjects(currentDealId); // Refresh the projects list
+    })
+    .catch(error => {
+        console.error('Error:', error);
+        alert('Error: ' + error.message);
+    });
+}
+
+/**
+ * Function to preview a document in a modal
+ * @param {string} documentUrl - URL of the document to preview
+ */
+function previewDocument(documentUrl) {
+    console.log('Previewing document:', documentUrl);
+
+    // Try to create and show the modal
+    let previewModal;
+    try {
+        previewModal = new bootstrap.Modal(document.getElementById('documentPreviewModal'));
+    } catch (error) {
+        console.error('Error creating document preview modal:', error);
+        alert('Could not open document preview. Please check if Bootstrap is properly loaded.');
+        return;
+    }
+
+    const previewContent = document.getElementById('documentPreviewContent');
+    const downloadBtn = document.getElementById('downloadDocumentBtn');
+
+    // Show loading indicator
+    previewContent.innerHTML = `
+        <div class="d-flex justify-content-center">
+            <div class="spinner-border" role="status">
+                <span class="visually-hidden">Loading...</span>
+            </div>
+        </div>
+        <p class="text-center mt-2">Loading document preview...</p>
+    `;
+
+    // Set download link
+    downloadBtn.href = documentUrl;
+
+    // Get file name from URL for a better user experience
+    const fileName = documentUrl.split('/').pop();
+    downloadBtn.setAttribute('download', fileName);
+
+    // Determine the document type from the URL
+    const fileExtension = documentUrl.split('.').pop().toLowerCase();
+
+    // Show the modal before attempting to load content
+    previewModal.show();
+
+    // Use a timeout to ensure the modal is visible before loading content
+    setTimeout(() => {
+        try {
+            if (['jpg', 'jpeg', 'png', 'gif'].includes(fileExtension)) {
+                // Image preview with error handling
+                const img = new Image();
+                img.onload = function() {
+                    previewContent.innerHTML = `
+                        <img src="${documentUrl}" class="img-fluid" alt="Document Image">
+                    `;
+                };
+                img.onerror = function() {
+                    previewContent.innerHTML = `
+                        <div class="alert alert-danger">
+                            <p>Failed to load image. The file may be missing or corrupted.</p>
+                        </div>
+                    `;
+                };
+                img.src = documentUrl;
+
+            } else if (fileExtension === 'pdf') {
+                // PDF preview
+                previewContent.innerHTML = `
+                    <div class="ratio ratio-16x9" style="height: 600px;">
+                        <iframe src="${documentUrl}" allowfullscreen></iframe>
+                    </div>
+                `;
+            } else {
+                // Other file types that can't be previewed directly
+                previewContent.innerHTML = `
+                    <div class="alert alert-info">
+                        <p>This file type (${fileExtension}) can't be previewed directly in the browser.</p>
+                        <p>Please use the download button to view the file.</p>
+                        <p class="mb-0"><strong>File:</strong> ${fileName}</p>
+                    </div>
+                `;
+            }
+        } catch (error) {
+            console.error('Error rendering document preview:', error);
+            previewContent.innerHTML = `
+                <div class="alert alert-danger">
+                    <p>Error displaying document preview: ${error.message}</p>
+                    <p>Please try downloading the file instead.</p>
+                </div>
+            `;
+        }
+    }, 100);
+}
+
+/**
+ * Function to fill the supervisor pickers from the workload API, least loaded first
+ */
+function loadSupervisorOptions() {
+    fetch('/api/supervisors/workload/')
+        .then(response => response.json())
+        .then(data => {
+            if (!data.success) {
+                return;
+            }
+            ['project_supervisor', 'new_project_supervisor'].forEach(selectId => {
+                const select = document.getElementById(selectId);
+                if (!select) {
+                    return;
+                }
+                const selected = select.value;
+                select.innerHTML = '<option value="">Select a supervisor</option>';
+                data.supervisors.forEach(workload => {
+                    const option = document.createElement('option');
+                    option.value = workload.supervisor;
+                    const due = workload.next_deadline ? `, next due ${new Date(workload.next_deadline).toLocaleDateString()}` : '';
+                    option.textContent = `${workload.supervisor} (${workload.open} open${due})`;
+                    select.appendChild(option);
+                });
+                select.value = selected;
+            });
+        })
+        .catch(error => console.error('Error fetching supervisor workload:', error));
+}
+
+document.addEventListener('DOMContentLoaded', loadSupervisorOptions);
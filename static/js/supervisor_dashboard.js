@@ -0,0 +1,445 @@
+/**
+ * Supervisor dashboard behaviour, served as a static bundle.
+ *
+ * Per-request values (current user, page) come from the JSON embedded by
+ * supervisor_dashboard.html rather than from template variables.
+ */
+const dashboardConfig = JSON.parse(document.getElementById('dashboard-config').textContent);
+
+// Global variables
+let currentProjectId = null;
+let allProjects = [];
+let currentFilter = 'all';
+
+/**
+ * Function to show a list of projects, or the empty message if there are none
+ * @param {Array} projects - Array of project objects
+ */
+function showProjects(projects) {
+    document.getElementById('loadingProjects').style.display = 'none';
+    allProjects = projects;
+
+    if (allProjects.length === 0) {
+        document.getElementById('noProjectsMessage').style.display = 'block';
+    } else {
+        renderProjects(allProjects);
+    }
+}
+
+/**
+ * Function to reload the current page of projects assigned to the supervisor
+ */
+function loadSupervisorProjects() {
+    // Show loading indicator
+    document.getElementById('loadingProjects').style.display = 'block';
+    document.getElementById('noProjectsMessage').style.display = 'none';
+    document.getElementById('projectsList').innerHTML = '';
+
+    // Fetch projects from API
+    fetch(`/api/projects/?supervisor=${dashboardConfig.username}&page=${dashboardConfig.page}&page_size=${dashboardConfig.page_size}`)
+        .then(response => response.json())
+        .then(data => {
+            console.log('Supervisor projects:', data);
+            document.getElementById('loadingProjects').style.display = 'none';
+
+            if (data.success) {
+                showProjects(data.projects || []);
+            } else {
+                // Show error message
+                document.getElementById('projectsList').innerHTML = `
+                    <div class="alert alert-danger">
+                        <p>Error loading projects: ${data.error}</p>
+                    </div>
+                `;
+            }
+        })
+        .catch(error => {
+            console.error('Error fetching projects:', error);
+            document.getElementById('loadingProjects').style.display = 'none';
+            document.getElementById('projectsList').innerHTML = `
+                <div class="alert alert-danger">
+                    <p>Error: Could not fetch projects. Please try again later.</p>
+                </div>
+            `;
+        });
+}
+
+/**
+ * Function to render projects list with filtering
+ * @param {Array} projects - Array of project objects
+ */
+function renderProjects(projects) {
+    const projectsList = document.getElementById('projectsList');
+    projectsList.innerHTML = '';
+    // Re-rendering clears the selection
+    document.getElementById('bulkStatusButtons').style.display = 'none';
+
+    // Filter projects if needed
+    let filteredProjects = projects;
+    if (currentFilter !== 'all') {
+        filteredProjects = projects.filter(p => p.status === currentFilter);
+    }
+
+    if (filteredProjects.length === 0) {
+        projectsList.innerHTML = `
+            <div class="alert alert-info text-center">
+                <p>No projects matching the current filter.</p>
+            </div>
+        `;
+        return;
+    }
+
+    // Create project cards
+    filteredProjects.forEach(project => {
+        const deadlineDate = project.deadline ? new Date(project.deadline) : null;
+        const formattedDeadline = deadlineDate ? deadlineDate.toLocaleDateString('en-US', {
+            year: 'numeric', month: 'long', day: 'numeric'
+        }) : 'No deadline set';
+
+        // Determine status badge class
+        let statusBadgeClass = '';
+        let statusIcon = '';
+        switch (project.status) {
+            case 'pending':
+                statusBadgeClass = 'bg-secondary';
+                statusIcon = 'hourglass-split';
+                break;
+            case 'in_progress':
+                statusBadgeClass = 'bg-info';
+                statusIcon = 'arrow-right-circle-fill';
+                break;
+            case 'completed':
+                statusBadgeClass = 'bg-success';
+                statusIcon = 'check-circle-fill';
+                break;
+            default:
+                statusBadgeClass = 'bg-secondary';
+                statusIcon = 'question-circle';
+        }
+
+        // Check if deadline is past
+        let deadlineClass = '';
+        let deadlineWarning = '';
+        if (deadlineDate && deadlineDate < new Date() && project.status !== 'completed') {
+            deadlineClass = 'text-danger';
+            deadlineWarning = '<span class="badge bg-danger ms-2">Overdue</span>';
+        }
+
+        // Create card HTML
+        const projectCard = document.createElement('div');
+        projectCard.className = 'card mb-3 project-card';
+        projectCard.dataset.projectId = project.id;
+        projectCard.dataset.status = project.status;
+
+        projectCard.innerHTML = `
+            <div class="card-header d-flex justify-content-between align-items-center">
+                <div class="form-check mb-0">
+                    <input class="form-check-input project-select" type="checkbox" value="${project.id}" id="select-${project.id}" onchange="updateBulkButtons()">
+                    <label class="form-check-label h6 mb-0" for="select-${project.id}">${project.name}</label>
+                </div>
+                <span class="badge ${statusBadgeClass}">
+                    <i class="bi bi-${statusIcon} me-1"></i>
+                    ${project.status.replace('_', ' ').toUpperCase()}
+                </span>
+            </div>
+            <div class="card-body">
+                <div class="row">
+                    <div class="col-md-8">
+                        <p class="mb-2">${project.description || 'No description provided'}</p>
+                        <p class="mb-2 ${deadlineClass}">
+                            <strong>Deadline:</strong> ${formattedDeadline} ${deadlineWarning}
+                        </p>
+                    </div>
+                    <div class="col-md-4 text-end">
+                        <button class="btn btn-primary btn-sm" onclick="viewProjectDetails('${project.id}')">
+                            <i class="bi bi-eye me-1"></i> View Details
+                        </button>
+                    </div>
+                </div>
+            </div>
+            <div class="card-footer text-muted">
+                <small>Created: ${new Date(project.created_at).toLocaleDateString()}</small>
+                <small class="float-end">Last updated: ${new Date(project.updated_at).toLocaleDateString()}</small>
+            </div>
+        `;
+
+        projectsList.appendChild(projectCard);
+    });
+}
+
+/**
+ * Show the bulk status buttons while any project is selected
+ */
+function updateBulkButtons() {
+    const anySelected = document.querySelectorAll('.project-select:checked').length > 0;
+    document.getElementById('bulkStatusButtons').style.display = anySelected ? 'inline-flex' : 'none';
+}
+
+/**
+ * Change the status of every selected project in one request
+ * @param {string} newStatus - New status for the projects
+ */
+function bulkUpdateProjectStatus(newStatus) {
+    const projectIds = Array.from(document.querySelectorAll('.project-select:checked')).map(box => box.value);
+    if (projectIds.length === 0) {
+        return;
+    }
+
+    const statusDisplay = newStatus.replace('_', ' ').toUpperCase();
+    if (!confirm(`Change the status of ${projectIds.length} project(s) to ${statusDisplay}?`)) {
+        return;
+    }
+
+    fetch('/api/projects/update-status/bulk/', {
+        method: 'POST',
+        headers: {
+            'Content-Type': 'application/json'
+        },
+        body: JSON.stringify({
+            project_ids: projectIds,
+            status: newStatus,
+            supervisor: dashboardConfig.username
+        })
+    })
+    .then(response => response.json())
+    .then(data => {
+        if (!data.success) {
+            alert('Error: ' + data.error);
+            return;
+        }
+        const failed = data.results.filter(result => !result.success);
+        if (failed.length > 0) {
+            alert(`${data.message}. Not updated:\n` + failed.map(result => `${result.project_id}: ${result.error}`).join('\n'));
+        }
+        document.getElementById('bulkStatusButtons').style.display = 'none';
+        loadSupervisorProjects();
+    })
+    .catch(error => {
+        console.error('Error updating project statuses:', error);
+        alert('An error occurred while updating the project statuses.');
+    });
+}
+
+/**
+ * Function to filter projects by status
+ * @param {string} status - Status to filter by
+ */
+function filterProjects(status) {
+    currentFilter = status;
+    renderProjects(allProjects);
+
+    // Update active button
+    document.querySelectorAll('.card-header .btn-group .btn').forEach(btn => {
+        btn.classList.remove('active');
+    });
+
+    const filterBtn = document.querySelector(`.btn[onclick="filterProjects('${status}')"]`);
+    if (filterBtn) {
+        filterBtn.classList.add('active');
+    }
+}
+
+/**
+ * Function to view project details
+ * @param {string} projectId - ID of the project to view
+ */
+function viewProjectDetails(projectId) {
+    currentProjectId = projectId;
+
+    // Find project in loaded data
+    const project = allProjects.find(p => p.id === projectId);
+    if (!project) {
+        alert('Project not found.');
+        return;
+    }
+
+    // Format dates
+    const createdDate = new Date(project.created_at);
+    const updatedDate = new Date(project.updated_at);
+    const deadline = project.deadline ? new Date(project.deadline) : null;
+
+    // Determine status badge
+    let statusBadgeClass = '';
+    switch (project.status) {
+        case 'pending':
+            statusBadgeClass = 'bg-secondary';
+            break;
+        case 'in_progress':
+            statusBadgeClass = 'bg-info';
+            break;
+        case 'completed':
+            statusBadgeClass = 'bg-success';
+            break;
+        default:
+            statusBadgeClass = 'bg-secondary';
+    }
+
+    // Prepare status update buttons
+    const statusButtons = document.getElementById('statusUpdateButtons');
+    if (project.status === 'pending') {
+        statusButtons.innerHTML = `
+            <button type="button" class="btn btn-info" onclick="updateProjectStatus('in_progress')">Mark In Progress</button>
+            <button type="button" class="btn btn-success" onclick="updateProjectStatus('completed')">Mark Completed</button>
+        `;
+    } else if (project.status === 'in_progress') {
+        statusButtons.innerHTML = `
+            <button type="button" class="btn btn-success" onclick="updateProjectStatus('completed')">Mark Completed</button>
+        `;
+    } else if (project.status === 'completed') {
+        statusButtons.innerHTML = `
+            <button type="button" class="btn btn-info" onclick="updateProjectStatus('in_progress')">Reopen Project</button>
+        `;
+    }
+
+    // Create files section if project has files
+    let filesSection = '<p>No files attached to this project.</p>';
+
+    if (project.files) {
+        filesSection = `
+            <div class="card mb-3">
+                <div class="card-header">
+                    <h6 class="mb-0">Project Files</h6>
+                </div>
+                <div class="card-body">
+                    <button class="btn btn-outline-primary" onclick="viewProjectFiles()">
+                        <i class="bi bi-folder me-1"></i> View Project Files
+                    </button>
+                </div>
+            </div>
+        `;
+    }
+
+    // Populate modal content
+    document.getElementById('projectDetailsContent').innerHTML = `
+        <div class="card mb-3">
+            <div class="card-header bg-primary text-white">
+                <h5 class="mb-0">${project.name}</h5>
+            </div>
+            <div class="card-body">
+                <div class="mb-3">
+                    <span class="badge ${statusBadgeClass} p-2">
+                        ${project.status.replace('_', ' ').toUpperCase()}
+                    </span>
+                </div>
+
+                <p class="mb-3">${project.description || 'No description provided'}</p>
+
+                <div class="row mb-3">
+                    <div class="col-md-6">
+                        <p class="mb-1"><strong>Created:</strong> ${createdDate.toLocaleString()}</p>
+                        <p class="mb-1"><strong>Last Updated:</strong> ${updatedDate.toLocaleString()}</p>
+                    </div>
+                    <div class="col-md-6">
+                        <p class="mb-1"><strong>Deadline:</strong> ${deadline ? deadline.toLocaleDateString() : 'No deadline set'}</p>
+                    </div>
+                </div>
+            </div>
+        </div>
+
+        ${filesSection}
+    `;
+
+    // Show the modal
+    const modal = new bootstrap.Modal(document.getElementById('projectDetailsModal'));
+    modal.show();
+}
+
+/**
+ * Function to list the current project's files, with a zip download of all of them
+ */
+function viewProjectFiles() {
+    const content = document.getElementById('filePreviewContent');
+    content.innerHTML = '<div class="text-center py-3"><div class="spinner-border text-primary" role="status"></div></div>';
+    document.getElementById('downloadFileBtn').href = `/api/projects/${currentProjectId}/files.zip`;
+    document.getElementById('downloadFileBtn').textContent = 'Download All (zip)';
+    new bootstrap.Modal(document.getElementById('filePreviewModal')).show();
+
+    fetch(`/api/projects/${currentProjectId}/files/`)
+        .then(response => response.json())
+        .then(data => {
+            if (!data.success) {
+                content.innerHTML = `<div class="alert alert-danger">Error: ${data.error}</div>`;
+                return;
+            }
+            if (data.files.length === 0) {
+                content.innerHTML = '<p>No files attached to this project.</p>';
+                return;
+            }
+            const rows = data.files.map(file => `
+                <tr>
+                    <td><a href="${file.url}" target="_blank">${file.name}</a></td>
+                    <td>${file.content_type || ''}</td>
+                    <td class="text-end">${(file.size / 1024).toFixed(1)} KB</td>
+                    <td><a href="${file.url}?download=1" class="btn btn-sm btn-outline-primary"><i class="bi bi-download"></i></a></td>
+                </tr>
+            `).join('');
+            content.innerHTML = `
+                <table class="table table-sm">
+                    <thead><tr><th>Name</th><th>Type</th><th class="text-end">Size</th><th></th></tr></thead>
+                    <tbody>${rows}</tbody>
+                </table>
+            `;
+        })
+        .catch(error => {
+            console.error('Error fetching project files:', error);
+            content.innerHTML = '<div class="alert alert-danger">Could not load project files.</div>';
+        });
+}
+
+/**
+ * Function to update project status
+ * @param {string} newStatus - New status for the project
+ */
+function updateProjectStatus(newStatus) {
+    if (!currentProjectId) {
+        alert('No project selected.');
+        return;
+    }
+
+    // Confirm status change
+    const statusDisplay = newStatus.replace('_', ' ').toUpperCase();
+    if (!confirm(`Are you sure you want to change this project's status to ${statusDisplay}?`)) {
+        return;
+    }
+
+    // Prepare request data
+    const requestData = {
+        status: newStatus,
+        supervisor: dashboardConfig.username
+    };
+
+    // Send update request
+    fetch(`/api/projects/${currentProjectId}/update-status/`, {
+        method: 'POST',
+        headers: {
+            'Content-Type': 'application/json'
+        },
+        body: JSON.stringify(requestData)
+    })
+    .then(response => response.json())
+    .then(data => {
+        if (data.success) {
+            alert('Project status updated successfully!');
+
+            // Close the modal
+            bootstrap.Modal.getInstance(document.getElementById('projectDetailsModal')).hide();
+
+            // Reload projects
+            loadSupervisorProjects();
+        } else {
+            alert('Error: ' + data.error);
+        }
+    })
+    .catch(error => {
+        console.error('Error updating project status:', error);
+        alert('An error occurred while updating the project status.');
+    });
+}
+
+// Render the projects embedded in the page; no request needed for first paint
+document.addEventListener('DOMContentLoaded', function() {
+    showProjects(JSON.parse(document.getElementById('initial-projects').textContent));
+
+    // Set initial active filter
+    document.querySelector('.btn[onclick="filterProjects(\'all\')"]').classList.add('active');
+});
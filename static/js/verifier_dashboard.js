@@ -0,0 +1,457 @@
+/**
+ * Verifier dashboard behaviour, served as a static bundle.
+ *
+ * Per-request values (current user, page) come from the JSON embedded by
+ * verifier_dashboard.html rather than from template variables.
+ */
+const dashboardConfig = JSON.parse(document.getElementById('dashboard-config').textContent);
+
+let currentDealId = null;
+let currentDealData = null;
+
+// Idempotency-Key per pending action. A key is kept only while its request
+// failed without a response, so retrying after a network error cannot
+// create a second record
+const pendingIdempotencyKeys = new Map();
+
+/**
+ * Function to get the Idempotency-Key for an action, reused until a response arrives
+ * @param {string} action - Name of the action, e.g. 'create-deal'
+ * @returns {string} The key to send
+ */
+function idempotencyKey(action) {
+    if (!pendingIdempotencyKeys.has(action)) {
+        const key = window.crypto && crypto.randomUUID
+            ? crypto.randomUUID()
+            : `${Date.now()}-${Math.random().toString(36).slice(2)}`;
+        pendingIdempotencyKeys.set(action, key);
+    }
+    return pendingIdempotencyKeys.get(action);
+}
+
+// Deals rendered with the page, keyed by ID, so opening one needs no request
+const dealsById = new Map(
+    JSON.parse(document.getElementById('initial-deals').textContent).map(deal => [deal.id, deal])
+);
+
+// Deal leased to this verifier through claimNextDeal, and the timer keeping the lease alive
+let leasedDealId = null;
+let leaseTimer = null;
+
+/**
+ * Claim the oldest deal nobody else is reviewing and open it
+ */
+function claimNextDeal() {
+    fetch('/api/deals/claim/', {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify({ verifier: dashboardConfig.username })
+    })
+    .then(response => response.json())
+    .then(data => {
+        if (!data.success) {
+            throw new Error(data.error || 'Could not claim a deal');
+        }
+        if (!data.deal) {
+            alert('No deals are waiting for verification.');
+            return;
+        }
+        dealsById.set(data.deal.id, data.deal);
+        startLease(data.deal.id, data.lease_seconds);
+        viewDealDetails(data.deal.id);
+    })
+    .catch(error => {
+        console.error('Error claiming deal:', error);
+        alert('Error: ' + error.message);
+    });
+}
+
+/**
+ * Renew the lease on a claimed deal at a third of its lifetime until it is released
+ */
+function startLease(dealId, leaseSeconds) {
+    stopLease();
+    leasedDealId = dealId;
+    leaseTimer = setInterval(() => {
+        fetch(`/api/deals/${dealId}/lease/heartbeat/`, {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify({ verifier: dashboardConfig.username })
+        })
+        .then(response => {
+            if (response.status === 409) {
+                stopLease();
+                alert('Your review lease on this deal expired and it was handed to another verifier.');
+            }
+        })
+        .catch(error => console.error('Lease heartbeat failed:', error));
+    }, Math.max(leaseSeconds / 3, 5) * 1000);
+}
+
+/**
+ * Stop renewing the lease; when release is set, also hand the deal back to the queue
+ */
+function stopLease(release = false) {
+    if (leaseTimer) {
+        clearInterval(leaseTimer);
+        leaseTimer = null;
+    }
+    if (release && leasedDealId) {
+        fetch(`/api/deals/${leasedDealId}/lease/release/`, {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify({ verifier: dashboardConfig.username }),
+            keepalive: true
+        }).catch(error => console.error('Lease release failed:', error));
+    }
+    leasedDealId = null;
+}
+
+// Closing the details modal without a decision gives a claimed deal back
+document.getElementById('dealDetailsModal').addEventListener('hidden.bs.modal', () => stopLease(true));
+
+/**
+ * Function to view deal details
+ * @param {string} dealId - The ID of the deal to view
+ */
+function viewDealDetails(dealId) {
+    console.log('viewDealDetails called with ID:', dealId);
+    currentDealId = dealId;
+
+    // Show a loading indicator
+    document.getElementById('dealDetailsContent').innerHTML = '<div class="text-center"><div class="spinner-border" role="status"><span class="visually-hidden">Loading...</span></div><p>Loading deal details...</p></div>';
+
+    // Open the modal right away to provide immediate feedback
+    try {
+        const dealDetailsModal = new bootstrap.Modal(document.getElementById('dealDetailsModal'));
+        dealDetailsModal.show();
+    } catch (error) {
+        console.error('Error showing modal:', error);
+        alert('Error displaying details modal. Please check if Bootstrap is properly loaded.');
+        return; // Exit if modal can't be shown
+    }
+
+    // Use the deal from the page data; otherwise fetch all deals with status=all
+    // so we can find it even if it's no longer pending verification
+    const dealRequest = dealsById.has(dealId)
+        ? Promise.resolve({ success: true, deals: [dealsById.get(dealId)] })
+        : fetch(`/api/deals/?username=${dashboardConfig.username}&role=verifier&status=all`).then(response => {
+            if (!response.ok) {
+                throw new Error(`Server responded with ${response.status}: ${response.statusText}`);
+            }
+            return response.json();
+        });
+
+    dealRequest
+        .then(data => {
+            if (!data.success) {
+                throw new Error(data.error || 'API returned failure status');
+            }
+
+            const deal = (data.deals || []).find(d => d.id === dealId);
+
+            if (deal) {
+                console.log('Found matching deal:', deal);
+                currentDealData = deal;
+                renderDealDetails(deal);
+            } else {
+                console.error('Deal not found. Available IDs:', data.deals.map(d => d.id));
+                document.getElementById('dealDetailsContent').innerHTML = `
+                    <div class="alert alert-warning">
+                        <h5>Deal Not Found</h5>
+                        <p>Could not find the deal with ID: ${dealId}</p>
+                        <p>This could be because the deal has been processed or removed.</p>
+                        <button class="btn btn-primary mt-2" onclick="window.location.reload()">Refresh Page</button>
+                    </div>`;
+            }
+        })
+        .catch(error => {
+            console.error('Error fetching deal details:', error);
+            document.getElementById('dealDetailsContent').innerHTML = `
+                <div class="alert alert-danger">
+                    <h5>Error Loading Deal</h5>
+                    <p>${error.message}</p>
+                    <button class="btn btn-primary mt-2" onclick="window.location.reload()">Refresh Page</button>
+                </div>`;
+        });
+}
+
+/**
+ * Function to render deal details in the modal
+ * @param {Object} deal - The deal object to render
+ */
+function renderDealDetails(deal) {
+    console.log('Rendering deal details:', deal);
+
+    // Format date nicely
+    const createdDate = new Date(deal.created_at);
+    const dateFormatted = createdDate.toLocaleDateString('en-US', {
+        year: 'numeric',
+        month: 'long',
+        day: 'numeric'
+    });
+    const timeFormatted = createdDate.toLocaleTimeString('en-US', {
+        hour: '2-digit',
+        minute: '2-digit'
+    });
+
+    // Prepare receipt display section
+    let receiptHtml = '';
+
+    if (deal.receipt_file) {
+        // Get file extension to show appropriate icon
+        const fileExt = deal.receipt_file.split('.').pop().toLowerCase();
+        const isImage = ['jpg', 'jpeg', 'png', 'gif'].includes(fileExt);
+        const isPdf = fileExt === 'pdf';
+
+        receiptHtml = `
+        <div class="card mt-3">
+            <div class="card-header">
+                <h5 class="card-title">Receipt Document</h5>
+            </div>
+            <div class="card-body">
+                <p><strong>Filename:</strong> ${deal.receipt_file.split('/').pop()}</p>
+                <p><strong>Type:</strong> ${deal.receipt_file.split('.').pop().toUpperCase()}</p>
+                <div class="d-flex gap-2">
+                    <button class="btn btn-primary" onclick="previewDocument('/api/files/${deal.receipt_file}')">
+                        <i class="bi bi-eye"></i> Preview Receipt
+                    </button>
+                    <a href="/api/files/${deal.receipt_file}" class="btn btn-outline-primary" download>
+                        <i class="bi bi-download"></i> Download Receipt
+                    </a>
+                </div>
+            </div>
+        </div>
+        `;
+    } else {
+        receiptHtml = `
+            <div class="card mb-4">
+                <div class="card-header">
+                    <h6 class="m-0">Receipt Document</h6>
+                </div>
+                <div class="card-body">
+                    <div class="alert alert-warning mb-0">
+                        <i class="bi bi-exclamation-triangle me-2"></i>
+                        <span>No receipt file attached to this deal. Verification may not be possible without supporting documentation.</span>
+                    </div>
+                </div>
+            </div>
+        `;
+    }
+
+    // Render the full deal details with all required information
+    document.getElementById('dealDetailsContent').innerHTML = `
+        <div class="card mb-4">
+            <div class="card-header bg-primary text-white">
+                <h5 class="m-0">${deal.title}</h5>
+            </div>
+            <div class="card-body">
+                <div class="mb-3">
+                    <span class="badge bg-${deal.status === 'pending_verification' ? 'info' : deal.status === 'verified' ? 'success' : 'warning'} p-2">
+                        <i class="bi bi-${deal.status === 'pending_verification' ? 'hourglass-split' : deal.status === 'verified' ? 'check-circle' : 'x-circle'} me-1"></i>
+                        ${deal.status === 'pending_verification' ? 'Pending Verification' : deal.status === 'verified' ? 'Verified' : 'Rejected'}
+                    </span>
+                </div>
+            </div>
+        </div>
+
+        <div class="card mt-3">
+            <div class="card-body">
+                <h5 class="card-title">Financial Details</h5>
+                <p class="mb-1"><strong>Budget:</strong> $${deal.budget || '0'}</p>
+                <p class="mb-1"><strong>Advance Payment:</strong> $${deal.advance_payment || '0'}</p>
+            </div>
+        </div>
+
+        <div class="card mt-3">
+            <div class="card-body">
+                <h5 class="card-title">Creation Details</h5>
+                <p class="mb-1"><strong>Created By:</strong> ${deal.created_by || 'Unknown'}</p>
+                <p class="mb-1"><strong>Created:</strong> ${dateFormatted} at ${timeFormatted}</p>
+                <p class="mb-1"><strong>Description:</strong> ${deal.description || 'No description provided'}</p>
+            </div>
+        </div>
+
+        <div class="card mt-3">
+            <div class="card-body">
+                <h5 class="card-title">Deal Status</h5>
+                <p class="mb-1"><strong>Current Status:</strong> ${deal.status === 'pending_verification' ? 'Pending Verification' : deal.status === 'verified' ? 'Verified' : deal.status === 'rejected' ? 'Rejected' : deal.status || 'Unknown'}</p>
+                ${deal.verified_by ? `<p class="mb-1"><strong>Verified By:</strong> ${deal.verified_by}</p>` : ''}
+                ${deal.verified_at ? `<p class="mb-1"><strong>Verified At:</strong> ${new Date(deal.verified_at).toLocaleString()}</p>` : ''}
+                ${deal.rejection_reason ? `<p class="mb-1"><strong>Rejection Reason:</strong> ${deal.rejection_reason}</p>` : ''}
+            </div>
+        </div>
+
+        <div class="card mt-3">
+            <div class="card-body bg-light">
+                <h5 class="card-title">Requirements</h5>
+                <p>${deal.requirements || 'No specific requirements provided for this deal.'}</p>
+            </div>
+        </div>
+
+        <div class="card mt-3">
+            <div class="card-body">
+                <h5 class="card-title">Client Information</h5>
+                <p class="mb-1"><strong>Client Name:</strong> ${deal.client_name || 'Not provided'}</p>
+                <p class="mb-1"><strong>Contact Information:</strong> ${deal.contact_info || 'Not provided'}</p>
+                <p class="mb-1"><strong>Multi-Project Deal:</strong> ${deal.is_multiproject ? 'Yes' : 'No'}</p>
+            </div>
+        </div>
+
+        ${receiptHtml}
+    `;
+}
+
+/**
+ * Function to preview a document in a modal
+ * @param {string} documentUrl - URL of the document to preview
+ */
+function previewDocument(documentUrl) {
+    console.log('Previewing document:', documentUrl);
+
+    // Try to create and show the modal first
+    let previewModal;
+    try {
+        previewModal = new bootstrap.Modal(document.getElementById('documentPreviewModal'));
+    } catch (error) {
+        console.error('Error creating document preview modal:', error);
+        alert('Could not open document preview. Please check if Bootstrap is properly loaded.');
+        return;
+    }
+
+    const previewContent = document.getElementById('documentPreviewContent');
+    const downloadBtn = document.getElementById('downloadDocumentBtn');
+
+    // Show loading indicator
+    previewContent.innerHTML = `
+        <div class="d-flex justify-content-center">
+            <div class="spinner-border" role="status">
+                <span class="visually-hidden">Loading...</span>
+            </div>
+        </div>
+        <p class="text-center mt-2">Loading document preview...</p>
+    `;
+
+    // Set download link
+    downloadBtn.href = documentUrl;
+
+    // Get file name from URL for a better user experience
+    const fileName = documentUrl.split('/').pop();
+    downloadBtn.setAttribute('download', fileName);
+
+    // Determine the document type from the URL
+    const fileExtension = documentUrl.split('.').pop().toLowerCase();
+
+    // Show the modal before attempting to load content
+    previewModal.show();
+
+    // Use a timeout to ensure the modal is visible before loading content
+    setTimeout(() => {
+        try {
+            if (['jpg', 'jpeg', 'png', 'gif'].includes(fileExtension)) {
+                // Image preview with error handling
+                const img = new Image();
+                img.onload = function() {
+                    previewContent.innerHTML = `
+                        <img src="${documentUrl}" class="img-fluid" alt="Receipt Image">
+                    `;
+                };
+                img.onerror = function() {
+                    previewContent.innerHTML = `
+                        <div class="alert alert-danger">
+                            <p>Failed to load image. The file may be missing or corrupted.</p>
+                        </div>
+                    `;
+                };
+                img.src = documentUrl;
+
+            } else if (fileExtension === 'pdf') {
+                // PDF preview
+                previewContent.innerHTML = `
+                    <div class="ratio ratio-16x9" style="height: 600px;">
+                        <iframe src="${documentUrl}" allowfullscreen></iframe>
+                    </div>
+                `;
+            } else {
+                // Other file types that can't be previewed directly
+                previewContent.innerHTML = `
+                    <div class="alert alert-info">
+                        <p>This file type (${fileExtension}) can't be previewed directly in the browser.</p>
+                        <p>Please use the download button to view the file.</p>
+                        <p class="mb-0"><strong>File:</strong> ${fileName}</p>
+                    </div>
+                `;
+            }
+        } catch (error) {
+            console.error('Error rendering document preview:', error);
+            previewContent.innerHTML = `
+                <div class="alert alert-danger">
+                    <p>Error displaying document preview: ${error.message}</p>
+                    <p>Please try downloading the file instead.</p>
+                </div>
+            `;
+        }
+    }, 100);
+}
+
+/**
+ * Function to verify a deal (approve or reject)
+ */
+function verifyDeal(action) {
+    if (!currentDealId) {
+        alert('No deal selected for verification.');
+        return;
+    }
+
+    // If rejecting, require a reason
+    const rejectionReason = document.getElementById('rejectionReason').value;
+    if (action === 'reject' && !rejectionReason.trim()) {
+        alert('Please provide a reason for rejection.');
+        return;
+    }
+
+    // Confirmation dialog
+    const confirmMessage = action === 'approve' 
+        ? 'Are you sure you want to approve this deal?' 
+        : 'Are you sure you want to reject this deal?';
+
+    if (!confirm(confirmMessage)) {
+        return;
+    }
+
+    // Build verification data
+    const verificationData = {
+        action: action === 'approve' ? 'approve' : 'reject',
+        verifier: dashboardConfig.username,
+        reason: rejectionReason
+    };
+
+    // Submit verification
+    const keyAction = `verify-${currentDealId}-${verificationData.action}`;
+    fetch(`/api/deals/${currentDealId}/verify/`, {
+        method: 'POST',
+        headers: {
+            'Content-Type': 'application/json',
+            'Idempotency-Key': idempotencyKey(keyAction)
+        },
+        body: JSON.stringify(verificationData)
+    })
+    .then(response => response.json())
+    .then(data => {
+        pendingIdempotencyKeys.delete(keyAction);
+        if (data.success) {
+            // Deciding the deal cleared its lease on the server
+            stopLease();
+            alert(action === 'approve' 
+                ? 'Deal approved successfully!' 
+                : 'Deal rejected successfully!');
+            window.location.reload();
+        } else {
+            alert('Error: ' + data.error);
+        }
+    })
+    .catch(error => {
+        console.error('Error:', error);
+        alert('An error occurred during verification.');
+    });
+}
@@ -0,0 +1,40 @@
+from django.db import models
+from mongoengine import Document, StringField, DateTimeField
+from datetime import datetime
+
+# Tombstones older than this are purged; sync tokens older than this must resync
+TOMBSTONE_TTL_SECONDS = 30 * 24 * 60 * 60
+
+class Tombstone(Document):
+    """Marker left behind when a deal or project is deleted, so incremental sync can report it."""
+    kind = StringField(choices=["deal", "project"], required=True)
+    object_id = StringField(required=True)
+    created_by = StringField()  # Salesperson who owned the deal
+    supervisor = StringField()  # Supervisor of the project, for project tombstones
+    deleted_at = DateTimeField(default=datetime.utcnow)
+    
+    # Dates that placed the document in daily_rollups buckets, so incremental refreshes rebuild those days
+    created_at = DateTimeField()
+    verified_at = DateTimeField()
+
+    meta = {
+        'collection': 'tombstones',
+        'indexes': [
+            ('created_by', 'deleted_at'),
+            ('supervisor', 'deleted_at'),
+            {'fields': ['deleted_at'], 'expireAfterSeconds': TOMBSTONE_TTL_SECONDS}
+        ]
+    }
+
+    @classmethod
+    def record_deal(cls, deal, projects):
+        """Record tombstones for a deal and the projects deleted with it."""
+        now = datetime.utcnow()
+        tombstones = [cls(kind='deal', object_id=str(deal.id), created_by=deal.created_by, deleted_at=now,
+                          created_at=deal.created_at, verified_at=deal.verified_at)]
+        tombstones += [
+            cls(kind='project', object_id=str(p.id), created_by=deal.created_by, supervisor=p.supervisor, deleted_at=now,
+                created_at=p.created_at)
+            for p in projects
+        ]
+        cls.objects.insert(tombstones, load_bulk=False)
@@ -0,0 +1,75 @@
+import time
+
+from django.test import override_settings
+
+from prs.testing import MongoTestCase, make_deal
+from sync.views import decode_token
+
+
+@override_settings(SYNC_SETTLE_SECONDS=0.5, SYNC_MAX_CHANGES=500)
+class SyncChangesTests(MongoTestCase):
+
+    def sync(self, username, role, since=None):
+        params = {'username': username, 'role': role}
+        if since:
+            params['since'] = since
+        response = self.client.get('/api/sync/', params)
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_writes_in_settle_window_are_held_back_for_the_next_poll(self):
+        deal = make_deal(title='Fresh')
+        
+        first = self.sync('sales1', 'salesperson')
+        self.assertEqual(first['deals'], [])
+        # The token stops before the held-back write instead of moving past it
+        self.assertLess(decode_token(first['next_token']), deal.updated_at)
+        
+        time.sleep(0.6)
+        second = self.sync('sales1', 'salesperson', first['next_token'])
+        self.assertEqual([d['title'] for d in second['deals']], ['Fresh'])
+
+    def test_settled_writes_are_not_sent_twice(self):
+        make_deal()
+        time.sleep(0.6)
+        first = self.sync('sales1', 'salesperson')
+        self.assertEqual(len(first['deals']), 1)
+        second = self.sync('sales1', 'salesperson', first['next_token'])
+        self.assertEqual(second['deals'], [])
+
+    def test_verifier_syncs_the_pending_queue(self):
+        pending = make_deal(title='Pending', status='pending_verification', receipt_file='receipts/r.pdf')
+        make_deal(title='Draft')
+        make_deal(title='Verified', status='verified')
+        time.sleep(0.6)
+        
+        first = self.sync('verifier1', 'verifier')
+        self.assertEqual([d['title'] for d in first['deals']], ['Pending'])
+        
+        pending.verify('verifier2')
+        time.sleep(0.6)
+        second = self.sync('verifier1', 'verifier', first['next_token'])
+        self.assertEqual(second['deals'], [])
+        self.assertEqual(second['deleted']['deals'], [str(pending.id)])
+
+    def test_verifier_is_not_told_to_delete_deals_it_never_had(self):
+        draft = make_deal(title='Draft', receipt_file='receipts/r.pdf')
+        verified = make_deal(title='Verified', status='verified')
+        time.sleep(0.6)
+        first = self.sync('verifier1', 'verifier')
+        self.assertEqual(first['deals'], [])
+
+        verified.update_if_version(verified.version, title='Renamed')
+        # Submitted and decided between two syncs: never seen in the queue
+        draft.submit_for_verification()
+        draft.reload()
+        draft.verify('verifier2')
+        time.sleep(0.6)
+        second = self.sync('verifier1', 'verifier', first['next_token'])
+        self.assertEqual(second['deals'], [])
+        self.assertEqual(second['deleted']['deals'], [])
+
+    def test_salesperson_only_sees_own_deals(self):
+        make_deal(created_by='sales2')
+        time.sleep(0.6)
+        self.assertEqual(self.sync('sales1', 'salesperson')['deals'], [])
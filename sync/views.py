@@ -0,0 +1,161 @@
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.http import JsonResponse
+
+from deals.models import Deal, DealEvent
+from deals.views import DEAL_LIST_FIELDS, serialize_deal
+from projects.models import Project
+from projects.views import serialize_projects
+from sync.models import TOMBSTONE_TTL_SECONDS, Tombstone
+
+EPOCH = datetime(1970, 1, 1)
+
+
+def encode_token(moment):
+    """Sync tokens are the millisecond high-water mark of updated_at, as a string."""
+    return str((moment - EPOCH) // timedelta(milliseconds=1))
+
+
+def decode_token(token):
+    return EPOCH + timedelta(milliseconds=int(token))
+
+
+def _changed(queryset, field, since, until, limit):
+    """Fetch documents with since < field <= until, oldest first.
+    
+    Returns (documents, cut). When more than `limit` match, cut is the
+    timestamp of the first document left out and only documents strictly
+    before it are returned, so a page never splits one millisecond. If that
+    would leave nothing (over `limit` writes in one millisecond), the whole
+    millisecond is returned instead.
+    """
+    filters = {f'{field}__lte': until}
+    if since is not None:
+        filters[f'{field}__gt'] = since
+    docs = list(queryset.filter(**filters).order_by(field).limit(limit + 1))
+    if len(docs) <= limit:
+        return docs, None
+    cut = getattr(docs[limit], field)
+    kept = [d for d in docs[:limit] if getattr(d, field) < cut]
+    if not kept:
+        kept = list(queryset.filter(**{field: cut}))
+        return kept, cut + timedelta(milliseconds=1)
+    return kept, cut
+
+
+def _left_queue(deals, since):
+    """Ids of the given deals that were pending verification at `since`.
+    
+    Every status change records a DealEvent, so a deal was in the queue
+    then exactly when its first event after `since` starts from
+    pending_verification.
+    """
+    first_from = {}
+    events = DealEvent.objects(deal_id__in=[str(d.id) for d in deals], ts__gt=since) \
+        .only('deal_id', 'from_status').order_by('ts')
+    for event in events:
+        first_from.setdefault(event.deal_id, event.from_status)
+    return [str(d.id) for d in deals if first_from.get(str(d.id)) == 'pending_verification']
+
+
+def sync_changes(request):
+    """Return what changed for a user since a sync token.
+    
+    GET parameters:
+    - username, role: Whose view of the data to sync (as for list_deals)
+    - since: Token from a previous response; omit for a full snapshot
+    
+    Responds with changed deals and projects, ids deleted since the token
+    (for verifiers, also deals that left the pending queue), and next_token
+    to pass on the next call. When has_more is true, call
+    again straight away with next_token. Writes from the last
+    SYNC_SETTLE_SECONDS are held back until they settle, so a slow write
+    stamped before the token cannot be missed.
+    """
+    if request.method != 'GET':
+        return JsonResponse({'success': False, 'error': 'Invalid request method'}, status=405)
+    
+    username = request.GET.get('username')
+    role = request.GET.get('role')
+    if not (username and role):
+        return JsonResponse({'success': False, 'error': 'Username and role are required'}, status=400)
+    
+    try:
+        since = decode_token(request.GET['since']) if request.GET.get('since') else None
+    except (ValueError, OverflowError):
+        return JsonResponse({'success': False, 'error': 'Invalid sync token'}, status=400)
+    
+    try:
+        now = datetime.utcnow()
+        # Deletions older than the tombstone TTL have been forgotten
+        if since is not None and since < now - timedelta(seconds=TOMBSTONE_TTL_SECONDS):
+            return JsonResponse({'success': False, 'error': 'Sync token expired; resync without since', 'resync': True}, status=410)
+        until = now - timedelta(seconds=settings.SYNC_SETTLE_SECONDS)
+        if since is not None and until <= since:
+            return JsonResponse({'success': True, 'deals': [], 'projects': [], 'deleted': {'deals': [], 'projects': []}, 'next_token': encode_token(since), 'has_more': False})
+        limit = settings.SYNC_MAX_CHANGES
+        
+        # What each role can see
+        deals = Deal.objects.only(*DEAL_LIST_FIELDS)
+        projects = Project.objects.exclude('manifest')
+        tombstones = Tombstone.objects
+        if role == 'salesperson':
+            deals = deals.filter(created_by=username)
+            own_deal_ids = [str(i) for i in Deal.objects(created_by=username).distinct('id')]
+            projects = projects.filter(deal_id__in=own_deal_ids)
+            tombstones = tombstones.filter(created_by=username)
+        elif role == 'verifier':
+            # The pending queue, as list_deals shows it; deals that left it are
+            # found among all changed deals and reported as deleted (see _left_queue)
+            if since is None:
+                deals = deals.filter(status='pending_verification')
+            projects = None
+            tombstones = tombstones.filter(kind='deal')
+        elif role == 'supervisor':
+            deals = None
+            projects = projects.filter(supervisor=username)
+            tombstones = tombstones.filter(kind='project', supervisor=username)
+        else:
+            return JsonResponse({'success': False, 'error': 'Unknown role'}, status=400)
+        
+        cuts = []
+        changed_deals, changed_projects, removed = [], [], []
+        if deals is not None:
+            changed_deals, cut = _changed(deals, 'updated_at', since, until, limit)
+            cuts.append(cut)
+        if projects is not None:
+            changed_projects, cut = _changed(projects, 'updated_at', since, until, limit)
+            cuts.append(cut)
+        if since is not None:
+            removed, cut = _changed(tombstones, 'deleted_at', since, until, limit)
+            cuts.append(cut)
+        
+        # A truncated collection moves the high-water mark back for all of them
+        cuts = [c for c in cuts if c is not None]
+        has_more = bool(cuts)
+        if has_more:
+            until = min(cuts) - timedelta(milliseconds=1)
+            changed_deals = [d for d in changed_deals if d.updated_at <= until]
+            changed_projects = [p for p in changed_projects if p.updated_at <= until]
+            removed = [t for t in removed if t.deleted_at <= until]
+        
+        left_queue = []
+        if role == 'verifier':
+            if since is not None:
+                left_queue = _left_queue([d for d in changed_deals if d.status != 'pending_verification'], since)
+            changed_deals = [d for d in changed_deals if d.status == 'pending_verification']
+        
+        return JsonResponse({
+            'success': True,
+            'deals': [serialize_deal(d) for d in changed_deals],
+            'projects': serialize_projects(changed_projects),
+            'deleted': {
+                'deals': [t.object_id for t in removed if t.kind == 'deal'] + left_queue,
+                'projects': [t.object_id for t in removed if t.kind == 'project']
+            },
+            'next_token': encode_token(until),
+            'has_more': has_more
+        })
+    except Exception as e:
+        return JsonResponse({'success': False, 'error': str(e)}, status=500)
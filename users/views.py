@@ -2,8 +2,15 @@ from django.shortcuts import render, redirect
 from django.http import JsonResponse
 from .models import User
 from deals.models import Deal
+from deals.views import DEAL_LIST_FIELDS, serialize_deal
+from projects.models import Project
+from projects.views import serialize_projects
+from django.conf import settings
+from django.core.cache import cache
 import json
 from django.views.decorators.csrf import csrf_exempt
+from monitoring.middleware import span
+from prs.breaker import mongo_guard
 
 # Create your views here.
 
@@ -11,6 +18,7 @@ def home_view(request):
     """Function to render the home page."""
     return render(request, 'home.html')
 
+@mongo_guard
 def login_view(request):
     """Function to handle user login."""
     error_message = None
@@ -36,6 +44,7 @@ def logout_view(request):
     request.session.flush()
     return redirect('login')
 
+@mongo_guard
 def register_view(request):
     """Function to handle user registration."""
     error_message = None
@@ -59,8 +68,78 @@ def register_view(request):
     
     return render(request, 'register.html', {'error_message': error_message})
 
+# Cache key for supervisor_workloads()
+WORKLOAD_CACHE_KEY = 'supervisors:workload'
+
+def supervisor_workloads():
+    """Return open-project counts by status and the nearest deadline for every supervisor.
+    
+    One $group over the open projects does the counting; supervisors with
+    nothing open are filled in from the user list. The result is cached for
+    WORKLOAD_CACHE_SECONDS and sorted least loaded first.
+    """
+    workloads = cache.get(WORKLOAD_CACHE_KEY)
+    if workloads is not None:
+        return workloads
+    
+    pipeline = [
+        {'$match': {'status': {'$ne': 'completed'}}},
+        {'$group': {
+            '_id': '$supervisor',
+            'pending': {'$sum': {'$cond': [{'$eq': ['$status', 'pending']}, 1, 0]}},
+            'in_progress': {'$sum': {'$cond': [{'$eq': ['$status', 'in_progress']}, 1, 0]}},
+            'open': {'$sum': 1},
+            'next_deadline': {'$min': '$deadline'}
+        }}
+    ]
+    counts = {row['_id']: row for row in Project.objects.aggregate(pipeline)}
+    
+    workloads = []
+    for supervisor in User.objects(role='supervisor').only('username').order_by('username'):
+        row = counts.pop(supervisor.username, {})
+        workloads.append({
+            'supervisor': supervisor.username,
+            'open': row.get('open', 0),
+            'pending': row.get('pending', 0),
+            'in_progress': row.get('in_progress', 0),
+            'next_deadline': row['next_deadline'].isoformat() if row.get('next_deadline') else None
+        })
+    workloads.sort(key=lambda w: (w['open'], w['supervisor']))
+    
+    cache.set(WORKLOAD_CACHE_KEY, workloads, settings.WORKLOAD_CACHE_SECONDS)
+    return workloads
+
+@mongo_guard
+def supervisor_workload(request):
+    """API: open-project workload per supervisor, least loaded first.
+    
+    GET parameters:
+    - supervisor: Optional username to return a single entry for
+    """
+    if request.method != 'GET':
+        return JsonResponse({'success': False, 'error': 'Invalid request method'}, status=405)
+    
+    try:
+        workloads = supervisor_workloads()
+        supervisor = request.GET.get('supervisor')
+        if supervisor:
+            workloads = [w for w in workloads if w['supervisor'] == supervisor]
+        return JsonResponse({'success': True, 'supervisors': workloads})
+    except Exception as e:
+        return JsonResponse({'success': False, 'error': str(e)}, status=500)
+
+def _page_of(queryset, page, page_size):
+    """Fetch one page of a queryset, plus whether another page follows."""
+    rows = list(queryset.skip((page - 1) * page_size).limit(page_size + 1))
+    return rows[:page_size], len(rows) > page_size
+
+@mongo_guard
 def dashboard_view(request):
-    """Function to render the appropriate dashboard based on user role."""
+    """Function to render the appropriate dashboard based on user role.
+    
+    The first page of the dashboard's data is queried once, rendered into the
+    table and embedded as JSON so the page script needs no follow-up fetch.
+    """
     # Check if user is logged in
     username = request.session.get('username')
     role = request.session.get('role')
@@ -68,23 +147,51 @@ def dashboard_view(request):
     if not username:
         return redirect('login')
     
+    try:
+        page = max(int(request.GET.get('page', 1)), 1)
+    except ValueError:
+        page = 1
+    page_size = settings.DASHBOARD_PAGE_SIZE
+    
     context = {
         'username': username,
-        'role': role
+        'role': role,
+        'page': page,
+        'page_size': page_size,
+        'previous_page': page - 1
     }
     
-    # Render different dashboard based on role
-    if role == 'salesperson':
-        # Get salesperson's deals
-        deals = Deal.objects.filter(created_by=username)
-        context['deals'] = deals
-        return render(request, 'salesperson_dashboard.html', context)
-    elif role == 'verifier':
-        # Get deals pending verification
-        deals = Deal.objects.filter(status='pending_verification')
+    # Pick a different dashboard based on role
+    if role in ('salesperson', 'verifier'):
+        if role == 'salesperson':
+            # Get salesperson's deals
+            deals = Deal.objects(created_by=username)
+            template = 'salesperson_dashboard.html'
+        else:
+            # Get deals pending verification
+            deals = Deal.objects(status='pending_verification')
+            template = 'verifier_dashboard.html'
+        deals, has_next = _page_of(deals.only(*DEAL_LIST_FIELDS).order_by('-created_at'), page, page_size)
         context['deals'] = deals
-        return render(request, 'verifier_dashboard.html', context)
+        context['initial_deals'] = [serialize_deal(d) for d in deals]
     elif role == 'supervisor':
-        return render(request, 'supervisor_dashboard.html', context)
+        projects = Project.objects(supervisor=username).exclude('manifest').order_by('-created_at')
+        projects, has_next = _page_of(projects, page, page_size)
+        context['initial_projects'] = serialize_projects(projects)
+        # Status counts for the filter buttons, across all pages
+        context['workload'] = next((w for w in supervisor_workloads() if w['supervisor'] == username), None)
+        template = 'supervisor_dashboard.html'
     else:
-        return render(request, 'dashboard.html', context)
+        has_next = False
+        template = 'dashboard.html'
+    
+    context['next_page'] = page + 1 if has_next else None
+    # Per-request values for the static dashboard scripts
+    context['dashboard_config'] = {
+        'username': username,
+        'role': role,
+        'page': page,
+        'page_size': page_size
+    }
+    with span('render'):
+        return render(request, template, context)